@@ -0,0 +1,369 @@
+# --- LIBRO DE ACUMULADOS DEL RDO ---
+# Mantiene de forma incremental los totales corridos del RDO de un contrato
+# (Financiero Acum, Físico Acum, HH Acum) y los agregados mensuales. Insertar,
+# corregir o eliminar un día sólo actualiza las filas posteriores a esa fecha y el
+# mes afectado, aunque el RDO llegue fuera de orden. verificar() contrasta lo
+# guardado con un recálculo completo. CPI y SPI de cada día se derivan de los
+# acumulados (EV/AC) y de la línea base (EV/PV), y se actualizan en el mismo sufijo.
+# Tras cada escritura se actualiza además la fila de resumen del contrato que usa
+# la vista de cartera.
+import json
+
+import pandas as pd
+
+from almacenamiento import DIA_INICIO, ConflictoEdicion, columna_sql, validar_rdo, valor_sql
+from valor_ganado import crear_tabla_linea_base
+
+# Columna diaria -> columna acumulada
+ACUMULADOS = {
+    'Inversión Diaria ($)': 'Financiero Acum ($)',
+    'Horas Hombre': 'HH Acum',
+    'Costo Real Diario ($)': 'Costo Real Acum ($)',
+}
+# Columnas sumadas por mes
+MENSUALES = ['Físico Diario (%)', 'Inversión Diaria ($)', 'Horas Hombre']
+# Columnas de la fila de resumen por contrato (tomadas del último RDO)
+RESUMEN = ['Físico Acum (%)', 'Financiero Acum ($)', 'HH Acum', 'Costo Real Acum ($)', 'CPI', 'SPI']
+TOLERANCIA = 1e-6
+
+# Orden del RDO: por fecha y, dentro del mismo día, por orden de ingreso
+_POSTERIORES = "Contrato = ? AND (Fecha, id) > (?, ?)"
+_ANTERIORES = "Contrato = ? AND (Fecha, id) < (?, ?)"
+_DESDE = "Contrato = ? AND (Fecha, id) >= (?, ?)"
+
+# Índices de desempeño a partir de los acumulados de la fila y la línea base: el PV
+# es el del último punto de la línea base en o antes del día, igual que pv_al()
+_SQL_INDICES = (
+    'UPDATE rdo SET '
+    'CPI = "Financiero Acum ($)" / NULLIF("Costo Real Acum ($)", 0), '
+    'SPI = "Financiero Acum ($)" / NULLIF((SELECT b.pv FROM linea_base b '
+    'WHERE b.contrato = rdo.Contrato AND b.fecha <= rdo.Fecha ORDER BY b.fecha DESC LIMIT 1), 0) '
+)
+
+
+def _mes(fecha):
+    return str(valor_sql(fecha))[:7]
+
+
+def crear_tablas(con):
+    crear_tabla_linea_base(con)
+    columnas_mensual = {f[1] for f in con.execute("PRAGMA table_info(rdo_mensual)")}
+    if columnas_mensual and 'contrato' not in columnas_mensual:
+        con.execute("DROP TABLE rdo_mensual")
+    cols = ", ".join(f"{columna_sql(c)} REAL NOT NULL DEFAULT 0" for c in MENSUALES)
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS rdo_mensual (contrato TEXT NOT NULL, mes TEXT NOT NULL, "
+        f"{cols}, dias INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (contrato, mes))"
+    )
+    columnas_resumen = {f[1] for f in con.execute("PRAGMA table_info(resumen_contratos)")}
+    if columnas_resumen and not set(RESUMEN) <= columnas_resumen:
+        con.execute("DROP TABLE resumen_contratos")
+    cols = ", ".join(f"{columna_sql(c)} REAL" for c in RESUMEN)
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS resumen_contratos (contrato TEXT PRIMARY KEY, {cols}, "
+        f'"Última Fecha" TEXT, "Días RDO" INTEGER)'
+    )
+
+
+class LibroAcumulados:
+    def __init__(self, almacen, contrato, monto_total):
+        self.almacen = almacen
+        self.contrato = contrato
+        self.monto_total = monto_total
+        with almacen.transaccion() as con:
+            crear_tablas(con)
+            # Bases anteriores al libro: se reconstruyen una sola vez
+            nulos = " OR ".join(f"{columna_sql(c)} IS NULL" for c in ACUMULADOS.values())
+            pendientes = con.execute(
+                f"SELECT COUNT(*) FROM rdo WHERE Contrato = ? AND ({nulos})", (contrato,)
+            ).fetchone()[0]
+            sin_resumen = con.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM resumen_contratos WHERE contrato = ?)", (contrato,)
+            ).fetchone()[0]
+            if pendientes or sin_resumen:
+                self._recalcular(con)
+
+    # --- OPERACIONES ---
+    def registrar(self, fila):
+        with self.almacen.transaccion() as con:
+            return self.registrar_en(con, [fila])[0]
+
+    def registrar_en(self, con, filas):
+        # Dentro de una transacción ya abierta (p. ej. la sincronización de la cola de
+        # captura). Cada fila se suma sobre los acumulados vigentes aunque llegue tarde
+        # o fuera de orden; índices y resumen se actualizan una vez al final.
+        ids, desde = [], None
+        for fila in filas:
+            fila = self._normalizar(validar_rdo(fila))
+            # Las filas anteriores del lote ya están insertadas: también cuentan como ocupadas
+            self.verificar_fecha(con, fila['Fecha'])
+            id_fila = self.almacen.insertar(con, 'rdo', fila)
+            self._aplicar(con, id_fila, fila)
+            ids.append(id_fila)
+            desde = min(desde or (fila['Fecha'], id_fila), (fila['Fecha'], id_fila))
+        if ids:
+            self._indices(con, desde)
+            self._resumir(con)
+        return ids
+
+    def registrar_lote(self, lotes):
+        # lotes: iterable de listas de filas (carga masiva). Todo va en una sola
+        # transacción y los acumulados se recalculan una única vez al final.
+        total = 0
+        with self.almacen.transaccion() as con:
+            for lote in lotes:
+                lote = [self._normalizar(validar_rdo(f)) for f in lote]
+                self.verificar_fechas(con, [f['Fecha'] for f in lote])
+                self.almacen.insertar_lote(con, 'rdo', lote)
+                total += len(lote)
+            if total:
+                self._recalcular(con)
+        return total
+
+    def corregir(self, id_fila, cambios, version=None):
+        # version: la de la fila cuando se abrió el formulario (None = sin control)
+        cambios = validar_rdo({c: v for c, v in cambios.items() if c != 'Contrato'}, parcial=True)
+        with self.almacen.transaccion() as con:
+            anterior = self._leer_vigente(con, id_fila, version)
+            if 'Fecha' in cambios and valor_sql(cambios['Fecha']) != anterior['Fecha']:
+                self.verificar_fecha(con, cambios['Fecha'])
+            self._retirar(con, id_fila, anterior)
+            nueva = self._normalizar({**anterior, **cambios})
+            self.almacen.actualizar(con, 'rdo', id_fila, {
+                c: nueva[c] for c in list(cambios) + ['Físico Diario (%)']
+            }, version=version)
+            self._aplicar(con, id_fila, nueva)
+            self._indices(con, min((anterior['Fecha'], id_fila), (nueva['Fecha'], id_fila)))
+            self._resumir(con)
+
+    def eliminar(self, id_fila, version=None):
+        with self.almacen.transaccion() as con:
+            anterior = self._leer_vigente(con, id_fila, version)
+            self._retirar(con, id_fila, anterior)
+            self.almacen.eliminar(con, 'rdo', id_fila, version=version)
+            self._indices(con, (anterior['Fecha'], id_fila))
+            self._resumir(con)
+
+    def recalcular(self):
+        with self.almacen.transaccion() as con:
+            self._recalcular(con)
+
+    def cargar_linea_base(self, pv):
+        # pv: Serie diaria de valor planificado acumulado (valor_ganado.curva_pv_diaria)
+        with self.almacen.transaccion() as con:
+            con.execute("DELETE FROM linea_base WHERE contrato = ?", (self.contrato,))
+            con.executemany(
+                "INSERT INTO linea_base (contrato, fecha, pv) VALUES (?, ?, ?)",
+                [(self.contrato, f.date().isoformat(), float(v)) for f, v in pv.items()],
+            )
+            self.almacen.marcar('linea_base', self.contrato)
+            self.almacen.marcar('rdo', self.contrato)
+            self._indices(con)
+            self._resumir(con)
+
+    # --- CONSULTAS ---
+    def totales(self):
+        return self.almacen.ultimo('rdo', self.contrato, ['Físico Acum (%)'] + list(ACUMULADOS.values()))
+
+    def linea_base(self):
+        filas = self.almacen.consultar(
+            "SELECT fecha, pv FROM linea_base WHERE contrato = ? ORDER BY fecha", (self.contrato,)
+        )
+        if not filas:
+            return None
+        fechas, valores = zip(*filas)
+        return pd.Series(valores, index=pd.DatetimeIndex(fechas), name='PV')
+
+    def pv_al(self, fecha):
+        fila = self.almacen.consultar(
+            "SELECT pv FROM linea_base WHERE contrato = ? AND fecha <= ? ORDER BY fecha DESC LIMIT 1",
+            (self.contrato, valor_sql(fecha)),
+        )
+        return fila[0][0] if fila else None
+
+    def mensual(self):
+        cols = ", ".join(columna_sql(c) for c in MENSUALES)
+        filas = self.almacen.consultar(
+            f"SELECT mes, {cols}, dias FROM rdo_mensual WHERE contrato = ? ORDER BY mes", (self.contrato,)
+        )
+        return pd.DataFrame(filas, columns=['Mes'] + MENSUALES + ['Días'])
+
+    def verificar(self):
+        # Devuelve las filas cuyo acumulado guardado difiere del recálculo completo
+        # (DataFrame vacío si el libro está consistente) y los meses descuadrados.
+        df = self._leer_base()
+        esperado = self._calculo_completo(df)
+        columnas = list(ACUMULADOS.values()) + ['Físico Acum (%)']
+        guardado = pd.DataFrame(
+            self.almacen.consultar(
+                f"SELECT id, {', '.join(columna_sql(c) for c in columnas)} FROM rdo WHERE Contrato = ?",
+                (self.contrato,),
+            ),
+            columns=['id'] + columnas,
+        ).set_index('id').loc[esperado.index]
+        diferencias = (guardado[columnas] - esperado[columnas]).abs() > TOLERANCIA
+        filas_mal = esperado[diferencias.any(axis=1)]
+        meses = self._mensual_completo(df).set_index('Mes')
+        actuales = self.mensual().set_index('Mes')
+        meses, actuales = meses.align(actuales, join='outer', fill_value=0)
+        meses_mal = meses[((meses - actuales).abs() > TOLERANCIA).any(axis=1)]
+        return filas_mal, meses_mal
+
+    def verificar_fecha(self, con, fecha):
+        # Un RDO por día: ValueError si otra sesión ya registró esa fecha
+        fila = con.execute(
+            "SELECT \"Día N\" FROM rdo WHERE Contrato = ? AND Fecha = ? AND \"Día N\" != ? LIMIT 1",
+            (self.contrato, valor_sql(fecha), DIA_INICIO),
+        ).fetchone()
+        if fila:
+            raise ValueError(f"Ya existe el RDO del {valor_sql(fecha)} (Día {fila[0]}), registrado en otra sesión.")
+
+    def verificar_fechas(self, con, fechas):
+        # Lo mismo para un lote: fechas repetidas dentro del lote o ya registradas
+        fechas, vistas = [valor_sql(f) for f in fechas], set()
+        for fecha in fechas:
+            if fecha in vistas:
+                raise ValueError(f"El lote trae más de un RDO del {fecha}.")
+            vistas.add(fecha)
+        fila = con.execute(
+            "SELECT Fecha, \"Día N\" FROM rdo WHERE Contrato = ? AND \"Día N\" != ? "
+            "AND Fecha IN (SELECT value FROM json_each(?)) LIMIT 1",
+            (self.contrato, DIA_INICIO, json.dumps(fechas)),
+        ).fetchone()
+        if fila:
+            raise ValueError(f"Ya existe el RDO del {fila[0]} (Día {fila[1]}).")
+
+    def fechas_registradas(self):
+        # Fechas con RDO del contrato (sin la fila de inicio)
+        return {f for (f,) in self.almacen.consultar(
+            "SELECT Fecha FROM rdo WHERE Contrato = ? AND \"Día N\" != ?", (self.contrato, DIA_INICIO)
+        )}
+
+    # --- INTERNOS ---
+    def _leer_vigente(self, con, id_fila, version):
+        fila = self.almacen.leer_fila(con, 'rdo', id_fila)
+        if fila is None or (version is not None and fila['version'] != int(version)):
+            raise ConflictoEdicion("El RDO fue modificado o eliminado en otra sesión; revise los datos vigentes y vuelva a intentar.")
+        return fila
+
+    def _normalizar(self, fila):
+        fila = dict(fila)
+        fila['Contrato'] = self.contrato
+        fila['Fecha'] = valor_sql(fila['Fecha'])
+        for diaria in ACUMULADOS:
+            fila[diaria] = float(fila.get(diaria) or 0.0)
+        fila['Físico Diario (%)'] = fila['Inversión Diaria ($)'] / self.monto_total * 100
+        return fila
+
+    def _aplicar(self, con, id_fila, fila):
+        acum = list(ACUMULADOS.values())
+        previo = con.execute(
+            f"SELECT {', '.join(columna_sql(c) for c in acum)} FROM rdo "
+            f"WHERE {_ANTERIORES} ORDER BY Fecha DESC, id DESC LIMIT 1",
+            (self.contrato, fila['Fecha'], id_fila),
+        ).fetchone() or [0.0] * len(acum)
+        nuevos = {c: (p or 0.0) + fila[d] for (d, c), p in zip(ACUMULADOS.items(), previo)}
+        nuevos['Físico Acum (%)'] = min(100.0, nuevos['Financiero Acum ($)'] / self.monto_total * 100)
+        self.almacen.actualizar(con, 'rdo', id_fila, nuevos)
+        self._desplazar(con, id_fila, fila, 1)
+        self._sumar_mes(con, fila, 1)
+
+    def _retirar(self, con, id_fila, fila):
+        self._desplazar(con, id_fila, fila, -1)
+        self._sumar_mes(con, fila, -1)
+
+    def _desplazar(self, con, id_fila, fila, signo):
+        # Sólo el sufijo posterior a la fila cambia; Físico Acum se deriva del financiero
+        sets, params = [], []
+        # Filas de bases anteriores pueden traer columnas diarias vacías: cuentan como 0
+        for diaria, acum in ACUMULADOS.items():
+            sets.append(f"{columna_sql(acum)} = {columna_sql(acum)} + ?")
+            params.append(signo * (fila[diaria] or 0.0))
+        sets.append('"Físico Acum (%)" = MIN(100.0, ("Financiero Acum ($)" + ?) * 100.0 / ?)')
+        params += [signo * (fila['Inversión Diaria ($)'] or 0.0), self.monto_total]
+        con.execute(
+            f"UPDATE rdo SET {', '.join(sets)} WHERE {_POSTERIORES}",
+            params + [self.contrato, fila['Fecha'], id_fila],
+        )
+
+    def _indices(self, con, desde=None):
+        # desde: (fecha, id) a partir del cual cambiaron los acumulados; None = todo el contrato
+        if desde is None:
+            con.execute(_SQL_INDICES + "WHERE Contrato = ?", (self.contrato,))
+        else:
+            con.execute(_SQL_INDICES + f"WHERE {_DESDE}", (self.contrato, *desde))
+
+    def _sumar_mes(self, con, fila, signo):
+        if fila.get('Día N') == DIA_INICIO:
+            return
+        cols = [columna_sql(c) for c in MENSUALES]
+        con.execute(
+            f"INSERT INTO rdo_mensual (contrato, mes, {', '.join(cols)}, dias) "
+            f"VALUES (?, ?, {', '.join('?' for _ in cols)}, ?) "
+            f"ON CONFLICT(contrato, mes) DO UPDATE SET "
+            + ", ".join(f"{c} = {c} + excluded.{c}" for c in cols)
+            + ", dias = dias + excluded.dias",
+            [self.contrato, _mes(fila['Fecha'])] + [signo * (fila.get(c) or 0.0) for c in MENSUALES] + [signo],
+        )
+        con.execute("DELETE FROM rdo_mensual WHERE contrato = ? AND dias <= 0", (self.contrato,))
+
+    def _resumir(self, con):
+        # Fila de resumen de la cartera: último RDO por fecha y número de días registrados
+        cols = ", ".join(columna_sql(c) for c in RESUMEN)
+        ultimo = con.execute(
+            f"SELECT {cols}, Fecha FROM rdo WHERE Contrato = ? ORDER BY Fecha DESC, id DESC LIMIT 1",
+            (self.contrato,),
+        ).fetchone() or (None,) * (len(RESUMEN) + 1)
+        dias = con.execute(
+            "SELECT COUNT(*) FROM rdo WHERE Contrato = ? AND \"Día N\" != ?", (self.contrato, DIA_INICIO)
+        ).fetchone()[0]
+        con.execute(
+            f"INSERT OR REPLACE INTO resumen_contratos (contrato, {cols}, \"Última Fecha\", \"Días RDO\") "
+            f"VALUES (?, {', '.join('?' for _ in RESUMEN)}, ?, ?)",
+            (self.contrato, *ultimo, dias),
+        )
+
+    def _leer_base(self, con=None):
+        diarias = list(dict.fromkeys(MENSUALES + list(ACUMULADOS)))
+        cols = ['id', 'Fecha', 'Día N'] + diarias
+        sql = f"SELECT {', '.join(columna_sql(c) for c in cols)} FROM rdo WHERE Contrato = ? ORDER BY Fecha, id"
+        filas = con.execute(sql, (self.contrato,)).fetchall() if con else self.almacen.consultar(sql, (self.contrato,))
+        return pd.DataFrame(filas, columns=cols).fillna({c: 0.0 for c in diarias})
+
+    def _calculo_completo(self, df):
+        esperado = pd.DataFrame(index=df['id'])
+        for diaria, acum in ACUMULADOS.items():
+            esperado[acum] = df[diaria].cumsum().to_numpy()
+        esperado['Físico Acum (%)'] = (
+            esperado['Financiero Acum ($)'] / self.monto_total * 100
+        ).clip(upper=100.0)
+        return esperado
+
+    def _mensual_completo(self, df):
+        df = df[df['Día N'] != DIA_INICIO]
+        meses = df.assign(Mes=df['Fecha'].str[:7]).groupby('Mes')
+        resumen = meses[MENSUALES].sum()
+        resumen['Días'] = meses.size()
+        return resumen.reset_index()
+
+    def _recalcular(self, con):
+        self.almacen.marcar('rdo', self.contrato)
+        df = self._leer_base(con)
+        esperado = self._calculo_completo(df)
+        columnas = list(esperado.columns)
+        con.executemany(
+            f"UPDATE rdo SET {', '.join(f'{columna_sql(c)} = ?' for c in columnas)} WHERE id = ?",
+            [(*map(float, fila), int(i)) for i, fila in zip(esperado.index, esperado.itertuples(index=False))],
+        )
+        con.execute("DELETE FROM rdo_mensual WHERE contrato = ?", (self.contrato,))
+        cols = [columna_sql(c) for c in MENSUALES]
+        con.executemany(
+            f"INSERT INTO rdo_mensual (contrato, mes, {', '.join(cols)}, dias) "
+            f"VALUES (?, ?, {', '.join('?' for _ in cols)}, ?)",
+            [
+                (self.contrato, f[0], *(float(v) for v in f[1:-1]), int(f[-1]))
+                for f in self._mensual_completo(df).itertuples(index=False)
+            ],
+        )
+        self._indices(con)
+        self._resumir(con)
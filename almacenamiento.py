@@ -0,0 +1,627 @@
+# --- ALMACENAMIENTO PERSISTENTE (SQLite en modo WAL) ---
+# Los cuatro registros de la app (RDO, LDO, reportes y Libro de Obra) viven en una
+# base SQLite compartida por todas las sesiones. Cada guardado es un INSERT (O(1)),
+# los datos sobreviven a reinicios y el modo WAL permite lecturas concurrentes
+# mientras un usuario escribe.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pandas as pd
+
+from instrumentacion import medir
+
+RUTA_BD = os.environ.get(
+    "FISCALPINAS_BD",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos", "fiscalpinas.db"),
+)
+
+# --- ESQUEMA DE LOS REGISTROS (columna, tipo SQLite) ---
+# Todos los registros se particionan por 'Contrato' (código del contrato de obra).
+ESQUEMAS = {
+    'rdo': [
+        ('Contrato', 'TEXT'), ('Fecha', 'TEXT'), ('Día N', 'INTEGER'), ('Clima', 'TEXT'),
+        ('Físico Diario (%)', 'REAL'), ('Inversión Diaria ($)', 'REAL'),
+        ('Físico Acum (%)', 'REAL'), ('Financiero Acum ($)', 'REAL'),
+        ('HH Acum', 'REAL'), ('Costo Real Diario ($)', 'REAL'), ('Costo Real Acum ($)', 'REAL'),
+        ('Hito Civil (%)', 'REAL'), ('Hito Eléctrico (%)', 'REAL'),
+        ('Horas Hombre', 'REAL'), ('Personal Detalle', 'TEXT'),
+        ('Incidentes', 'TEXT'), ('Contratos Comp', 'TEXT'),
+        ('Ordenes Trabajo', 'TEXT'), ('Incremento Cant', 'REAL'),
+        ('Control Cantidades', 'TEXT'), ('CPI', 'REAL'), ('SPI', 'REAL'),
+        ('Detalle', 'TEXT'), ('Fotos', 'INTEGER'),
+    ],
+    'ldo': [
+        ('Contrato', 'TEXT'), ('Funcionario', 'TEXT'), ('Cargo', 'TEXT'),
+        ('Fecha Salida', 'TEXT'), ('Fecha Retorno', 'TEXT'),
+        ('Días Totales', 'INTEGER'), ('Reemplazo', 'TEXT'),
+        ('Tipo', 'TEXT'), ('Estado', 'TEXT'),
+    ],
+    'reportes': [
+        ('Contrato', 'TEXT'), ('Periodo', 'TEXT'), ('Tipo', 'TEXT'), ('Hitos', 'TEXT'),
+        ('Alertas', 'TEXT'), ('Fecha Emisión', 'TEXT'), ('Archivo', 'TEXT'),
+    ],
+    'lp': [
+        ('Contrato', 'TEXT'), ('Folio', 'TEXT'), ('Fecha', 'TEXT'), ('Asunto', 'TEXT'),
+        ('Instrucción', 'TEXT'), ('Ref. Técnica', 'TEXT'),
+        ('Plazo', 'TEXT'), ('Estado', 'TEXT'),
+    ],
+}
+
+# Columna por la que se filtra/ordena cada registro
+COLUMNA_FECHA = {'rdo': 'Fecha', 'ldo': 'Fecha Salida', 'reportes': 'Fecha Emisión', 'lp': 'Fecha'}
+COLUMNAS_FECHA = {
+    'rdo': ['Fecha'],
+    'ldo': ['Fecha Salida', 'Fecha Retorno'],
+    'reportes': ['Fecha Emisión'],
+    'lp': ['Fecha'],
+}
+
+# --- TIPOS EN MEMORIA DEL RDO ---
+# Al leer, el RDO se arma con tipos columnares: fechas datetime64, montos en float64,
+# porcentajes y horas en float32 y las columnas de valores repetidos como categorías
+# fijas del catálogo (iguales en toda lectura; un valor fuera de él queda NaN).
+# El dashboard y los gráficos trabajan directo sobre estos tipos, sin convertir en
+# cada render. Los otros registros conservan sus fechas como `date`.
+CATEGORIAS_RDO = {
+    'Incidentes': ["Sin Novedad", "Incidente Leve", "Accidente con Baja", "Daño Material"],
+    'Control Cantidades': ["SI - Verificado", "NO - Pendiente", "Con Observaciones"],
+    'Clima': ["Soleado", "Nublado", "Lluvia", "Tormenta"],
+}
+TIPOS = {
+    'rdo': {
+        'Fecha': 'datetime64[ns]', 'Día N': 'Int32',
+        'Físico Diario (%)': 'float32', 'Inversión Diaria ($)': 'float64',
+        'Físico Acum (%)': 'float32', 'Financiero Acum ($)': 'float64',
+        'HH Acum': 'float64', 'Costo Real Diario ($)': 'float64', 'Costo Real Acum ($)': 'float64',
+        'Hito Civil (%)': 'float32', 'Hito Eléctrico (%)': 'float32', 'Horas Hombre': 'float32',
+        'Incremento Cant': 'float32', 'CPI': 'float32', 'SPI': 'float32', 'Fotos': 'Int16',
+        **{c: pd.CategoricalDtype(opciones) for c, opciones in CATEGORIAS_RDO.items()},
+    },
+}
+OBLIGATORIAS_RDO = ['Fecha', 'Día N']
+NO_NEGATIVAS_RDO = ['Inversión Diaria ($)', 'Costo Real Diario ($)', 'Horas Hombre', 'Fotos']
+
+DIA_INICIO = 0
+
+# Fila "Inicio" (Día N = 0) con la que arranca el RDO de cada contrato (punto cero de las curvas);
+# al registrar un contrato se completa con su código y su fecha de inicio.
+REGISTRO_INICIAL = {
+    'Fecha': date(2025, 1, 1), 'Día N': DIA_INICIO,
+    'Físico Diario (%)': 0.0, 'Inversión Diaria ($)': 0.0,
+    'Físico Acum (%)': 0.0, 'Financiero Acum ($)': 0.0, 'HH Acum': 0.0,
+    'Costo Real Diario ($)': 0.0, 'Costo Real Acum ($)': 0.0,
+    'Hito Civil (%)': 0.0, 'Hito Eléctrico (%)': 0.0,
+    'Horas Hombre': 0.0, 'Personal Detalle': 'Inicio',
+    'Incidentes': 'Sin Novedad', 'Contratos Comp': 'Ninguno',
+    'Ordenes Trabajo': 'Ninguna', 'Incremento Cant': 0.0,
+    'Control Cantidades': 'SI - Verificado', 'Clima': None, 'CPI': None, 'SPI': None,
+    'Detalle': 'Inicio de Contrato', 'Fotos': 0,
+}
+
+
+def columna_sql(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def valor_sql(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def aplicar_tipos(registro, df):
+    tipos = TIPOS.get(registro, {})
+    for c in COLUMNAS_FECHA[registro]:
+        if c in df.columns and c not in tipos:
+            df[c] = pd.to_datetime(df[c]).dt.date
+    presentes = {c: t for c, t in tipos.items() if c in df.columns}
+    if 'Fecha' in presentes:
+        df['Fecha'] = pd.to_datetime(df['Fecha'])
+    return df.astype(presentes) if presentes else df
+
+
+def sin_inicio(df):
+    # Días ejecutados: descarta la fila "Inicio" (un Día N ilegible migrado queda NA)
+    return df[df['Día N'].ne(DIA_INICIO).fillna(True)]
+
+
+# --- VALIDACIÓN DE ENTRADA ---
+def a_fecha(valor):
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor).strip()
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(texto[:10], formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"fecha no reconocida: {texto!r}")
+
+
+def a_numero(valor):
+    # Acepta "12.5 %", "$ 1,000.00" y celdas vacías (0)
+    if valor is None or valor == '':
+        return 0.0
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = str(valor).replace('$', '').replace('%', '').replace(',', '').strip()
+    try:
+        return float(texto or 0)
+    except ValueError:
+        raise ValueError(f"número no reconocido: {valor!r}") from None
+
+
+def a_dia(valor):
+    # "Día 12", "12" o 12 -> 12; la fila "Inicio" es el día 0
+    if isinstance(valor, str):
+        texto = valor.strip()
+        if texto.lower() == 'inicio':
+            return DIA_INICIO
+        texto = texto.lower().removeprefix('día').removeprefix('dia').strip()
+        if not texto.isdigit():
+            raise ValueError(f"día de ejecución no reconocido: {valor!r}")
+        return int(texto)
+    numero = a_numero(valor)
+    if numero != int(numero):
+        raise ValueError(f"día de ejecución no reconocido: {valor!r}")
+    return int(numero)
+
+
+def validar_rdo(fila, parcial=False):
+    # Devuelve la fila con los tipos del esquema o ValueError con el primer problema.
+    # `parcial` valida sólo las columnas presentes (correcciones).
+    tipos_sql = dict(ESQUEMAS['rdo'])
+    if not parcial:
+        for c in OBLIGATORIAS_RDO:
+            if fila.get(c) in (None, ''):
+                raise ValueError(f"{c}: campo obligatorio.")
+    limpia = dict(fila)
+    for c, valor in fila.items():
+        if c not in tipos_sql or c == 'Contrato':
+            continue
+        try:
+            if c == 'Fecha':
+                limpia[c] = a_fecha(valor)
+            elif c == 'Día N':
+                limpia[c] = a_dia(valor)
+            elif tipos_sql[c] in ('REAL', 'INTEGER'):
+                if valor is None and c in ('CPI', 'SPI'):
+                    continue
+                limpia[c] = a_numero(valor) if tipos_sql[c] == 'REAL' else int(a_numero(valor))
+            elif c in CATEGORIAS_RDO:
+                limpia[c] = str(valor).strip() if valor not in (None, '') else None
+        except ValueError as e:
+            raise ValueError(f"{c}: {e}") from None
+        if c == 'Día N' and limpia[c] < 1:
+            raise ValueError("Día N: el día de ejecución debe ser 1 o mayor.")
+        if c in NO_NEGATIVAS_RDO and limpia[c] < 0:
+            raise ValueError(f"{c}: no puede ser negativo.")
+        if c in CATEGORIAS_RDO and limpia[c] is not None and limpia[c] not in CATEGORIAS_RDO[c]:
+            raise ValueError(f"{c}: '{limpia[c]}' no es una opción válida ({', '.join(CATEGORIAS_RDO[c])}).")
+    return limpia
+
+
+class ConflictoEdicion(ValueError):
+    # La fila cambió (o se eliminó) en otra sesión desde que se leyó: la vista debe recargarla
+    pass
+
+
+def _por_version(id_fila, version):
+    if version is None:
+        return "id = ?", [id_fila]
+    return "id = ? AND version = ?", [id_fila, int(version)]
+
+
+def _convertir_o_nulo(conversor, valor):
+    try:
+        return conversor(valor)
+    except ValueError:
+        return None
+
+
+# --- VERSIÓN DE FILA Y REGISTRO DE CAMBIOS ---
+# Cada fila lleva `version`, que sube con cada edición: corregir o eliminar con la
+# versión leída falla con ConflictoEdicion si otra sesión la cambió antes. Los
+# disparadores anotan en `cambios` la última secuencia en que cambió cada fila (por
+# registro y contrato), de modo que una réplica en memoria se pone al día leyendo
+# sólo esas filas (replica.py). La tabla guarda una entrada por fila, no por evento.
+_COLUMNAS_SISTEMA = "id INTEGER PRIMARY KEY, version INTEGER NOT NULL DEFAULT 1"
+
+
+def _crear_disparadores(con, registro):
+    seq = f"(SELECT IFNULL(MAX(seq), 0) + 1 FROM cambios WHERE registro = '{registro}' AND contrato = {{fila}}.Contrato)"
+    anotar = (
+        "INSERT INTO cambios (registro, id_fila, contrato, seq, borrado) "
+        f"VALUES ('{registro}', {{fila}}.id, {{fila}}.Contrato, {seq}, {{borrado}}) "
+        "ON CONFLICT(registro, id_fila) DO UPDATE SET contrato = excluded.contrato, "
+        "seq = excluded.seq, borrado = excluded.borrado;"
+    )
+    for evento, fila, borrado in (('INSERT', 'new', 0), ('UPDATE', 'new', 0), ('DELETE', 'old', 1)):
+        con.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {registro}_cambios_{evento.lower()} AFTER {evento} ON {registro} "
+            f"BEGIN {anotar.format(fila=fila, borrado=borrado)} END"
+        )
+
+
+# --- BITÁCORA DE AUDITORÍA (sólo se anexa, encadenada por hash) ---
+# Cada alta, corrección o baja de un RDO o de un asiento del Libro de Obra, y cada
+# reinicio de contrato, se anota en `bitacora` dentro de la misma transacción que la
+# escritura. Cada evento lleva el SHA-256 del anterior del mismo contrato: alterar,
+# quitar o reordenar un evento rompe la cadena desde ese punto. Los disparadores
+# rechazan modificar o borrar eventos; la verificación, las instantáneas y la
+# reconstrucción a una fecha están en auditoria.py. Se anotan las columnas ingresadas;
+# acumulados e índices se derivan de ellas.
+REGISTROS_BITACORA = ['rdo', 'lp']
+DERIVADAS = {'rdo': {'Físico Acum (%)', 'Financiero Acum ($)', 'HH Acum', 'Costo Real Acum ($)', 'CPI', 'SPI'}}
+HASH_INICIAL = '0' * 64
+
+
+def columnas_bitacora(registro):
+    return [c for c, _ in ESQUEMAS[registro] if c != 'Contrato' and c not in DERIVADAS.get(registro, ())]
+
+
+def hash_evento(previo, contrato, registro, id_fila, operacion, fecha, datos):
+    texto = "\x1f".join([previo, contrato, registro, '' if id_fila is None else str(id_fila), operacion, fecha, datos or ''])
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def crear_tabla_bitacora(con):
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS bitacora (seq INTEGER PRIMARY KEY AUTOINCREMENT, contrato TEXT NOT NULL, "
+        "registro TEXT NOT NULL, id_fila INTEGER, operacion TEXT NOT NULL, datos TEXT, fecha TEXT NOT NULL, "
+        "hash_previo TEXT NOT NULL, hash TEXT NOT NULL)"
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_bitacora_contrato ON bitacora (contrato, seq)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_bitacora_registro ON bitacora (contrato, registro, seq)")
+    for evento in ('UPDATE', 'DELETE'):
+        con.execute(
+            f"CREATE TRIGGER IF NOT EXISTS bitacora_sin_{evento.lower()} BEFORE {evento} ON bitacora "
+            "BEGIN SELECT RAISE(ABORT, 'La bitácora de auditoría sólo admite anotar eventos nuevos.'); END"
+        )
+
+
+def anotar(con, contrato, registro, eventos):
+    # eventos: [(id_fila, operacion, datos)] con datos ya en valores SQL (o None)
+    cabeza = con.execute(
+        "SELECT hash, fecha FROM bitacora WHERE contrato = ? ORDER BY seq DESC LIMIT 1", (contrato,)
+    ).fetchone()
+    previo, ultima = cabeza or (HASH_INICIAL, '')
+    # La fecha nunca retrocede dentro de un contrato aunque el reloj se ajuste
+    fecha = max(datetime.now().isoformat(timespec='microseconds'), ultima)
+    filas = []
+    for id_fila, operacion, datos in eventos:
+        texto = None if datos is None else json.dumps(datos, ensure_ascii=False, sort_keys=True)
+        nuevo = hash_evento(previo, contrato, registro, id_fila, operacion, fecha, texto)
+        filas.append((contrato, registro, id_fila, operacion, texto, fecha, previo, nuevo))
+        previo = nuevo
+    with medir(f"bd.bitacora:{registro}"):
+        con.executemany(
+            "INSERT INTO bitacora (contrato, registro, id_fila, operacion, datos, fecha, hash_previo, hash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            filas,
+        )
+
+
+def anotar_existentes(con):
+    # Bases anteriores a la bitácora: las filas de los contratos sin eventos entran como altas.
+    # Los contratos presentes se saltan de uno en uno por el índice (Contrato, fecha): el
+    # costo en cada arranque depende de cuántos contratos hay, no de cuántas filas.
+    for registro in REGISTROS_BITACORA:
+        columnas = columnas_bitacora(registro)
+        contratos = [c for (c,) in con.execute(
+            f"WITH RECURSIVE presentes(c) AS (SELECT MIN(Contrato) FROM {registro} "
+            f"UNION ALL SELECT (SELECT MIN(Contrato) FROM {registro} WHERE Contrato > c) FROM presentes "
+            "WHERE c IS NOT NULL) "
+            "SELECT c FROM presentes WHERE c IS NOT NULL AND NOT EXISTS "
+            "(SELECT 1 FROM bitacora b WHERE b.contrato = c AND b.registro = ?)", (registro,),
+        ).fetchall()]
+        for contrato in contratos:
+            filas = con.execute(
+                f"SELECT id, {', '.join(columna_sql(c) for c in columnas)} FROM {registro} "
+                "WHERE Contrato = ? ORDER BY id", (contrato,),
+            ).fetchall()
+            anotar(con, contrato, registro, [(f[0], 'alta', dict(zip(columnas, f[1:]))) for f in filas])
+
+
+def _datos_bitacora(registro, fila):
+    return {c: valor_sql(fila.get(c)) for c in columnas_bitacora(registro)}
+
+
+class Almacen:
+    def __init__(self, ruta=RUTA_BD):
+        self.ruta = ruta
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._local = threading.local()
+        self._crear_esquema()
+
+    # --- CONEXIONES (una por hilo; Streamlit atiende cada sesión en su propio hilo) ---
+    def _conexion(self):
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=30, isolation_level=None, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute("PRAGMA busy_timeout=30000")
+            self._local.con = con
+        return con
+
+    @contextmanager
+    def transaccion(self):
+        # BEGIN IMMEDIATE toma el candado de escritura al inicio: dos escritores
+        # concurrentes se serializan en vez de fallar a mitad de la transacción.
+        con = self._conexion()
+        self._local.modificados = set()
+        with medir("bd.transaccion"):
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                yield con
+                # La versión de cada partición modificada sube en la misma transacción:
+                # es la llave con la que se invalidan los cálculos en caché.
+                con.executemany(
+                    "INSERT INTO versiones (registro, contrato, version) VALUES (?, ?, 1) "
+                    "ON CONFLICT(registro, contrato) DO UPDATE SET version = version + 1",
+                    sorted(self._local.modificados),
+                )
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            else:
+                con.execute("COMMIT")
+
+    def marcar(self, registro, contrato):
+        self._local.modificados.add((registro, contrato))
+
+    def _crear_esquema(self):
+        with self.transaccion() as con:
+            columnas_versiones = {f[1] for f in con.execute("PRAGMA table_info(versiones)")}
+            if columnas_versiones and 'contrato' not in columnas_versiones:
+                con.execute("DROP TABLE versiones")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS versiones (registro TEXT NOT NULL, contrato TEXT NOT NULL, "
+                "version INTEGER NOT NULL, PRIMARY KEY (registro, contrato))"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS cambios (registro TEXT NOT NULL, id_fila INTEGER NOT NULL, "
+                "contrato TEXT, seq INTEGER NOT NULL, borrado INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (registro, id_fila)) WITHOUT ROWID"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_cambios_seq ON cambios (registro, contrato, seq)")
+            crear_tabla_bitacora(con)
+            for registro, columnas in ESQUEMAS.items():
+                defs = ", ".join(f"{columna_sql(c)} {t}" for c, t in columnas)
+                con.execute(f"CREATE TABLE IF NOT EXISTS {registro} ({_COLUMNAS_SISTEMA}, {defs})")
+                # Bases creadas con una versión anterior: se agregan las columnas nuevas
+                existentes = {f[1]: f[2] for f in con.execute(f"PRAGMA table_info({registro})")}
+                if 'version' not in existentes:
+                    con.execute(f"ALTER TABLE {registro} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+                for c, t in columnas:
+                    if c not in existentes:
+                        con.execute(f"ALTER TABLE {registro} ADD COLUMN {columna_sql(c)} {t}")
+                        existentes[c] = t
+                if any(existentes[c] != t for c, t in columnas):
+                    self._reconstruir(con, registro, columnas, existentes)
+                con.execute(f"DROP INDEX IF EXISTS idx_{registro}_fecha")
+                con.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{registro}_contrato_fecha "
+                    f"ON {registro} (Contrato, {columna_sql(COLUMNA_FECHA[registro])}, id)"
+                )
+                _crear_disparadores(con, registro)
+
+    def _reconstruir(self, con, registro, columnas, existentes):
+        # SQLite no cambia el tipo declarado de una columna: se copia la tabla con el
+        # esquema nuevo. Los textos que la afinidad nueva no convierte sola ("Día 12",
+        # "0.00 %") se pasan por el mismo conversor que la entrada; lo ilegible queda NULL.
+        defs = ", ".join(f"{columna_sql(c)} {t}" for c, t in columnas)
+        lista = ", ".join(columna_sql(c) for c, _ in columnas)
+        con.execute(f"DROP TABLE IF EXISTS {registro}__nuevo")
+        con.execute(f"CREATE TABLE {registro}__nuevo ({_COLUMNAS_SISTEMA}, {defs})")
+        con.execute(f"INSERT INTO {registro}__nuevo (id, version, {lista}) SELECT id, version, {lista} FROM {registro}")
+        con.execute(f"DROP TABLE {registro}")
+        con.execute(f"ALTER TABLE {registro}__nuevo RENAME TO {registro}")
+        for c, t in columnas:
+            if t not in ('INTEGER', 'REAL') or existentes[c] == t:
+                continue
+            conversor = a_dia if c == 'Día N' else a_numero
+            textos = con.execute(
+                f"SELECT id, {columna_sql(c)} FROM {registro} WHERE typeof({columna_sql(c)}) = 'text'"
+            ).fetchall()
+            con.executemany(
+                f"UPDATE {registro} SET {columna_sql(c)} = ? WHERE id = ?",
+                [(_convertir_o_nulo(conversor, v), i) for i, v in textos],
+            )
+
+    # --- ESCRITURA ---
+    def insertar(self, con, registro, fila):
+        self.marcar(registro, fila['Contrato'])
+        columnas = [c for c, _ in ESQUEMAS[registro]]
+        sql = (
+            f"INSERT INTO {registro} ({', '.join(columna_sql(c) for c in columnas)}) "
+            f"VALUES ({', '.join('?' for _ in columnas)})"
+        )
+        with medir(f"bd.insertar:{registro}"):
+            id_fila = con.execute(sql, [valor_sql(fila.get(c)) for c in columnas]).lastrowid
+        if registro in REGISTROS_BITACORA:
+            anotar(con, fila['Contrato'], registro, [(id_fila, 'alta', _datos_bitacora(registro, fila))])
+        return id_fila
+
+    def insertar_lote(self, con, registro, filas):
+        # Devuelve los id asignados (en el orden de filas) en los registros con bitácora
+        if not filas:
+            return []
+        for contrato in {f['Contrato'] for f in filas}:
+            self.marcar(registro, contrato)
+        columnas = [c for c, _ in ESQUEMAS[registro]]
+        anotado = registro in REGISTROS_BITACORA
+        ultimo_id = con.execute(f"SELECT IFNULL(MAX(id), 0) FROM {registro}").fetchone()[0] if anotado else None
+        with medir(f"bd.insertar_lote:{registro}"):
+            con.executemany(
+                f"INSERT INTO {registro} ({', '.join(columna_sql(c) for c in columnas)}) "
+                f"VALUES ({', '.join('?' for _ in columnas)})",
+                [[valor_sql(f.get(c)) for c in columnas] for f in filas],
+            )
+        if anotado:
+            # Sin id explícito SQLite asigna MAX(id) + 1: las filas nuevas quedan en orden de inserción
+            ids = [i for (i,) in con.execute(f"SELECT id FROM {registro} WHERE id > ? ORDER BY id", (ultimo_id,))]
+            for contrato in dict.fromkeys(f['Contrato'] for f in filas):
+                anotar(con, contrato, registro, [
+                    (i, 'alta', _datos_bitacora(registro, f)) for i, f in zip(ids, filas) if f['Contrato'] == contrato
+                ])
+            return ids
+
+    def actualizar(self, con, registro, id_fila, cambios, version=None):
+        # version: la leída por quien edita; si la fila cambió desde entonces, ConflictoEdicion
+        asignaciones = ", ".join(f"{columna_sql(c)} = ?" for c in cambios)
+        donde, parametros = _por_version(id_fila, version)
+        with medir(f"bd.actualizar:{registro}"):
+            contrato = con.execute(
+                f"UPDATE {registro} SET {asignaciones}, version = version + 1 WHERE {donde} RETURNING Contrato",
+                [valor_sql(v) for v in cambios.values()] + parametros,
+            ).fetchone()
+        if contrato:
+            self.marcar(registro, contrato[0])
+            anotadas = {c: valor_sql(v) for c, v in cambios.items() if c in columnas_bitacora(registro)}
+            if registro in REGISTROS_BITACORA and anotadas:
+                anotar(con, contrato[0], registro, [(id_fila, 'correccion', anotadas)])
+        elif version is not None:
+            raise ConflictoEdicion("El registro fue modificado o eliminado en otra sesión; revise los datos vigentes y vuelva a intentar.")
+
+    def eliminar(self, con, registro, id_fila, version=None):
+        donde, parametros = _por_version(id_fila, version)
+        with medir(f"bd.eliminar:{registro}"):
+            contrato = con.execute(f"DELETE FROM {registro} WHERE {donde} RETURNING Contrato", parametros).fetchone()
+        if contrato:
+            self.marcar(registro, contrato[0])
+            if registro in REGISTROS_BITACORA:
+                anotar(con, contrato[0], registro, [(id_fila, 'baja', None)])
+        elif version is not None:
+            raise ConflictoEdicion("El registro fue modificado o eliminado en otra sesión; revise los datos vigentes y vuelva a intentar.")
+
+    def leer_fila(self, con, registro, id_fila):
+        columnas = [c for c, _ in ESQUEMAS[registro]] + ['version']
+        fila = con.execute(
+            f"SELECT {', '.join(columna_sql(c) for c in columnas)} FROM {registro} WHERE id = ?", (id_fila,)
+        ).fetchone()
+        return dict(zip(columnas, fila)) if fila else None
+
+    def agregar(self, registro, fila):
+        with self.transaccion() as con:
+            return self.insertar(con, registro, fila)
+
+    def borrar_contrato(self, con, contrato):
+        # Sólo los registros con bitácora: lo borrado debe poder restaurarse. Días
+        # libres e informes no se anotan y quedan intactos.
+        for registro in REGISTROS_BITACORA:
+            self.vaciar(con, registro, contrato)
+
+    def vaciar(self, con, registro, contrato):
+        # Quita las filas del contrato; en la bitácora queda un solo evento de reinicio
+        self.marcar(registro, contrato)
+        borradas = con.execute(f"DELETE FROM {registro} WHERE Contrato = ?", (contrato,)).rowcount
+        if borradas and registro in REGISTROS_BITACORA:
+            anotar(con, contrato, registro, [(None, 'reinicio', None)])
+
+    # --- LECTURA (siempre dentro de la partición de un contrato) ---
+    def leer(self, registro, contrato, columnas=None, desde=None, hasta=None, limite=None, desplazamiento=0, descendente=False):
+        columnas = columnas or [c for c, _ in ESQUEMAS[registro] if c != 'Contrato']
+        col_fecha = columna_sql(COLUMNA_FECHA[registro])
+        condiciones, parametros = ["Contrato = ?"], [contrato]
+        if desde is not None:
+            condiciones.append(f"{col_fecha} >= ?")
+            parametros.append(valor_sql(desde))
+        if hasta is not None:
+            condiciones.append(f"{col_fecha} <= ?")
+            parametros.append(valor_sql(hasta))
+        sql = (
+            f"SELECT {', '.join(columna_sql(c) for c in columnas)} FROM {registro} "
+            f"WHERE {' AND '.join(condiciones)}"
+        )
+        orden = "DESC" if descendente else "ASC"
+        sql += f" ORDER BY {col_fecha} {orden}, id {orden}"
+        if limite is not None:
+            sql += " LIMIT ? OFFSET ?"
+            parametros += [limite, desplazamiento]
+        with medir(f"bd.leer:{registro}"):
+            filas = self._conexion().execute(sql, parametros).fetchall()
+            return aplicar_tipos(registro, pd.DataFrame(filas, columns=columnas))
+
+    def iterar(self, registro, contrato, columnas=None, tamano=5000):
+        # Recorre la partición completa en bloques de `tamano` filas sin cargarla entera
+        columnas = columnas or [c for c, _ in ESQUEMAS[registro] if c != 'Contrato']
+        col_fecha = columna_sql(COLUMNA_FECHA[registro])
+        cursor = self._conexion().execute(
+            f"SELECT {', '.join(columna_sql(c) for c in columnas)} FROM {registro} "
+            f"WHERE Contrato = ? ORDER BY {col_fecha}, id",
+            (contrato,),
+        )
+        while True:
+            filas = cursor.fetchmany(tamano)
+            if not filas:
+                break
+            yield aplicar_tipos(registro, pd.DataFrame(filas, columns=columnas))
+
+    def leer_ids(self, registro, ids, columnas=None):
+        # Filas sueltas por id (réplicas que se ponen al día), en bloques que caben en un IN
+        columnas = columnas or [c for c, _ in ESQUEMAS[registro] if c != 'Contrato']
+        ids = list(ids)
+        filas = []
+        with medir(f"bd.leer_ids:{registro}"):
+            for i in range(0, len(ids), 900):
+                bloque = ids[i:i + 900]
+                filas += self._conexion().execute(
+                    f"SELECT {', '.join(columna_sql(c) for c in columnas)} FROM {registro} "
+                    f"WHERE id IN ({', '.join('?' for _ in bloque)})", bloque,
+                ).fetchall()
+        return aplicar_tipos(registro, pd.DataFrame(filas, columns=columnas))
+
+    def version_fila(self, registro, id_fila):
+        fila = self.consultar(f"SELECT version FROM {registro} WHERE id = ?", (id_fila,))
+        return fila[0][0] if fila else None
+
+    def cambios(self, registro, contrato, desde=0):
+        # [(id_fila, borrado, seq)] de las filas que cambiaron después de la secuencia `desde`
+        return self.consultar(
+            "SELECT id_fila, borrado, seq FROM cambios WHERE registro = ? AND contrato = ? AND seq > ? ORDER BY seq",
+            (registro, contrato, desde),
+        )
+
+    def ultimo_cambio(self, registro, contrato):
+        return self.consultar(
+            "SELECT IFNULL(MAX(seq), 0) FROM cambios WHERE registro = ? AND contrato = ?", (registro, contrato)
+        )[0][0]
+
+    def ultimo(self, registro, contrato, columnas=None):
+        df = self.leer(registro, contrato, columnas=columnas, limite=1, descendente=True)
+        return df.iloc[0] if not df.empty else None
+
+    def consultar(self, sql, parametros=()):
+        with medir("bd.consultar"):
+            return self._conexion().execute(sql, parametros).fetchall()
+
+    def recorrer(self, sql, parametros=(), tamano=5000):
+        # Como consultar(), pero entrega el resultado en bloques de `tamano` filas
+        cursor = self._conexion().execute(sql, parametros)
+        while True:
+            filas = cursor.fetchmany(tamano)
+            if not filas:
+                break
+            yield filas
+
+    def version(self, registro, contrato):
+        fila = self.consultar(
+            "SELECT version FROM versiones WHERE registro = ? AND contrato = ?", (registro, contrato)
+        )
+        return fila[0][0] if fila else 0
+
+    def contar(self, registro, contrato):
+        return self.consultar(f"SELECT COUNT(*) FROM {registro} WHERE Contrato = ?", (contrato,))[0][0]
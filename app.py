@@ -1,127 +1,126 @@
+import html
+import json
+import os
+from pathlib import Path
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime, date
+from datetime import datetime, date, time
+
+from almacenamiento import Almacen, CATEGORIAS_RDO, RUTA_BD, sin_inicio, validar_rdo
+from acumulados import LibroAcumulados
+from cartera import Cartera
+from libro_obra import LibroObra, ESTADOS_LP, TAMANO_PAGINA
+from dias_libres import DiasLibres, CARGOS, MOTIVOS, ESTADOS_LDO, figura_cobertura
+import tablero
+import valor_ganado
+import importacion
+import informes
+import instrumentacion
+from ficha import RUTA_RECURSOS, ficha_html
+from fotos import AlmacenFotos, LISTA, PENDIENTE
+from captura import CON_ERROR, EN_COLA, SINCRONIZADO, ColaCaptura, id_envio, nuevo_id
+from replica import Replica
+from auditoria import Bitacora
 
 # --- CONFIGURACIÓN DE LA PÁGINA ---
-st.set_page_config(layout="wide", page_title="FISCALPIÑAS - SISTEMA INTEGRAL", page_icon="⚡")
-
-# --- VARIABLES DEL CONTRATO ---
-MONTO_TOTAL_PROYECTO = 3899999.22
-NOMBRE_FISCALIZADOR = "CONSORCIO FISCALPIÑAS"
-
-# --- DATOS FICHA TÉCNICA ---
-datos_ficha = {
-    "Entidad": "CNEL EP - UNIDAD DE NEGOCIO EL ORO",
-    "Categoría": "CONSTRUCCIÓN DE SUBESTACIONES ELÉCTRICAS",
-    "Objeto": "EOR Construccion de la subestacion Pinas y su linea de subtransmision GD",
-    "Código": "LICO-CNELEP-2025-1",
-    "Plazo": "450 Días Calendario",
-    "Contratista": "CONSORCIO PIÑAS INPI",
-    "Rep_Legal": "PILEGGI CONSTRUCCIONES C.LTDA.",
-    "Monto_Str": "$ 3,899,999.22",
-    "Link": "https://www.compraspublicas.gob.ec/ProcesoContratacion/compras/PC/resumenAdjudicacion.cpe?solicitud=V_550at-6mzyMx9KwoPuuaByned8HAHsT3R-uscx9wE,"
-}
-
-# --- GESTIÓN DE MEMORIA (DATAFRAME) ---
-if 'data_fiscalpinas' not in st.session_state:
-    st.session_state['data_fiscalpinas'] = pd.DataFrame({
-        'Fecha': [date(2025, 1, 1)],
-        'Día N': ['Inicio'],
-        'Físico Diario (%)': [0.0],
-        'Inversión Diaria ($)': [0.0],
-        'Físico Acum (%)': [0.0],
-        'Financiero Acum ($)': [0.0],
-        'Hito Civil (%)': [0.0],
-        'Hito Eléctrico (%)': [0.0],
-        'Horas Hombre': [0.0],
-        'Personal Detalle': ['Inicio'],
-        'Incidentes': ['Sin Novedad'],
-        'Contratos Comp': ['Ninguno'],
-        'Ordenes Trabajo': ['Ninguna'],
-        'Incremento Cant': ['0.00'],
-        'Control Cantidades': ['SI'],
-        'CPI': [1.0],
-        'SPI': [1.0],
-        'Detalle': ['Inicio de Contrato'],
-        'Fotos': [0]
-    })
+st.set_page_config(layout="wide", page_title="FISCALPIÑAS - SISTEMA INTEGRAL", page_icon=Path(RUTA_RECURSOS, "icono.svg"))
+marca_script = instrumentacion.iniciar("script")
+
+# --- ALMACENAMIENTO PERSISTENTE ---
+@st.cache_resource
+def obtener_almacen():
+    return Almacen()
+
+@st.cache_resource
+def obtener_cartera():
+    return Cartera(obtener_almacen())
+
+@st.cache_resource
+def obtener_libro(contrato, monto_total):
+    return LibroAcumulados(obtener_almacen(), contrato, monto_total)
+
+@st.cache_resource
+def obtener_libro_obra(contrato):
+    return LibroObra(obtener_almacen(), contrato)
+
+@st.cache_resource
+def obtener_dias_libres(contrato):
+    return DiasLibres(obtener_almacen(), contrato)
 
-# --- NUEVAS BASES DE DATOS (MÓDULOS NUEVOS) ---
-if 'data_ldo' not in st.session_state:
-    st.session_state['data_ldo'] = pd.DataFrame(columns=[
-        'Funcionario', 'Cargo', 'Fecha Salida', 'Fecha Retorno', 
-        'Días Totales', 'Reemplazo', 'Tipo', 'Estado'
-    ])
+@st.cache_resource
+def obtener_generador():
+    return informes.GeneradorInformes(obtener_almacen())
 
-if 'data_reportes' not in st.session_state:
-    st.session_state['data_reportes'] = pd.DataFrame(columns=[
-        'Periodo', 'Tipo', 'Hitos', 'Alertas', 'Fecha Emisión', 'Archivo'
-    ])
+@st.cache_resource
+def obtener_fotos():
+    return AlmacenFotos(obtener_almacen())
 
-if 'data_lp' not in st.session_state:
-    st.session_state['data_lp'] = pd.DataFrame(columns=[
-        'Folio', 'Fecha', 'Asunto', 'Instrucción', 
-        'Ref. Técnica', 'Plazo', 'Estado'
-    ])
+@st.cache_resource
+def obtener_cola():
+    return ColaCaptura(obtener_almacen())
+
+@st.cache_resource
+def obtener_bitacora():
+    return Bitacora(obtener_almacen())
+
+@st.cache_resource
+def obtener_replica_rdo(contrato):
+    return Replica(obtener_almacen(), 'rdo', contrato, tablero.COLUMNAS_TABLERO)
+
+# --- RECURSOS LOCALES (la página no espera a servidores externos) ---
+LOGO = os.path.join(RUTA_RECURSOS, "logo_cnel.svg")
+
+# Fotos y cola de captura se crean al entrar al primer módulo que las usa
+almacen = obtener_almacen()
+cartera = obtener_cartera()
 
 if 'pagina_actual' not in st.session_state:
     st.session_state.pagina_actual = "RDO"
+# Id de cada formulario para la cola de captura (los envíos se identifican con él y su
+# contenido). Se renueva tras registrar: un reenvío no duplica, un envío nuevo sí se registra
+for formulario in ('rdo', 'lp'):
+    if f'id_form_{formulario}' not in st.session_state:
+        st.session_state[f'id_form_{formulario}'] = nuevo_id()
 
 # --- FUNCIONES AUXILIARES ---
 def reset_app():
-    keys = ['data_fiscalpinas', 'data_ldo', 'data_reportes', 'data_lp']
-    for k in keys:
-        if k in st.session_state: del st.session_state[k]
+    cartera.reiniciar(contrato_activo)
+    libro.recalcular()
     st.rerun()
 
 def dibujar_ficha_tecnica():
-    estilo_tabla = """
-    <style>
-        .ficha-tecnica {width: 100%; border-collapse: collapse; margin-bottom: 20px; font-family: Arial, sans-serif; font-size: 13px; border: 1px solid #ddd;}
-        .ficha-tecnica th {background-color: #1E3A8A; color: white; padding: 8px; text-align: center; border: 1px solid #ddd;}
-        .ficha-tecnica td {padding: 8px; border: 1px solid #ddd; background-color: #f9f9f9; color: #333;}
-        .label-cell {font-weight: bold; background-color: #eef2ff; width: 15%;}
-    </style>
-    """
-    html_ficha = f"""
-    {estilo_tabla}
-    <table class="ficha-tecnica">
-        <tr><th colspan="4">FICHA TÉCNICA DEL PROYECTO (CONTRATO DE OBRA)</th></tr>
-        <tr>
-            <td class="label-cell">Entidad:</td><td width="35%">{datos_ficha['Entidad']}</td>
-            <td class="label-cell">Categoría:</td><td width="35%">{datos_ficha['Categoría']}</td>
-        </tr>
-        <tr><td class="label-cell">Objeto:</td><td colspan="3">{datos_ficha['Objeto']}</td></tr>
-        <tr>
-            <td class="label-cell">Código:</td><td>{datos_ficha['Código']}</td>
-            <td class="label-cell">Plazo:</td><td>{datos_ficha['Plazo']}</td>
-        </tr>
-        <tr>
-            <td class="label-cell">Contratista:</td><td>{datos_ficha['Contratista']}</td>
-            <td class="label-cell">Rep. Legal:</td><td>{datos_ficha['Rep_Legal']}</td>
-        </tr>
-        <tr>
-            <td class="label-cell">Monto:</td><td style="font-weight:bold; color:#b91c1c;">{datos_ficha['Monto_Str']}</td>
-            <td class="label-cell">Enlace:</td><td><a href="{datos_ficha['Link']}" target="_blank">Ver en SERCOP</a></td>
-        </tr>
-    </table>
-    """
-    st.markdown(html_ficha, unsafe_allow_html=True)
+    with instrumentacion.medir("ficha_tecnica"):
+        st.markdown(ficha_html(datos_ficha), unsafe_allow_html=True)
 
 # --- SIDEBAR ---
-st.sidebar.image("https://upload.wikimedia.org/wikipedia/commons/e/e4/Logotipo_de_CNEL.svg", width=140)
+st.sidebar.image(LOGO, width=140)
 st.sidebar.title("CONTROL DE OBRA")
+
+# --- CONTRATO ACTIVO (cada contrato carga sólo su propia partición de datos) ---
+contratos = cartera.contratos()
+contrato_activo = st.sidebar.selectbox(
+    "Contrato activo:", list(contratos), format_func=lambda c: f"{c} | {(contratos[c] or '')[:40]}"
+)
+datos_ficha = cartera.ficha(contrato_activo)
+MONTO_TOTAL_PROYECTO = datos_ficha['Monto']
+NOMBRE_FISCALIZADOR = datos_ficha['Fiscalizador']
+libro = obtener_libro(contrato_activo, MONTO_TOTAL_PROYECTO)
+
 opcion = st.sidebar.radio("Navegación:", [
     "MÓDULO 1: RDO (Ingreso)", 
     "MÓDULO 2: DASHBOARD (Reporte)",
     "MÓDULO 3: DÍAS LIBRES (LDO)",
     "MÓDULO 4: REPORTES GESTIÓN",
-    "MÓDULO 5: LIBRO DE OBRA (LP)"
+    "MÓDULO 5: LIBRO DE OBRA (LP)",
+    "MÓDULO 6: CARTERA DE CONTRATOS"
 ])
 st.sidebar.markdown("---")
-if st.sidebar.button("🗑️ BORRAR TODO"): reset_app()
+with st.sidebar.popover("🗑️ BORRAR TODO"):
+    st.caption("Reinicia el RDO y el Libro de Obra del contrato activo. Lo borrado queda en la "
+               "bitácora de auditoría y puede restaurarse desde el MÓDULO 5.")
+    if st.button("Confirmar reinicio", type="primary"): reset_app()
+
+marca_modulo = instrumentacion.iniciar(f"modulo:{opcion.split(':')[0]}")
 
 # ==============================================================================
 # MÓDULO 1: RDO (INGRESO DE DATOS) - INTACTO
@@ -129,19 +128,22 @@ if st.sidebar.button("🗑️ BORRAR TODO"): reset_app()
 if opcion == "MÓDULO 1: RDO (Ingreso)":
     st.markdown("### MÓDULO 1: REGISTRO DIARIO DE OBRA (RDO)")
     dibujar_ficha_tecnica()
+    fotos = obtener_fotos()
+    cola = obtener_cola()
     
-    df = st.session_state['data_fiscalpinas']
-    ultimo = df.iloc[-1]
+    ultimo = libro.totales()
     prev_acum_fin = ultimo['Financiero Acum ($)']
     prev_acum_fis = ultimo['Físico Acum (%)']
+    prev_acum_ac = ultimo['Costo Real Acum ($)']
 
     with st.form("formulario_rdo"):
         # --- SECCIÓN A: GENERALES ---
         st.info("A. Datos Generales y Económicos")
         c1, c2, c3 = st.columns(3)
         in_fecha = c1.date_input("1. Fecha de Emisión", date.today())
-        in_dia = c2.text_input("9. Día de ejecución", placeholder="Ej: Día 12")
-        in_clima = c3.selectbox("10. Condiciones climáticas", ["Soleado", "Nublado", "Lluvia", "Tormenta"])
+        in_dia = c2.number_input("9. Día de ejecución", min_value=1, step=1,
+                                 value=max(1, (date.today() - datos_ficha['Fecha Inicio']).days + 1))
+        in_clima = c3.selectbox("10. Condiciones climáticas", CATEGORIAS_RDO['Clima'])
 
         c4, c5 = st.columns(2)
         c4.text_input("7. Datos Económicos del Contrato", "Fiscalización (Variable)", disabled=True)
@@ -153,12 +155,15 @@ if opcion == "MÓDULO 1: RDO (Ingreso)":
         # PUNTO 11
         col_m1, col_m2 = st.columns(2)
         in_monto_diario = col_m1.number_input("11. Curva de Avance $ ($ de Avance del día)", min_value=0.0, step=1000.0)
+        in_costo_real = col_m1.number_input("11.1 Costo Real del día (AC)", min_value=0.0, step=1000.0)
         
         # CÁLCULOS
         pct_diario = (in_monto_diario / MONTO_TOTAL_PROYECTO) * 100
         nuevo_acum_fin = prev_acum_fin + in_monto_diario
         nuevo_acum_fis = prev_acum_fis + pct_diario
         if nuevo_acum_fis > 100: nuevo_acum_fis = 100.0
+        nuevo_acum_ac = prev_acum_ac + in_costo_real
+        pv_fecha = libro.pv_al(in_fecha)
 
         col_m2.metric("Avance Acumulado Proyectado", f"{nuevo_acum_fis:.4f} %", f"$ {nuevo_acum_fin:,.2f}")
 
@@ -181,8 +186,8 @@ if opcion == "MÓDULO 1: RDO (Ingreso)":
         
         col_rec1, col_rec2, col_rec3 = st.columns(3)
         in_hh = col_rec1.number_input("Reg. Horas Hombre (Diario)", min_value=0.0, step=1.0)
-        in_incidente = col_rec2.selectbox("Reg. de Incidentes", ["Sin Novedad", "Incidente Leve", "Accidente con Baja", "Daño Material"])
-        in_control = col_rec3.selectbox("Control Tabla de Cantidades", ["SI - Verificado", "NO - Pendiente", "Con Observaciones"])
+        in_incidente = col_rec2.selectbox("Reg. de Incidentes", CATEGORIAS_RDO['Incidentes'])
+        in_control = col_rec3.selectbox("Control Tabla de Cantidades", CATEGORIAS_RDO['Control Cantidades'])
 
         in_personal = st.text_area("Personal y Equipos (Detalle)", placeholder="Ej: 1 Ing. Residente, 5 Linieros, 1 Grúa...", height=70)
 
@@ -190,13 +195,15 @@ if opcion == "MÓDULO 1: RDO (Ingreso)":
         ca1, ca2, ca3 = st.columns(3)
         in_contratos_comp = ca1.text_input("Reg. Contratos Complementarios", "Ninguno")
         in_ordenes = ca2.text_input("Reg. Órdenes de Trabajo", "Ninguna")
-        in_incremento = ca3.text_input("Reg. Incremento Cantidades", "0.00 %")
+        in_incremento = ca3.number_input("Reg. Incremento Cantidades (%)", value=0.0, step=0.01, format="%.2f")
 
         # --- SECCIÓN D: DETALLE Y CIERRE ---
         st.info("D. Detalle Cualitativo y Firmas")
+        # PUNTO 14: calculados por el motor de valor ganado (EV/AC y EV/PV de la línea base)
         col_ind1, col_ind2 = st.columns(2)
-        in_cpi = col_ind1.number_input("14. CPI (Costo)", 1.00)
-        in_spi = col_ind2.number_input("14. SPI (Cronograma)", 1.00)
+        col_ind1.metric("14. CPI (Costo)", f"{nuevo_acum_fin / nuevo_acum_ac:.2f}" if nuevo_acum_ac > 0 else "—")
+        col_ind2.metric("14. SPI (Cronograma)", f"{nuevo_acum_fin / pv_fecha:.2f}" if pv_fecha else "—",
+                        help=None if pv_fecha else "Cargue la línea base del contrato para calcular el SPI.")
         
         st.text_input("Porcentaje total del proyecto (Calculado)", f"{nuevo_acum_fis:.4f}%", disabled=True)
 
@@ -209,22 +216,157 @@ if opcion == "MÓDULO 1: RDO (Ingreso)":
         in_firmas = cf2.text_input("20. Firmas de Responsabilidad")
 
         if st.form_submit_button("💾 GUARDAR RDO DIARIO"):
-            if not in_dia or not in_actividades or not in_firmas:
+            if not in_actividades or not in_firmas:
                 st.error("⚠️ Faltan campos obligatorios.")
             else:
                 nuevo_reg = {
-                    'Fecha': in_fecha, 'Día N': in_dia,
+                    'Fecha': in_fecha, 'Día N': in_dia, 'Clima': in_clima,
                     'Físico Diario (%)': pct_diario, 'Inversión Diaria ($)': in_monto_diario,
                     'Físico Acum (%)': nuevo_acum_fis, 'Financiero Acum ($)': nuevo_acum_fin,
+                    'Costo Real Diario ($)': in_costo_real,
                     'Hito Civil (%)': in_hito_civ, 'Hito Eléctrico (%)': in_hito_ele,
                     'Horas Hombre': in_hh, 'Personal Detalle': in_personal,
                     'Incidentes': in_incidente, 'Contratos Comp': in_contratos_comp,
                     'Ordenes Trabajo': in_ordenes, 'Incremento Cant': in_incremento,
-                    'Control Cantidades': in_control, 'CPI': in_cpi, 'SPI': in_spi,
+                    'Control Cantidades': in_control,
                     'Detalle': in_actividades, 'Fotos': len(in_fotos) if in_fotos else 0
                 }
-                st.session_state['data_fiscalpinas'] = pd.concat([df, pd.DataFrame([nuevo_reg])], ignore_index=True)
-                st.success("✅ RDO GUARDADO CORRECTAMENTE")
+                try:
+                    validar_rdo(nuevo_reg)
+                except ValueError as e:
+                    st.error(f"⚠️ {e}")
+                else:
+                    # Primero a la cola (un reenvío del mismo formulario no duplica) y luego
+                    # se sincroniza todo lo pendiente del contrato
+                    envio = cola.encolar(contrato_activo, 'rdo', id_envio(st.session_state.id_form_rdo, 'rdo', nuevo_reg), nuevo_reg)
+                    if envio['estado'] == EN_COLA:
+                        cola.sincronizar(libro, obtener_libro_obra(contrato_activo))
+                        envio = cola.estado([envio['id_cliente']])[0]
+                    if envio['estado'] == SINCRONIZADO:
+                        st.session_state.id_form_rdo = nuevo_id()
+                        try:
+                            if in_fotos:
+                                # Escritura en disco y miniaturas continúan en segundo plano
+                                fotos.guardar(int(envio['resultado']), in_fotos)
+                        except ValueError as e:
+                            st.error(f"⚠️ {e}")
+                        else:
+                            st.success("✅ RDO GUARDADO CORRECTAMENTE")
+                    else:
+                        st.error(f"⚠️ {envio['error'] or 'El RDO quedó en cola; se registrará al sincronizar.'}")
+
+    # --- CORRECCIÓN DE RDO (actualiza sólo los días posteriores y el mes afectado) ---
+    # La lista de RDO (toda la partición) sólo se lee con el expansor abierto
+    with st.expander("✏️ CORREGIR / ELIMINAR RDO REGISTRADO", key="expansor_correccion", on_change="rerun") as expansor_correccion:
+        if expansor_correccion.open:
+            df_corr = almacen.leer('rdo', contrato_activo, ['id', 'version', 'Fecha', 'Día N', 'Inversión Diaria ($)', 'Horas Hombre'])
+            df_corr = sin_inicio(df_corr)
+            if df_corr.empty:
+                st.info("No hay RDO registrados.")
+            else:
+                etiquetas = dict(zip(df_corr['id'], df_corr['Fecha'].dt.strftime('%Y-%m-%d') + " | Día " + df_corr['Día N'].astype(str)))
+                id_corr = st.selectbox("RDO a corregir", list(etiquetas), format_func=etiquetas.get)
+                fila_corr = df_corr[df_corr['id'] == id_corr].iloc[0]
+                # Control optimista: vale la versión que dibujó el formulario (ejecución anterior);
+                # si otra sesión cambió el RDO desde entonces, la corrección se rechaza
+                en_pantalla = st.session_state.get('rdo_en_edicion')
+                version_corr = en_pantalla[1] if en_pantalla and en_pantalla[0] == id_corr else int(fila_corr['version'])
+                with st.form("corregir_rdo"):
+                    k1, k2, k3 = st.columns(3)
+                    corr_fecha = k1.date_input("Fecha", fila_corr['Fecha'].date())
+                    corr_monto = k2.number_input("$ de Avance del día", min_value=0.0, value=float(fila_corr['Inversión Diaria ($)']), step=1000.0)
+                    corr_hh = k3.number_input("Horas Hombre", min_value=0.0, value=float(fila_corr['Horas Hombre']), step=1.0)
+                    b1, b2 = st.columns(2)
+                    if b1.form_submit_button("💾 GUARDAR CORRECCIÓN"):
+                        try:
+                            libro.corregir(int(id_corr), {'Fecha': corr_fecha, 'Inversión Diaria ($)': corr_monto, 'Horas Hombre': corr_hh},
+                                           version=version_corr)
+                        except ValueError as e:
+                            st.error(f"⚠️ {e}")
+                        else:
+                            st.success("✅ RDO corregido; acumulados actualizados.")
+                    if b2.form_submit_button("🗑️ ELIMINAR RDO"):
+                        try:
+                            libro.eliminar(int(id_corr), version=version_corr)
+                        except ValueError as e:
+                            st.error(f"⚠️ {e}")
+                        else:
+                            st.success("✅ RDO eliminado; acumulados actualizados.")
+                st.session_state.rdo_en_edicion = (id_corr, almacen.version_fila('rdo', int(id_corr)))
+            v1, v2 = st.columns(2)
+            if v1.button("🔎 Verificar acumulados"):
+                filas_mal, meses_mal = libro.verificar()
+                if filas_mal.empty and meses_mal.empty:
+                    st.success("Acumulados consistentes con el recálculo completo.")
+                else:
+                    st.error(f"⚠️ {len(filas_mal)} días y {len(meses_mal)} meses descuadrados. Use 'Recalcular acumulados'.")
+            if v2.button("♻️ Recalcular acumulados"):
+                libro.recalcular()
+                st.success("Acumulados recalculados.")
+
+    # --- LÍNEA BASE (CRONOGRAMA VALORADO) ---
+    with st.expander("📅 LÍNEA BASE DEL CONTRATO (CRONOGRAMA VALORADO)"):
+        st.caption(
+            "Excel con columna 'Fecha' y una de: 'PV ($)' (valor del periodo), 'PV Acum ($)' "
+            "o 'Avance Planificado (%)'. Se interpola a una curva diaria de Valor Planificado (PV)."
+        )
+        in_cronograma = st.file_uploader("Cronograma (.xlsx)", type=["xlsx"], key="cronograma")
+        if in_cronograma and st.button("Cargar línea base"):
+            try:
+                cronograma = valor_ganado.leer_cronograma(in_cronograma, MONTO_TOTAL_PROYECTO)
+                pv = valor_ganado.curva_pv_diaria(cronograma, datos_ficha['Fecha Inicio'], datos_ficha['Plazo Días'])
+                libro.cargar_linea_base(pv)
+                st.success(f"Línea base cargada: {len(pv)} días, PV final $ {pv.iloc[-1]:,.2f}.")
+            except ValueError as e:
+                st.error(f"⚠️ {e}")
+
+    # --- CARGA MASIVA DE RDO ---
+    with st.expander("📥 CARGA MASIVA DE RDO (Excel/CSV)"):
+        st.caption(
+            "Una fila por RDO con los mismos encabezados del formulario ('Fecha' y 'Día N' obligatorios). "
+            "Los acumulados, CPI y SPI se calculan al final de la carga; las filas con errores se omiten y se listan."
+        )
+        in_masivo = st.file_uploader("Archivo de RDO (.xlsx / .csv)", type=["xlsx", "csv"], key="carga_masiva")
+        if in_masivo and st.button("Importar RDO"):
+            try:
+                with st.spinner("Importando..."):
+                    insertadas, errores = importacion.importar_rdo(in_masivo, in_masivo.name, libro)
+            except ValueError as e:
+                st.error(f"⚠️ {e}")
+            else:
+                st.success(f"{insertadas} RDO importados.")
+                if not errores.empty:
+                    st.warning(f"{len(errores)} filas con errores no se importaron:")
+                    st.dataframe(errores, use_container_width=True, hide_index=True)
+
+    # --- COLA DE CAPTURA (envíos sin sincronizar y lotes capturados sin conexión) ---
+    with st.expander(f"📶 COLA DE CAPTURA ({cola.contar_pendientes(contrato_activo)} pendientes)"):
+        st.caption(
+            "Cada RDO o asiento se guarda primero en la cola con un id único; reenviar el mismo formulario "
+            "no lo duplica. Un lote JSON capturado en campo ([{\"id_cliente\", \"registro\": \"rdo\"|\"lp\", \"datos\"}]) "
+            "puede cargarse varias veces: sólo se registran las entradas nuevas."
+        )
+        in_lote = st.file_uploader("Lote de captura (.json)", type=["json"], key="lote_captura")
+        q1, q2 = st.columns(2)
+        if in_lote and q1.button("📥 Encolar lote"):
+            try:
+                estados = cola.encolar_lote(contrato_activo, json.load(in_lote))
+                st.success(f"{sum(e['estado'] == EN_COLA for e in estados)} entradas nuevas en cola.")
+            except (ValueError, TypeError, AttributeError) as e:
+                st.error(f"⚠️ Lote no válido: {e}")
+        if q2.button("🔄 Sincronizar ahora"):
+            resultado = cola.sincronizar(libro, obtener_libro_obra(contrato_activo))
+            st.success(f"{resultado['sincronizadas']} entradas registradas, {resultado['errores']} con error.")
+        df_cola = cola.pendientes(contrato_activo)
+        if not df_cola.empty:
+            st.dataframe(df_cola, use_container_width=True, hide_index=True)
+            con_error = df_cola.loc[df_cola['Estado'] == CON_ERROR, 'Id'].tolist()
+            if con_error:
+                id_descartar = st.selectbox("Entrada con error", con_error,
+                                            format_func=dict(zip(df_cola['Id'], df_cola['Entrada'])).get)
+                if st.button("🗑️ Descartar entrada"):
+                    cola.descartar(id_descartar)
+                    st.rerun()
 
 # ==============================================================================
 # MÓDULO 2: DASHBOARD - INTACTO (CON CORRECCIONES DE ERRORES)
@@ -234,44 +376,73 @@ elif opcion == "MÓDULO 2: DASHBOARD (Reporte)":
     st.markdown("""<style>@media print {[data-testid="stSidebar"], header, footer, .stButton {display: none;}}</style>""", unsafe_allow_html=True)
     
     dibujar_ficha_tecnica()
-    df = st.session_state['data_fiscalpinas']
-    
-    # Definir 'ultimo' antes para evitar NameError
-    ultimo = df.iloc[-1]
-
-    if len(df) > 1:
-        df_real = df.iloc[1:].copy()
-    else:
-        df_real = df.copy()
+    version_rdo = (almacen.version('rdo', contrato_activo), almacen.version('linea_base', contrato_activo))
+    datos = tablero.datos_tablero(almacen, libro, contrato_activo, version_rdo, MONTO_TOTAL_PROYECTO,
+                                  obtener_replica_rdo(contrato_activo))
+    df = datos['rdo']
+    ultimo = datos['ultimo']
+
+    # Otra sesión registró o corrigió un RDO: el tablero se vuelve a dibujar solo y
+    # la réplica lee únicamente las filas que cambiaron
+    @st.fragment(run_every=tablero.SEGUNDOS_ACTUALIZACION)
+    def vigilar_rdo():
+        if (almacen.version('rdo', contrato_activo), almacen.version('linea_base', contrato_activo)) != version_rdo:
+            st.rerun()
+    vigilar_rdo()
+
+    def grafico(nombre):
+        with instrumentacion.medir(f"grafico:{nombre}"):
+            fig = tablero.figura(nombre, contrato_activo, version_rdo, MONTO_TOTAL_PROYECTO, datos, *periodo_graficos)
+            st.plotly_chart(fig, use_container_width=True)
+        instrumentacion.carga(f"grafico:{nombre}", fig)
 
     st.markdown(f"**Fecha de Emisión:** {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+
+    # 1. INDICADORES DE VALOR GANADO (al último RDO)
+    evm = datos['evm_actual']
+    e1, e2, e3, e4, e5, e6, e7, e8 = st.columns(8)
+    for col, clave, fmt in [
+        (e1, 'PV', "$ {:,.0f}"), (e2, 'EV', "$ {:,.0f}"), (e3, 'AC', "$ {:,.0f}"),
+        (e4, 'CPI', "{:.2f}"), (e5, 'SPI', "{:.2f}"),
+        (e6, 'EAC', "$ {:,.0f}"), (e7, 'ETC', "$ {:,.0f}"), (e8, 'VAC', "$ {:,.0f}"),
+    ]:
+        col.metric(clave, fmt.format(evm[clave]) if pd.notna(evm[clave]) else "—")
     
     # 2. TABLA RESUMEN
     st.subheader("2. Resumen de Avance Acumulado")
-    cols_view = ['Fecha', 'Día N', 'Físico Acum (%)', 'Financiero Acum ($)', 'Horas Hombre', 'Incidentes']
-    st.dataframe(df[cols_view].style.format({
-        'Físico Acum (%)': "{:.3f}%", 
-        'Financiero Acum ($)': "$ {:,.2f}",
-        'Horas Hombre': "{:.1f}"
-    }), use_container_width=True, height=200)
+    cols_view = ['Fecha', 'Día N', 'Físico Acum (%)', 'Financiero Acum ($)', 'Costo Real Acum ($)', 'CPI', 'SPI', 'Horas Hombre', 'Incidentes']
+    df_resumen = df[cols_view]
+    # Formato por columna en el cliente: el Styler de pandas no admite más de 262k celdas
+    instrumentacion.carga("tabla:resumen_avance", df_resumen)
+    st.dataframe(df_resumen, use_container_width=True, height=200, hide_index=True, column_config={
+        'Fecha': st.column_config.DateColumn(format="YYYY-MM-DD"),
+        'Físico Acum (%)': st.column_config.NumberColumn(format="%.3f%%"),
+        'Financiero Acum ($)': st.column_config.NumberColumn(format="$ %.2f"),
+        'Costo Real Acum ($)': st.column_config.NumberColumn(format="$ %.2f"),
+        'CPI': st.column_config.NumberColumn(format="%.2f"),
+        'SPI': st.column_config.NumberColumn(format="%.2f"),
+        'Horas Hombre': st.column_config.NumberColumn(format="%.1f"),
+    })
 
     st.markdown("---") 
 
+    # PERIODO DE LOS GRÁFICOS: se recorta en el servidor antes de armar cada figura
+    primera, ultima = datos['evm'].index.min().date(), datos['evm'].index.max().date()
+    periodo_graficos = (None, None)
+    if primera < ultima:
+        rango = st.slider("Periodo de los gráficos", primera, ultima, (primera, ultima), format="DD/MM/YYYY")
+        if rango != (primera, ultima):
+            periodo_graficos = rango
+
     # --- FILA 1 ---
     c_new1, c_new2 = st.columns(2)
     with c_new1:
         st.subheader("3. Resumen de avance Global Acumulado")
-        fig_global = px.area(df, x='Fecha', y='Físico Acum (%)', title="Curva 'S' - Avance Físico")
-        fig_global.update_traces(line_color='#1E3A8A', fillcolor='rgba(30, 58, 138, 0.3)')
-        st.plotly_chart(fig_global, use_container_width=True)
+        grafico('curva_s')
     
     with c_new2:
         st.subheader("4. Avance físico total por mes")
-        df_real['Mes'] = pd.to_datetime(df_real['Fecha']).dt.strftime('%Y-%m')
-        df_mes_fis = df_real.groupby('Mes')['Físico Diario (%)'].sum().reset_index()
-        fig_mes_fis = px.bar(df_mes_fis, x='Mes', y='Físico Diario (%)', title="Producción Física Mensual (%)", text_auto='.2f')
-        fig_mes_fis.update_traces(marker_color='#b91c1c')
-        st.plotly_chart(fig_mes_fis, use_container_width=True)
+        grafico('fisico_mensual')
 
     st.markdown("---")
 
@@ -279,19 +450,11 @@ elif opcion == "MÓDULO 2: DASHBOARD (Reporte)":
     c3, c4 = st.columns(2)
     with c3:
         st.subheader("5. Curva de Avance de obra – Valor Ganado")
-        fig_ev = go.Figure()
-        fig_ev.add_trace(go.Scatter(x=df['Fecha'], y=df['Financiero Acum ($)'], name='Valor Ganado (EV)', 
-                         line=dict(color='green', width=3), mode='lines+markers'))
-        fig_ev.add_trace(go.Scatter(x=df['Fecha'], y=[MONTO_TOTAL_PROYECTO]*len(df), name='Presupuesto (BAC)', 
-                         line=dict(color='red', dash='dash')))
-        fig_ev.update_layout(yaxis_title="Monto USD ($)", legend=dict(orientation="h", y=1.1))
-        st.plotly_chart(fig_ev, use_container_width=True)
+        grafico('valor_ganado')
 
     with c4:
         st.subheader("6. Gráfico de Avance de Pagos (Acumulado $)")
-        fig_pagos = px.area(df, x='Fecha', y='Financiero Acum ($)', markers=True)
-        fig_pagos.update_traces(line_color='green', fillcolor='rgba(0,128,0,0.2)')
-        st.plotly_chart(fig_pagos, use_container_width=True)
+        grafico('pagos')
 
     st.markdown("---")
 
@@ -299,21 +462,11 @@ elif opcion == "MÓDULO 2: DASHBOARD (Reporte)":
     c5, c6 = st.columns(2)
     with c5:
         st.subheader("7. Avance Porcentual vs USD (Doble Eje)")
-        fig_dual = go.Figure()
-        fig_dual.add_trace(go.Bar(x=df['Fecha'], y=df['Inversión Diaria ($)'], name='Inversión ($)', marker_color='#90cdf4'))
-        fig_dual.add_trace(go.Scatter(x=df['Fecha'], y=df['Físico Acum (%)'], name='% Acumulado', yaxis='y2', line=dict(color='#b91c1c', width=3)))
-        fig_dual.update_layout(
-            yaxis=dict(title="Inversión Diaria USD"),
-            yaxis2=dict(title="% Avance Acumulado", overlaying='y', side='right'),
-            legend=dict(x=0, y=1.1, orientation='h')
-        )
-        st.plotly_chart(fig_dual, use_container_width=True)
+        grafico('doble_eje')
 
     with c6:
         st.subheader("8. Pagos Mensuales y Devengo")
-        df_mes_din = df_real.groupby('Mes')['Inversión Diaria ($)'].sum().reset_index()
-        fig_mes_din = px.bar(df_mes_din, x='Mes', y='Inversión Diaria ($)', text_auto='.2s', title="Planillado Mensual ($)")
-        st.plotly_chart(fig_mes_din, use_container_width=True)
+        grafico('pagos_mensuales')
 
     st.markdown("---")
 
@@ -321,24 +474,52 @@ elif opcion == "MÓDULO 2: DASHBOARD (Reporte)":
     c7, c8 = st.columns(2)
     with c7:
         st.subheader("9. Horas Hombre y Equipos (Acumulado)")
-        df['HH_Acum'] = df['Horas Hombre'].cumsum()
-        fig_hh = px.line(df, x='Fecha', y='HH_Acum', markers=True, title="Horas Hombre Acumuladas")
-        fig_hh.add_trace(go.Scatter(x=df['Fecha'], y=df['HH_Acum'], fill='tozeroy', mode='none', fillcolor='rgba(100,100,100,0.2)', showlegend=False))
-        st.plotly_chart(fig_hh, use_container_width=True)
+        grafico('horas_hombre')
 
     with c8:
         st.subheader("10. Frecuencia de Incidentes")
-        conteo_inc = df_real['Incidentes'].value_counts().reset_index()
-        conteo_inc.columns = ['Tipo', 'Cantidad']
-        fig_seg = px.pie(conteo_inc, values='Cantidad', names='Tipo', hole=0.4, color_discrete_sequence=px.colors.qualitative.Safe)
-        st.plotly_chart(fig_seg, use_container_width=True)
+        grafico('incidentes')
 
     st.markdown("---")
     st.markdown("### Estado Administrativo")
     col_adm1, col_adm2, col_adm3 = st.columns(3)
     col_adm1.info(f"**Contratos Complementarios:**\n{ultimo['Contratos Comp']}")
     col_adm2.info(f"**Órdenes de Trabajo:**\n{ultimo['Ordenes Trabajo']}")
-    col_adm3.warning(f"**Incremento de Cantidades:**\n{ultimo['Incremento Cant']}")
+    incremento = ultimo['Incremento Cant']
+    col_adm3.warning(f"**Incremento de Cantidades:**\n{f'{incremento:.2f} %' if pd.notna(incremento) else '—'}")
+
+    # --- REGISTRO FOTOGRÁFICO (miniaturas bajo demanda, original sólo al ampliar) ---
+    st.markdown("---")
+    st.subheader("11. Registro Fotográfico")
+    fotos = obtener_fotos()
+    dias_fotos = fotos.dias_con_fotos(contrato_activo)
+    if not dias_fotos:
+        st.info("No hay fotografías registradas.")
+    else:
+        etiquetas_fotos = {d[0]: f"{d[1]} | Día {d[2]} ({d[3]} fotos)" for d in dias_fotos}
+        id_dia_fotos = st.selectbox("Día", list(etiquetas_fotos), format_func=etiquetas_fotos.get)
+        lista_fotos = fotos.fotos_de(id_dia_fotos)
+        cols_fotos = st.columns(4)
+        for i, foto in enumerate(lista_fotos):
+            with cols_fotos[i % 4]:
+                mini = fotos.miniatura(foto['sha256']) if foto['miniatura'] == LISTA else None
+                if mini:
+                    st.image(mini, caption=foto['nombre'])
+                elif foto['miniatura'] == PENDIENTE:
+                    st.caption(f"⏳ {foto['nombre']} (procesando)")
+                else:
+                    st.caption(f"📎 {foto['nombre']}")
+        nombres_fotos = {f['sha256']: f['nombre'] for f in lista_fotos}
+        ampliar = st.selectbox("Ver en tamaño completo", [None] + list(nombres_fotos),
+                               format_func=lambda sha: "—" if sha is None else nombres_fotos[sha])
+        if ampliar:
+            original = fotos.original(ampliar)
+            if original is None:
+                st.caption("⏳ La imagen aún se está guardando.")
+            elif next(f for f in lista_fotos if f['sha256'] == ampliar)['miniatura'] == LISTA:
+                st.image(original, caption=nombres_fotos[ampliar])
+            else:
+                st.download_button("Descargar archivo", original, file_name=nombres_fotos[ampliar])
 
 # ==============================================================================
 # MÓDULO 3: DÍAS LIBRES (NUEVO)
@@ -347,37 +528,57 @@ elif opcion == "MÓDULO 3: DÍAS LIBRES (LDO)":
     st.markdown("### 🗓️ GESTIÓN DE DÍAS LIBRES (LDO/DRO)")
     st.info("Control de turnos, bajadas de campo y reemplazos del personal de fiscalización.")
     
+    dias_libres = obtener_dias_libres(contrato_activo)
     col_form, col_tabla = st.columns([1, 2])
     
     with col_form:
         st.markdown("#### Nuevo Registro")
         with st.form("ldo_form"):
             ldo_func = st.text_input("Funcionario")
-            ldo_cargo = st.selectbox("Cargo", ["Director", "Residente", "Especialista Elec.", "Especialista Civil", "Ambiental", "SISO"])
+            ldo_cargo = st.selectbox("Cargo", CARGOS)
             ldo_inicio = st.date_input("Fecha Salida")
             ldo_fin = st.date_input("Fecha Retorno")
             ldo_reemplazo = st.text_input("Reemplazo Designado (Obligatorio)")
-            ldo_tipo = st.selectbox("Motivo", ["Franco/Descanso", "Vacaciones", "Permiso Médico", "Calamidad"])
-            ldo_estado = st.selectbox("Estado", ["Solicitado", "Aprobado", "Ejecutado"])
+            ldo_tipo = st.selectbox("Motivo", MOTIVOS)
+            ldo_estado = st.selectbox("Estado", ESTADOS_LDO)
             
             if st.form_submit_button("Agendar LDO"):
-                dias = (ldo_fin - ldo_inicio).days
                 nuevo_ldo = {
                     'Funcionario': ldo_func, 'Cargo': ldo_cargo,
                     'Fecha Salida': ldo_inicio, 'Fecha Retorno': ldo_fin,
-                    'Días Totales': dias, 'Reemplazo': ldo_reemplazo,
-                    'Tipo': ldo_tipo, 'Estado': ldo_estado
+                    'Reemplazo': ldo_reemplazo, 'Tipo': ldo_tipo, 'Estado': ldo_estado
                 }
-                st.session_state['data_ldo'] = pd.concat([st.session_state['data_ldo'], pd.DataFrame([nuevo_ldo])], ignore_index=True)
-                st.success("Agendado.")
+                try:
+                    dias_libres.registrar(nuevo_ldo)
+                    st.success(f"Agendado ({(ldo_fin - ldo_inicio).days} días).")
+                except ValueError as e:
+                    st.error(f"⚠️ {e}")
 
     with col_tabla:
         st.markdown("#### Calendario de Ausencias")
-        if not st.session_state['data_ldo'].empty:
-            st.dataframe(st.session_state['data_ldo'], use_container_width=True)
+        df_ldo = almacen.leer('ldo', contrato_activo)
+        if not df_ldo.empty:
+            st.dataframe(df_ldo, use_container_width=True)
         else:
             st.info("No hay días libres programados.")
 
+    # --- COBERTURA POR CARGO SOBRE EL PLAZO DEL CONTRATO ---
+    st.markdown("---")
+    st.markdown("#### 👷 COBERTURA DEL PERSONAL EN SITIO")
+    st.caption("La plantilla por cargo se toma de los funcionarios registrados en el LDO de este contrato.")
+    if not df_ldo.empty:
+        matriz = dias_libres.matriz_cobertura(datos_ficha['Fecha Inicio'], datos_ficha['Plazo Días'])
+        st.plotly_chart(figura_cobertura(matriz), use_container_width=True)
+        tramos = dias_libres.sin_cobertura(matriz)
+        if not tramos.empty:
+            st.error(f"⚠️ {len(tramos)} tramos con un cargo sin titulares en sitio:")
+            st.dataframe(tramos, use_container_width=True, hide_index=True)
+        else:
+            st.success("Todos los cargos tienen al menos un titular en sitio durante el plazo.")
+
+        ldo_consulta = st.date_input("¿Quién está en sitio el día...?", key="ldo_consulta")
+        st.dataframe(dias_libres.en_sitio(ldo_consulta), use_container_width=True, hide_index=True)
+
 # ==============================================================================
 # MÓDULO 4: REPORTES DE GESTIÓN (NUEVO)
 # ==============================================================================
@@ -397,20 +598,84 @@ elif opcion == "MÓDULO 4: REPORTES GESTIÓN":
             
             if st.form_submit_button("Subir Reporte"):
                 nuevo_rep = {
-                    'Periodo': rep_periodo, 'Tipo': rep_tipo,
+                    'Contrato': contrato_activo, 'Periodo': rep_periodo, 'Tipo': rep_tipo,
                     'Hitos': rep_hitos, 'Alertas': rep_alertas,
                     'Fecha Emisión': date.today(), 'Archivo': "Cargado" if rep_file else "Pendiente"
                 }
-                st.session_state['data_reportes'] = pd.concat([st.session_state['data_reportes'], pd.DataFrame([nuevo_rep])], ignore_index=True)
+                almacen.agregar('reportes', nuevo_rep)
                 st.success("Reporte registrado.")
 
     with c_r2:
         st.markdown("#### Histórico de Informes")
-        if not st.session_state['data_reportes'].empty:
-            st.dataframe(st.session_state['data_reportes'], use_container_width=True)
+        df_reportes = almacen.leer('reportes', contrato_activo)
+        if not df_reportes.empty:
+            st.dataframe(df_reportes, use_container_width=True)
         else:
             st.info("No hay reportes cargados.")
 
+    # --- INFORME AUTOMÁTICO (se arma en segundo plano con los datos registrados) ---
+    st.markdown("---")
+    st.markdown("#### 🤖 GENERAR INFORME DESDE LOS REGISTROS")
+    generador = obtener_generador()
+    g1, g2, g3 = st.columns([1, 1, 1])
+    inf_tipo = g1.selectbox("Tipo de informe", informes.TIPOS_INFORME)
+    inf_fecha = g2.date_input("Fecha dentro del periodo", key="inf_fecha")
+    inf_desde, inf_hasta = informes.periodo(inf_tipo, inf_fecha)
+    g3.caption(f"Periodo: {inf_desde:%d/%m/%Y} al {inf_hasta:%d/%m/%Y}")
+    if informes.FORMATOS_FALTANTES:
+        st.warning("⚠️ Esta instalación no genera: " + "; ".join(informes.FORMATOS_FALTANTES)
+                   + ". Instale las dependencias de requirements.txt.")
+    if g3.button("⚙️ Generar informe"):
+        generador.solicitar(libro, datos_ficha, inf_tipo, inf_fecha)
+
+    tarea = generador.tarea(contrato_activo, inf_tipo, inf_desde)
+    if tarea is not None and not tarea.terminada:
+        @st.fragment(run_every=1)
+        def seguir_informe():
+            st.progress(tarea.progreso, text=tarea.mensaje)
+            if tarea.terminada:
+                st.rerun()
+        seguir_informe()
+    elif tarea is not None and tarea.error:
+        st.error(f"⚠️ No se pudo generar el informe: {tarea.error}")
+    elif tarea is not None:
+        st.success("Informe listo" + (" (sin cambios en los datos: se reutilizó el generado antes)." if tarea.reutilizado else "."))
+        d1, d2, d3 = st.columns(3)
+        d1.download_button("⬇️ Descargar HTML", tarea.html, file_name=f"{tarea.nombre_archivo}.html", mime="text/html")
+        if tarea.pdf is not None:
+            d2.download_button("⬇️ Descargar PDF", tarea.pdf, file_name=f"{tarea.nombre_archivo}.pdf", mime="application/pdf")
+        else:
+            d2.caption(tarea.aviso or "PDF no disponible (requiere kaleido y weasyprint).")
+        if d3.button("🗂️ Registrar en el histórico"):
+            almacen.agregar('reportes', {
+                'Contrato': contrato_activo,
+                'Periodo': informes.etiqueta_periodo(tarea.tipo, tarea.desde, tarea.hasta),
+                'Tipo': tarea.tipo,
+                'Hitos': "; ".join(f"{k}: {v}" for k, v in tarea.resumen.items() if k not in ('Folios abiertos', 'Asientos del periodo')),
+                'Alertas': f"{tarea.resumen['Folios abiertos']} folios abiertos en el Libro de Obra",
+                'Fecha Emisión': date.today(), 'Archivo': "Generado (HTML)",
+            })
+            st.success("Informe registrado en el histórico.")
+
+    # --- EXPORTACIÓN DE REGISTROS ---
+    with st.expander("📤 EXPORTAR REGISTROS DEL CONTRATO"):
+        e1, e2 = st.columns(2)
+        exp_registro = e1.selectbox("Registro", ['rdo', 'ldo', 'reportes', 'lp'],
+                                    format_func=lambda r: {'rdo': "RDO", 'ldo': "Días Libres (LDO)",
+                                                           'reportes': "Reportes de Gestión", 'lp': "Libro de Obra"}[r])
+        exp_formato = e2.selectbox("Formato", importacion.FORMATOS_EXPORTACION)
+        if st.button("Preparar exportación"):
+            try:
+                st.session_state.exportacion = (
+                    importacion.exportar(almacen, exp_registro, contrato_activo, exp_formato),
+                    f"{exp_registro}_{contrato_activo}.{exp_formato.lower()}",
+                )
+            except ValueError as e:
+                st.error(f"⚠️ {e}")
+        if 'exportacion' in st.session_state:
+            contenido, nombre_archivo = st.session_state.exportacion
+            st.download_button(f"⬇️ Descargar {nombre_archivo}", contenido, file_name=nombre_archivo)
+
 # ==============================================================================
 # MÓDULO 5: LIBRO DE OBRA (NUEVO)
 # ==============================================================================
@@ -418,10 +683,13 @@ elif opcion == "MÓDULO 5: LIBRO DE OBRA (LP)":
     st.markdown("### 📖 LIBRO DE PEDIDO (LIBRO DE OBRA)")
     st.warning("⚠️ Las instrucciones aquí registradas tienen carácter contractual y legal.")
     
+    libro_obra = obtener_libro_obra(contrato_activo)
+    cola = obtener_cola()
+
     with st.expander("➕ NUEVA INSTRUCCIÓN / ASIENTO DE OBRA", expanded=True):
         with st.form("lp_form"):
             c_lp1, c_lp2 = st.columns(2)
-            lp_folio = c_lp1.text_input("No. de Folio / Asiento", placeholder="001")
+            lp_folio = c_lp1.text_input("No. de Folio / Asiento", placeholder=f"{libro_obra.siguiente_folio()} (automático si se deja vacío)")
             lp_fecha = c_lp2.date_input("Fecha de Instrucción")
             
             lp_asunto = st.text_input("Asunto (Título de la Orden)")
@@ -430,7 +698,7 @@ elif opcion == "MÓDULO 5: LIBRO DE OBRA (LP)":
             c_lp3, c_lp4, c_lp5 = st.columns(3)
             lp_ref = c_lp3.text_input("Ref. Plano/Espec.", placeholder="Plano E-04")
             lp_plazo = c_lp4.text_input("Plazo Cumplimiento", placeholder="24 Horas")
-            lp_estado = c_lp5.selectbox("Estado", ["Abierto (Pendiente)", "Cerrado (Cumplido)", "Anulado"])
+            lp_estado = c_lp5.selectbox("Estado", ESTADOS_LP)
             
             if st.form_submit_button("📜 REGISTRAR EN LIBRO DE OBRA"):
                 nuevo_lp = {
@@ -438,25 +706,198 @@ elif opcion == "MÓDULO 5: LIBRO DE OBRA (LP)":
                     'Asunto': lp_asunto, 'Instrucción': lp_instruccion,
                     'Ref. Técnica': lp_ref, 'Plazo': lp_plazo, 'Estado': lp_estado
                 }
-                st.session_state['data_lp'] = pd.concat([st.session_state['data_lp'], pd.DataFrame([nuevo_lp])], ignore_index=True)
-                st.success(f"Folio {lp_folio} registrado exitosamente.")
+                envio = cola.encolar(contrato_activo, 'lp', id_envio(st.session_state.id_form_lp, 'lp', nuevo_lp), nuevo_lp)
+                if envio['estado'] == EN_COLA:
+                    cola.sincronizar(libro, libro_obra)
+                    envio = cola.estado([envio['id_cliente']])[0]
+                if envio['estado'] == SINCRONIZADO:
+                    st.session_state.id_form_lp = nuevo_id()
+                    st.success(f"Folio {envio['resultado']} registrado exitosamente.")
+                else:
+                    st.error(f"⚠️ {envio['error'] or 'El asiento quedó en cola; se registrará al sincronizar.'}")
 
     st.markdown("---")
     st.markdown("#### 📂 VISUALIZACIÓN DE ASIENTOS")
-    
-    df_lp = st.session_state['data_lp']
+
+    f1, f2, f3, f4 = st.columns([2, 2, 1, 1])
+    lp_buscar = f1.text_input("🔎 Buscar en asunto, instrucción o referencia")
+    lp_estados = f2.multiselect("Estado", ESTADOS_LP)
+    lp_desde = f3.date_input("Desde", value=None)
+    lp_hasta = f4.date_input("Hasta", value=None)
+    lp_ir_folio = st.text_input("Ir al folio", placeholder="Ej: 012")
+
+    if lp_ir_folio.strip():
+        df_lp, total_lp = libro_obra.folio(lp_ir_folio), None
+    else:
+        # Al cambiar un filtro se vuelve a la primera página
+        filtros_lp = (lp_buscar, tuple(lp_estados), lp_desde, lp_hasta)
+        if st.session_state.get('filtros_lp') != filtros_lp:
+            st.session_state.filtros_lp = filtros_lp
+            st.session_state.pagina_lp = 1
+        total_lp = libro_obra.contar(lp_buscar, lp_estados, lp_desde, lp_hasta)
+        paginas_lp = max(1, -(-total_lp // TAMANO_PAGINA))
+        pagina_lp = min(st.session_state.get('pagina_lp', 1), paginas_lp)
+        if paginas_lp > 1:
+            pagina_lp = st.number_input(f"Página (de {paginas_lp})", min_value=1, max_value=paginas_lp,
+                                        value=pagina_lp, step=1)
+        st.session_state.pagina_lp = pagina_lp
+        df_lp = libro_obra.buscar(lp_buscar, lp_estados, lp_desde, lp_hasta, pagina=pagina_lp - 1)
+
     if not df_lp.empty:
-        for index, row in df_lp.iterrows():
+        if total_lp is not None:
+            inicio_lp = (st.session_state.pagina_lp - 1) * TAMANO_PAGINA
+            st.caption(f"Mostrando {inicio_lp + 1}–{inicio_lp + len(df_lp)} de {total_lp} asientos.")
+        tarjetas = []
+        for row in df_lp.itertuples(index=False):
+            row = dict(zip(df_lp.columns, (html.escape(str(v)) for v in row)))
             color_estado = "red" if "Abierto" in row['Estado'] else "green"
-            with st.container():
-                st.markdown(f"""
-                <div style="border: 1px solid #ccc; padding: 10px; border-radius: 5px; border-left: 5px solid {color_estado}; margin-bottom: 10px;">
-                    <strong>FOLIO: {row['Folio']}</strong> | 📅 {row['Fecha']} <br>
-                    <h4 style="margin: 5px 0;">{row['Asunto']}</h4>
-                    <p>{row['Instrucción']}</p>
-                    <hr>
-                    <small><strong>Ref:</strong> {row['Ref. Técnica']} | <strong>Plazo:</strong> {row['Plazo']} | <strong>Estado:</strong> {row['Estado']}</small>
-                </div>
-                """, unsafe_allow_html=True)
+            tarjetas.append(f"""
+            <div style="border: 1px solid #ccc; padding: 10px; border-radius: 5px; border-left: 5px solid {color_estado}; margin-bottom: 10px;">
+                <strong>FOLIO: {row['Folio']}</strong> | 📅 {row['Fecha']} <br>
+                <h4 style="margin: 5px 0;">{row['Asunto']}</h4>
+                <p>{row['Instrucción']}</p>
+                <hr>
+                <small><strong>Ref:</strong> {row['Ref. Técnica']} | <strong>Plazo:</strong> {row['Plazo']} | <strong>Estado:</strong> {row['Estado']}</small>
+            </div>
+            """)
+        st.markdown("".join(tarjetas), unsafe_allow_html=True)
+    elif lp_ir_folio.strip():
+        st.info(f"No existe el folio {lp_ir_folio.strip()} en este contrato.")
+    elif lp_buscar or lp_estados or lp_desde or lp_hasta:
+        st.info("Ningún asiento coincide con los filtros.")
     else:
         st.info("El Libro de Obra está vacío.")
+
+    # --- BITÁCORA DE AUDITORÍA ---
+    with st.expander("🔏 BITÁCORA DE AUDITORÍA (RDO Y LIBRO DE OBRA)"):
+        bitacora = obtener_bitacora()
+        cabeza = bitacora.cabeza(contrato_activo)
+        b1, b2, b3 = st.columns(3)
+        b1.metric("Eventos anotados", f"{cabeza['eventos']:,}")
+        b2.metric("Último evento", cabeza['fecha'][:19].replace('T', ' ') if cabeza['fecha'] else "—")
+        b3.metric("Verificado hasta", f"evento {cabeza['verificado_seq']}" if cabeza['verificado'] else "sin verificar")
+        st.caption("Huella actual de la bitácora (anótela en informes o asientos para fijar la historia a esa fecha):")
+        st.code(cabeza['hash'], language=None)
+
+        v1, v2 = st.columns(2)
+        verificacion = None
+        if v1.button("🔍 Verificar eventos nuevos"):
+            verificacion = bitacora.verificar(contrato_activo)
+        if v2.button("🔍 Verificación completa"):
+            verificacion = bitacora.verificar(contrato_activo, completa=True)
+        if verificacion and verificacion['ok']:
+            st.success(f"Cadena íntegra: {verificacion['verificados']} eventos verificados "
+                       f"desde el evento {verificacion['desde']}.")
+        elif verificacion:
+            st.error(f"⚠️ {verificacion['motivo']}")
+
+        st.markdown("**Reconstrucción a una fecha**")
+        r1, r2, r3 = st.columns(3)
+        rec_registro = r1.selectbox("Registro", ['rdo', 'lp'], format_func=lambda r: {'rdo': "RDO", 'lp': "Libro de Obra"}[r])
+        rec_fecha = r2.date_input("Fecha", date.today(), key="rec_fecha")
+        rec_hora = r3.time_input("Hora", time(23, 59), key="rec_hora")
+        # El minuto elegido incluye todo lo anotado durante ese minuto
+        rec_momento = datetime.combine(rec_fecha, rec_hora.replace(second=59, microsecond=999999))
+        if st.button("Reconstruir"):
+            st.session_state.reconstruccion = (
+                rec_registro, rec_momento,
+                bitacora.reconstruir(contrato_activo, rec_registro, rec_momento, MONTO_TOTAL_PROYECTO),
+            )
+        if 'reconstruccion' in st.session_state:
+            rec_registro, rec_momento, df_rec = st.session_state.reconstruccion
+            st.caption(f"{len(df_rec)} filas de {rec_registro.upper()} al {rec_momento:%d/%m/%Y %H:%M}.")
+            st.dataframe(df_rec.drop(columns='id'), hide_index=True, height=250)
+            st.download_button("⬇️ Descargar CSV", df_rec.to_csv(index=False),
+                               file_name=f"{rec_registro}_{contrato_activo}_{rec_momento:%Y%m%d%H%M}.csv")
+            st.warning("Restaurar reemplaza el RDO y el Libro de Obra actuales por su estado en esa fecha "
+                       "(el cambio también queda anotado en la bitácora).")
+            if st.checkbox("Entiendo, restaurar ambos registros") and st.button("♻️ Restaurar"):
+                cartera.restaurar(contrato_activo, {
+                    r: bitacora.estado(contrato_activo, r, rec_momento) for r in ['rdo', 'lp']
+                })
+                libro.recalcular()
+                del st.session_state.reconstruccion
+                st.rerun()
+
+        st.markdown("**Últimos eventos**")
+        st.dataframe(bitacora.eventos(contrato_activo, limite=50), hide_index=True, height=250)
+
+# ==============================================================================
+# MÓDULO 6: CARTERA DE CONTRATOS
+# ==============================================================================
+elif opcion == "MÓDULO 6: CARTERA DE CONTRATOS":
+    st.markdown("### 🗂️ CARTERA DE CONTRATOS")
+    st.caption("Avance físico, financiero e índices de desempeño de todas las obras fiscalizadas.")
+
+    df_cartera = cartera.resumen()
+    k1, k2, k3 = st.columns(3)
+    k1.metric("Contratos", len(df_cartera))
+    k2.metric("Monto total", f"$ {df_cartera['Monto'].sum():,.2f}")
+    k3.metric("Ejecutado total", f"$ {df_cartera['Financiero Acum ($)'].fillna(0).sum():,.2f}")
+    st.dataframe(df_cartera, use_container_width=True, hide_index=True, column_config={
+        'Monto': st.column_config.NumberColumn(format="$ %.2f"),
+        'Físico Acum (%)': st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.2f %%"),
+        'Financiero Acum ($)': st.column_config.NumberColumn(format="$ %.2f"),
+        'HH Acum': st.column_config.NumberColumn(format="%.1f"),
+        'CPI': st.column_config.NumberColumn(format="%.2f"),
+        'SPI': st.column_config.NumberColumn(format="%.2f"),
+    })
+
+    with st.expander("➕ REGISTRAR NUEVO CONTRATO"):
+        with st.form("contrato_form"):
+            n1, n2 = st.columns(2)
+            ct_codigo = n1.text_input("Código del proceso", placeholder="LICO-CNELEP-2025-2")
+            ct_entidad = n2.text_input("Entidad", "CNEL EP - UNIDAD DE NEGOCIO EL ORO")
+            ct_objeto = st.text_input("Objeto del contrato")
+            n3, n4, n5 = st.columns(3)
+            ct_categoria = n3.text_input("Categoría", "CONSTRUCCIÓN DE SUBESTACIONES ELÉCTRICAS")
+            ct_contratista = n4.text_input("Contratista")
+            ct_rep = n5.text_input("Rep. Legal")
+            n6, n7, n8 = st.columns(3)
+            ct_monto = n6.number_input("Monto del contrato ($)", min_value=0.0, step=10000.0)
+            ct_plazo = n7.number_input("Plazo (días calendario)", min_value=1, value=360, step=1)
+            ct_inicio = n8.date_input("Fecha de inicio")
+            ct_fiscalizador = st.text_input("Fiscalizador", NOMBRE_FISCALIZADOR)
+            ct_link = st.text_input("Enlace SERCOP")
+
+            if st.form_submit_button("Registrar contrato"):
+                try:
+                    cartera.registrar({
+                        'Código': ct_codigo.strip(), 'Entidad': ct_entidad, 'Categoría': ct_categoria,
+                        'Objeto': ct_objeto, 'Contratista': ct_contratista, 'Rep_Legal': ct_rep,
+                        'Fiscalizador': ct_fiscalizador, 'Monto': ct_monto, 'Plazo Días': ct_plazo,
+                        'Fecha Inicio': ct_inicio, 'Link': ct_link
+                    })
+                    st.success(f"Contrato {ct_codigo} registrado. Selecciónelo en la barra lateral.")
+                except ValueError as e:
+                    st.error(f"⚠️ {e}")
+
+instrumentacion.terminar(marca_modulo)
+
+# --- PANEL DE RENDIMIENTO (sólo administración: FISCALPINAS_ADMIN=1 en el servidor) ---
+# No se habilita desde la URL: enciende la medición de todo el proceso y escribe en disco
+if os.environ.get("FISCALPINAS_ADMIN") == "1":
+    with st.sidebar.expander("🛠️ RENDIMIENTO (ADMIN)"):
+        st.checkbox("Medir rendimiento", value=instrumentacion.activo(), key="medir_rendimiento",
+                    on_change=lambda: instrumentacion.activar(st.session_state.medir_rendimiento))
+        st.caption("Tiempos por tramo (todas las sesiones del servidor):")
+        st.dataframe(instrumentacion.resumen(), hide_index=True, column_config={
+            'p50 (ms)': st.column_config.NumberColumn(format="%.1f"),
+            'p95 (ms)': st.column_config.NumberColumn(format="%.1f"),
+            'Total (s)': st.column_config.NumberColumn(format="%.2f"),
+            'Carga media (KB)': st.column_config.NumberColumn(format="%.1f"),
+        })
+        st.dataframe(instrumentacion.resumen_cache(), hide_index=True, column_config={
+            'Aciertos (%)': st.column_config.NumberColumn(format="%.0f%%"),
+        })
+        p1, p2 = st.columns(2)
+        if p1.button("Reiniciar"):
+            instrumentacion.reiniciar()
+            st.rerun()
+        if p2.button("Guardar log"):
+            ruta_log, nuevos = instrumentacion.exportar(os.path.join(os.path.dirname(RUTA_BD), "rendimiento.jsonl"))
+            st.success(f"{nuevos} eventos nuevos agregados a {ruta_log}")
+        st.download_button("⬇️ Descargar log (JSONL)", instrumentacion.log_jsonl(),
+                           file_name=f"rendimiento_{datetime.now():%Y%m%d_%H%M}.jsonl")
+
+instrumentacion.terminar(marca_script)
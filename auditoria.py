@@ -0,0 +1,290 @@
+# --- AUDITORÍA: VERIFICACIÓN Y RECONSTRUCCIÓN DE LA BITÁCORA ---
+# La bitácora (almacenamiento.py) es una cadena de hashes por contrato. Verificar
+# recorre sólo los eventos posteriores al último punto de control: cada verificación
+# exitosa deja un punto (seq, hash) y antes de seguir se comprueba que los eventos de
+# los puntos anteriores conserven su hash, así que rehacer la cadena sobre historia ya
+# verificada se detecta sin volver a recorrerla. Un contenido alterado sin recalcular
+# los hashes sólo aparece en la verificación completa, que rehace la cadena entera.
+# Para ver un registro tal como estaba en una fecha se parte de la última instantánea
+# anterior (estado completo, comprimido) y se aplican los eventos siguientes. Hay una
+# instantánea nueva cada EVENTOS_POR_INSTANTANEA eventos, o cada cuarto del tamaño de
+# la anterior si es mayor: lo que se reproduce queda acotado y el espacio de las
+# instantáneas crece en proporción a la bitácora. Cada instantánea guarda el hash del
+# evento en que se tomó y el SHA-256 de su contenido: antes de usarla se comprueban
+# ambos y, si no coinciden, se parte de una anterior (o del inicio). La verificación
+# completa además reproduce la bitácora y compara cada instantánea con lo reproducido.
+import hashlib
+import json
+import zlib
+from datetime import datetime
+
+import pandas as pd
+
+from almacenamiento import COLUMNA_FECHA, HASH_INICIAL, aplicar_tipos, columnas_bitacora, hash_evento, valor_sql
+from acumulados import ACUMULADOS
+
+EVENTOS_POR_INSTANTANEA = 1000
+FRACCION_INSTANTANEA = 0.25
+
+_COLUMNAS_EVENTO = "seq, registro, id_fila, operacion, datos, fecha, hash_previo, hash"
+
+
+def crear_tablas_auditoria(con):
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS bitacora_control (contrato TEXT NOT NULL, seq INTEGER NOT NULL, "
+        "hash TEXT NOT NULL, verificado TEXT NOT NULL, PRIMARY KEY (contrato, seq))"
+    )
+    # Las instantáneas sin hash ni digesto (bases anteriores) se descartan: se derivan
+    # de la bitácora y se vuelven a tomar cuando hacen falta
+    columnas = {c[1] for c in con.execute("PRAGMA table_info(bitacora_instantaneas)")}
+    if columnas and 'digesto' not in columnas:
+        con.execute("DROP TABLE bitacora_instantaneas")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS bitacora_instantaneas (contrato TEXT NOT NULL, registro TEXT NOT NULL, "
+        "seq INTEGER NOT NULL, hash TEXT NOT NULL, filas INTEGER NOT NULL, estado BLOB NOT NULL, "
+        "digesto TEXT NOT NULL, PRIMARY KEY (contrato, registro, seq))"
+    )
+
+
+def _aplicar(estado, id_fila, operacion, datos):
+    if operacion == 'alta':
+        estado[id_fila] = json.loads(datos)
+    elif operacion == 'correccion':
+        estado[id_fila] = {**estado.get(id_fila, {}), **json.loads(datos)}
+    elif operacion == 'baja':
+        estado.pop(id_fila, None)
+    elif operacion == 'reinicio':
+        estado.clear()
+
+
+def _comprimir(estado):
+    # Columnas una sola vez y cada fila como lista: se decodifica mucho más rápido
+    columnas = sorted(set().union(*estado.values()))
+    filas = [[i] + [fila.get(c) for c in columnas] for i, fila in estado.items()]
+    return zlib.compress(json.dumps({'columnas': columnas, 'filas': filas}, ensure_ascii=False).encode(), 1)
+
+
+def _descomprimir(blob):
+    datos = json.loads(zlib.decompress(blob))
+    columnas = datos['columnas']
+    return {f[0]: dict(zip(columnas, f[1:])) for f in datos['filas']}
+
+
+def _digesto(blob):
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _fila_instantanea(contrato, registro, seq, hash_seq, estado):
+    blob = _comprimir(estado)
+    return (contrato, registro, seq, hash_seq, len(estado), blob, _digesto(blob))
+
+
+def _normalizar(estado):
+    # Para comparar estados: una columna nula equivale a una ausente
+    return {i: {c: v for c, v in fila.items() if v is not None} for i, fila in estado.items()}
+
+
+def _umbral(filas):
+    return max(EVENTOS_POR_INSTANTANEA, FRACCION_INSTANTANEA * filas)
+
+
+class Bitacora:
+    def __init__(self, almacen):
+        self.almacen = almacen
+        with almacen.transaccion() as con:
+            crear_tablas_auditoria(con)
+
+    # --- ESTADO DE LA CADENA ---
+    def cabeza(self, contrato):
+        # Último evento del contrato (su hash resume toda la historia) y último punto verificado
+        ultimo = self.almacen.consultar(
+            "SELECT seq, hash, fecha FROM bitacora WHERE contrato = ? ORDER BY seq DESC LIMIT 1", (contrato,)
+        )
+        punto = self._ultimo_punto(contrato)
+        return {
+            'eventos': self.almacen.consultar("SELECT COUNT(*) FROM bitacora WHERE contrato = ?", (contrato,))[0][0],
+            'seq': ultimo[0][0] if ultimo else 0, 'hash': ultimo[0][1] if ultimo else HASH_INICIAL,
+            'fecha': ultimo[0][2] if ultimo else None,
+            'verificado_seq': punto[0] if punto else 0, 'verificado': punto[2] if punto else None,
+        }
+
+    def eventos(self, contrato, registro=None, id_fila=None, limite=200):
+        # Eventos más recientes primero; con id_fila, la historia de esa fila (y los reinicios)
+        condiciones, parametros = ["contrato = ?"], [contrato]
+        if registro is not None:
+            condiciones.append("registro = ?")
+            parametros.append(registro)
+        if id_fila is not None:
+            condiciones.append("(id_fila = ? OR operacion = 'reinicio')")
+            parametros.append(int(id_fila))
+        filas = self.almacen.consultar(
+            f"SELECT seq, fecha, registro, operacion, id_fila, datos, hash FROM bitacora "
+            f"WHERE {' AND '.join(condiciones)} ORDER BY seq DESC LIMIT ?",
+            parametros + [limite],
+        )
+        df = pd.DataFrame(filas, columns=['Seq', 'Fecha', 'Registro', 'Operación', 'Id', 'Datos', 'Hash'])
+        return df.astype({'Id': 'Int64'})
+
+    # --- VERIFICACIÓN ---
+    def verificar(self, contrato, completa=False):
+        # Devuelve {'ok', 'verificados', 'desde', 'seq', 'motivo'}; 'seq' es el último
+        # evento válido o el primero que rompe la cadena.
+        puntos = self.almacen.consultar(
+            "SELECT c.seq, c.hash, b.hash FROM bitacora_control c LEFT JOIN bitacora b ON b.seq = c.seq "
+            "WHERE c.contrato = ? ORDER BY c.seq", (contrato,),
+        )
+        for seq, guardado, actual in puntos:
+            if actual != guardado:
+                return self._fallo(0, seq, f"El evento {seq} ya no coincide con el punto de control: "
+                                           "la historia verificada fue modificada.")
+        desde, previo = (puntos[-1][0], puntos[-1][1]) if puntos and not completa else (0, HASH_INICIAL)
+        verificados, ultimo = 0, desde
+        # La verificación completa reproduce cada registro y contrasta las instantáneas
+        instantaneas = set(self.almacen.consultar(
+            "SELECT registro, seq FROM bitacora_instantaneas WHERE contrato = ?", (contrato,)
+        )) if completa else set()
+        estados = {}
+        for lote in self.almacen.recorrer(
+            f"SELECT {_COLUMNAS_EVENTO} FROM bitacora WHERE contrato = ? AND seq > ? ORDER BY seq", (contrato, desde)
+        ):
+            for seq, registro, id_fila, operacion, datos, fecha, hash_previo, hash_guardado in lote:
+                if hash_previo != previo:
+                    return self._fallo(verificados, seq, f"El evento {seq} no enlaza con el anterior: "
+                                                         "falta o se reordenó un evento.")
+                if hash_evento(previo, contrato, registro, id_fila, operacion, fecha, datos) != hash_guardado:
+                    return self._fallo(verificados, seq, f"El contenido del evento {seq} fue modificado.")
+                if completa:
+                    _aplicar(estados.setdefault(registro, {}), id_fila, operacion, datos)
+                    if (registro, seq) in instantaneas:
+                        instantaneas.discard((registro, seq))
+                        if self._instantanea_valida(contrato, registro, seq, hash_guardado, estados[registro]) is None:
+                            return self._fallo(verificados, seq, f"La instantánea de {registro} en el evento {seq} "
+                                                                 "no coincide con la bitácora.")
+                previo, ultimo = hash_guardado, seq
+                verificados += 1
+        if instantaneas:
+            registro, seq = min(instantaneas, key=lambda i: i[1])
+            return self._fallo(verificados, seq, f"La instantánea de {registro} en el evento {seq} "
+                                                 "no corresponde a ningún evento de la bitácora.")
+        if ultimo:
+            with self.almacen.transaccion() as con:
+                con.execute(
+                    "INSERT OR IGNORE INTO bitacora_control (contrato, seq, hash, verificado) VALUES (?, ?, ?, ?)",
+                    (contrato, ultimo, previo, datetime.now().isoformat(timespec='seconds')),
+                )
+        return {'ok': True, 'verificados': verificados, 'desde': desde, 'seq': ultimo, 'motivo': None}
+
+    def _fallo(self, verificados, seq, motivo):
+        return {'ok': False, 'verificados': verificados, 'desde': None, 'seq': seq, 'motivo': motivo}
+
+    def _ultimo_punto(self, contrato):
+        fila = self.almacen.consultar(
+            "SELECT seq, hash, verificado FROM bitacora_control WHERE contrato = ? ORDER BY seq DESC LIMIT 1",
+            (contrato,),
+        )
+        return fila[0] if fila else None
+
+    # --- INSTANTÁNEAS Y RECONSTRUCCIÓN ---
+    def actualizar_instantaneas(self, contrato, registro):
+        # Toma las instantáneas que falten desde la última íntegra del registro; las
+        # alteradas que caen en el mismo evento se reemplazan
+        seq, estado = self._instantanea(contrato, registro)
+        filas, hash_seq = len(estado), None
+        nuevas, pendientes, fecha_previa = [], 0, None
+        for lote in self.almacen.recorrer(
+            "SELECT seq, id_fila, operacion, datos, fecha, hash FROM bitacora "
+            "WHERE contrato = ? AND registro = ? AND seq > ? ORDER BY seq", (contrato, registro, seq),
+        ):
+            for seq_evento, id_fila, operacion, datos, fecha, hash_guardado in lote:
+                # Los eventos de una misma escritura comparten fecha y ningún momento cae
+                # entre ellos: la instantánea se toma al terminar el grupo
+                if pendientes >= _umbral(filas) and fecha != fecha_previa:
+                    nuevas.append(_fila_instantanea(contrato, registro, seq, hash_seq, estado))
+                    pendientes, filas = 0, len(estado)
+                _aplicar(estado, id_fila, operacion, datos)
+                pendientes += 1
+                seq, fecha_previa, hash_seq = seq_evento, fecha, hash_guardado
+        if pendientes >= _umbral(filas):
+            nuevas.append(_fila_instantanea(contrato, registro, seq, hash_seq, estado))
+        if nuevas:
+            with self.almacen.transaccion() as con:
+                con.executemany(
+                    "INSERT OR REPLACE INTO bitacora_instantaneas (contrato, registro, seq, hash, filas, estado, digesto) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", nuevas,
+                )
+
+    def _ultima_instantanea(self, contrato, registro):
+        fila = self.almacen.consultar(
+            "SELECT seq, filas FROM bitacora_instantaneas WHERE contrato = ? AND registro = ? "
+            "ORDER BY seq DESC LIMIT 1", (contrato, registro),
+        )
+        return fila[0] if fila else (0, 0)
+
+    def _instantanea(self, contrato, registro, hasta=None):
+        # La última instantánea íntegra hasta `hasta` (seq, estado); (0, {}) si no hay ninguna
+        candidatas = self.almacen.consultar(
+            "SELECT i.seq, b.hash FROM bitacora_instantaneas i LEFT JOIN bitacora b "
+            "ON b.seq = i.seq AND b.contrato = i.contrato AND b.registro = i.registro "
+            "WHERE i.contrato = ? AND i.registro = ? AND i.seq <= ? ORDER BY i.seq DESC",
+            (contrato, registro, hasta if hasta is not None else 2**62),
+        )
+        for seq, hash_seq in candidatas:
+            estado = self._instantanea_valida(contrato, registro, seq, hash_seq)
+            if estado is not None:
+                return seq, estado
+        return 0, {}
+
+    def _instantanea_valida(self, contrato, registro, seq, hash_seq, esperado=None):
+        # Contenido de la instantánea si enlaza con el evento de hash `hash_seq`, su digesto
+        # coincide y, con `esperado`, es igual a ese estado; si no, None
+        fila = self.almacen.consultar(
+            "SELECT hash, estado, digesto FROM bitacora_instantaneas WHERE contrato = ? AND registro = ? AND seq = ?",
+            (contrato, registro, seq),
+        )
+        if not fila or fila[0][0] != hash_seq or _digesto(fila[0][1]) != fila[0][2]:
+            return None
+        estado = _descomprimir(fila[0][1])
+        if esperado is not None and _normalizar(estado) != _normalizar(esperado):
+            return None
+        return estado
+
+    def estado(self, contrato, registro, momento=None):
+        # {id: fila} del registro tal como estaba en `momento` (datetime; None = ahora),
+        # con los valores como se guardaron en la base
+        hasta = self.almacen.consultar(
+            "SELECT seq FROM bitacora WHERE contrato = ? AND fecha <= ? ORDER BY seq DESC LIMIT 1",
+            (contrato, valor_sql(momento or datetime.now())),
+        )
+        hasta = hasta[0][0] if hasta else 0
+        # Si desde la última instantánea se acumularon más eventos que el umbral, se
+        # toman las que faltan antes de reproducir
+        ultima, filas = self._ultima_instantanea(contrato, registro)
+        if hasta > ultima and self.almacen.consultar(
+            "SELECT COUNT(*) FROM bitacora WHERE contrato = ? AND registro = ? AND seq > ? AND seq <= ?",
+            (contrato, registro, ultima, hasta),
+        )[0][0] >= _umbral(filas):
+            self.actualizar_instantaneas(contrato, registro)
+        seq, estado = self._instantanea(contrato, registro, hasta)
+        for lote in self.almacen.recorrer(
+            "SELECT id_fila, operacion, datos FROM bitacora "
+            "WHERE contrato = ? AND registro = ? AND seq > ? AND seq <= ? ORDER BY seq",
+            (contrato, registro, seq, hasta),
+        ):
+            for id_fila, operacion, datos in lote:
+                _aplicar(estado, id_fila, operacion, datos)
+        return estado
+
+    def reconstruir(self, contrato, registro, momento=None, monto_total=None):
+        # DataFrame del registro en `momento`, con los tipos de la app. En el RDO los
+        # acumulados se recalculan desde los valores diarios (y el físico con monto_total).
+        estado = self.estado(contrato, registro, momento)
+        columnas = columnas_bitacora(registro)
+        df = pd.DataFrame(list(estado.values()), columns=columnas)
+        df.insert(0, 'id', pd.array(list(estado), dtype='int64'))
+        df = aplicar_tipos(registro, df).sort_values([COLUMNA_FECHA[registro], 'id'], ignore_index=True)
+        if registro == 'rdo':
+            for diaria, acum in ACUMULADOS.items():
+                df[acum] = df[diaria].fillna(0).astype('float64').cumsum()
+            if monto_total:
+                df['Físico Acum (%)'] = (df['Financiero Acum ($)'] / monto_total * 100).clip(upper=100.0)
+        return df
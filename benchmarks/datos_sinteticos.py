@@ -0,0 +1,109 @@
+# --- GENERADOR DE DATOS SINTÉTICOS PARA BENCHMARKS ---
+# Llena una base SQLite con un contrato de prueba y N filas realistas en cada
+# registro (RDO, LDO, reportes y Libro de Obra). Hay un RDO por día desde el inicio
+# del contrato (con N mayor que el plazo la serie sigue después del plazo) y pasan
+# por el libro de acumulados, así que la base queda igual que una cargada desde la app.
+#
+#   python benchmarks/datos_sinteticos.py datos/bench_10k.db 10000
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from acumulados import LibroAcumulados  # noqa: E402
+from almacenamiento import CATEGORIAS_RDO, Almacen  # noqa: E402
+from cartera import Cartera  # noqa: E402
+from dias_libres import CARGOS, ESTADOS_LDO, MOTIVOS  # noqa: E402
+from libro_obra import ESTADOS_LP, LibroObra  # noqa: E402
+
+CONTRATO_BENCH = {
+    'Código': "BENCH-CNELEP-0001",
+    'Entidad': "CNEL EP - UNIDAD DE NEGOCIO EL ORO",
+    'Categoría': "CONSTRUCCIÓN DE SUBESTACIONES ELÉCTRICAS",
+    'Objeto': "Contrato sintético para pruebas de rendimiento",
+    'Contratista': "CONSORCIO BENCH", 'Rep_Legal': "BENCH C.LTDA.",
+    'Fiscalizador': "CONSORCIO FISCALPIÑAS", 'Monto': 3899999.22,
+    'Plazo Días': 450, 'Fecha Inicio': date(2025, 1, 1), 'Link': "",
+}
+LOTE = 5000
+
+ACTIVIDADES = [
+    "Excavación de cimentaciones", "Hormigonado de bases de pórticos", "Montaje de estructura metálica",
+    "Tendido de cable de control", "Instalación de transformador de potencia", "Malla de puesta a tierra",
+    "Montaje de seccionadores", "Pruebas de aislamiento", "Encofrado de canaletas", "Relleno compactado",
+]
+INCIDENTES = ["Sin Novedad"] * 8 + CATEGORIAS_RDO['Incidentes'][1:]
+ALERTAS = ["Sin Novedad"] * 8 + ["Lluvia", "Falta de material", "Accidente leve", "Paralización"]
+FUNCIONARIOS = [f"Funcionario {i:02d}" for i in range(1, 19)]
+
+
+def _lotes(filas, tamano=LOTE):
+    for i in range(0, len(filas), tamano):
+        yield filas[i:i + tamano]
+
+
+def generar(ruta_bd, filas, semilla=0):
+    azar = random.Random(semilla)
+    almacen = Almacen(ruta_bd)
+    cartera = Cartera(almacen)
+    if CONTRATO_BENCH['Código'] not in cartera.contratos():
+        cartera.registrar(CONTRATO_BENCH)
+    codigo, inicio, plazo = CONTRATO_BENCH['Código'], CONTRATO_BENCH['Fecha Inicio'], CONTRATO_BENCH['Plazo Días']
+    monto = CONTRATO_BENCH['Monto']
+
+    # RDO: inversión diaria tal que el total ronde el monto del contrato
+    inversion_media = monto / filas
+    rdo = []
+    for i in range(filas):
+        inversion = round(azar.uniform(0.2, 1.8) * inversion_media, 2)
+        rdo.append({
+            'Fecha': inicio + timedelta(days=i + 1), 'Día N': i + 1,
+            'Físico Diario (%)': inversion / monto * 100, 'Inversión Diaria ($)': inversion,
+            'Costo Real Diario ($)': round(inversion * azar.uniform(0.85, 1.15), 2),
+            'Hito Civil (%)': azar.uniform(0, 100), 'Hito Eléctrico (%)': azar.uniform(0, 100),
+            'Horas Hombre': float(azar.randint(40, 240)), 'Personal Detalle': "Frente civil y eléctrico",
+            'Incidentes': azar.choice(INCIDENTES), 'Contratos Comp': "Ninguno", 'Ordenes Trabajo': "Ninguna",
+            'Incremento Cant': 0.0, 'Control Cantidades': azar.choice(CATEGORIAS_RDO['Control Cantidades']),
+            'Clima': azar.choice(CATEGORIAS_RDO['Clima']),
+            'Detalle': azar.choice(ACTIVIDADES), 'Fotos': 0,
+        })
+    LibroAcumulados(almacen, codigo, monto).registrar_lote(_lotes(rdo))
+
+    # LDO, reportes y Libro de Obra
+    ldo, reportes = [], []
+    for i in range(filas):
+        salida = inicio + timedelta(days=azar.randint(0, plazo))
+        dias = azar.randint(1, 10)
+        funcionario = azar.choice(FUNCIONARIOS)
+        ldo.append({
+            'Contrato': codigo, 'Funcionario': funcionario, 'Cargo': CARGOS[FUNCIONARIOS.index(funcionario) % len(CARGOS)],
+            'Fecha Salida': salida, 'Fecha Retorno': salida + timedelta(days=dias), 'Días Totales': dias,
+            'Reemplazo': azar.choice(FUNCIONARIOS), 'Tipo': azar.choice(MOTIVOS), 'Estado': azar.choice(ESTADOS_LDO),
+        })
+        reportes.append({
+            'Contrato': codigo, 'Periodo': f"Semana {i % 52 + 1}", 'Tipo': azar.choice(["Informe Semanal", "Informe Mensual"]),
+            'Hitos': azar.choice(ACTIVIDADES), 'Alertas': azar.choice(ALERTAS),
+            'Fecha Emisión': inicio + timedelta(days=i * plazo // filas), 'Archivo': "Cargado",
+        })
+    with almacen.transaccion() as con:
+        for lote in _lotes(ldo):
+            almacen.insertar_lote(con, 'ldo', lote)
+        for lote in _lotes(reportes):
+            almacen.insertar_lote(con, 'reportes', lote)
+
+    LibroObra(almacen, codigo).registrar_lote(
+        {
+            'Fecha': inicio + timedelta(days=i * plazo // filas), 'Asunto': azar.choice(ACTIVIDADES),
+            'Instrucción': " ".join(azar.sample(ACTIVIDADES, 3)), 'Ref. Técnica': f"Plano E-{azar.randint(1, 80):02d}",
+            'Plazo': f"{azar.choice([24, 48, 72])} Horas", 'Estado': azar.choice(ESTADOS_LP),
+        }
+        for i in range(filas)
+    )
+    return codigo
+
+
+if __name__ == "__main__":
+    generar(sys.argv[1], int(sys.argv[2]))
@@ -0,0 +1,239 @@
+# --- BENCHMARKS DE LA APP (sin navegador, con streamlit.testing AppTest) ---
+# Para cada tamaño genera una base sintética y mide: reejecución del script (fría y
+# en caché), guardado de un RDO, render del dashboard y de cada figura, render y
+# búsqueda del Libro de Obra, y memoria máxima del proceso tras cada paso. Cada
+# tamaño corre en un proceso aparte (la ruta de la base se fija al importar la app)
+# y el resultado se guarda en JSON para comparar entre versiones.
+# El primer render (arranque en frío) se mide en procesos nuevos sobre la misma base:
+# Streamlit ya cargado, como en el servidor, pero nada de la app importado. Si la
+# mediana supera el presupuesto el comando termina con error tras guardar el JSON.
+#
+#   python benchmarks/ejecutar.py                      # 1k, 10k y 100k filas
+#   python benchmarks/ejecutar.py --tamanos 1000 --repeticiones 5
+#   python benchmarks/ejecutar.py --presupuesto 1.5    # segundos para el primer render
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "app.py")
+RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+TAMANOS = [1000, 10000, 100000]
+PRESUPUESTO_PRIMER_RENDER_S = 1.0
+# Sólo el dashboard (y la importación/exportación XLSX) debe cargarlas
+LIBRERIAS_DIFERIDAS = ['plotly.express', 'openpyxl']
+
+
+def _rss_mb():
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(maximo / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        'min_s': round(min(tiempos), 4), 'mediana_s': round(statistics.median(tiempos), 4),
+        'max_s': round(max(tiempos), 4), 'rss_max_mb': _rss_mb(),
+    }
+
+
+def _correr(at):
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def medir_tamano(filas, ruta_bd, repeticiones):
+    # Se ejecuta en el proceso hijo: las variables de entorno ya apuntan a la base temporal
+    sys.path.insert(0, RAIZ)
+    from streamlit.testing.v1 import AppTest
+
+    import tablero
+    from acumulados import LibroAcumulados
+    from almacenamiento import Almacen
+    from datos_sinteticos import CONTRATO_BENCH, generar
+    from libro_obra import LibroObra
+
+    resultado = {'filas': filas}
+    inicio = time.perf_counter()
+    codigo = generar(ruta_bd, filas)
+    resultado['generacion_s'] = round(time.perf_counter() - inicio, 2)
+    # En modo WAL los datos recién escritos siguen en bench.db-wal: se vuelcan al
+    # archivo principal antes de medirlo
+    con = sqlite3.connect(ruta_bd)
+    con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    con.close()
+    resultado['bd_mb'] = round(os.path.getsize(ruta_bd) / 2**20, 1)
+
+    at = AppTest.from_file(APP, default_timeout=600)
+    resultado['primera_ejecucion'] = _medir(lambda: _correr(at), 1)
+    contratos = at.sidebar.selectbox[0]
+    contratos.select_index(next(i for i, o in enumerate(contratos.options) if codigo in str(o)))
+    _correr(at)
+    resultado['reejecucion_rdo'] = _medir(lambda: _correr(at), repeticiones)
+
+    # Un RDO por día: cada repetición usa una fecha posterior a los datos generados
+    ultimo = CONTRATO_BENCH['Fecha Inicio'] + timedelta(days=filas)
+    fechas = iter(ultimo + timedelta(days=i + 1) for i in range(10000))
+
+    def guardar_rdo():
+        at.date_input[0].set_value(next(fechas))
+        next(w for w in at.text_area if w.label.startswith("17. ")).input("Tendido de red")
+        next(w for w in at.text_input if w.label.startswith("20. ")).input("Fiscalizador")
+        for w in at.number_input:
+            if w.label.startswith("11. "):
+                w.set_value(1000.0)
+        next(b for b in at.button if "GUARDAR RDO" in b.label).click()
+        _correr(at)
+        if not at.success:
+            raise RuntimeError(f"No se guardó el RDO: {[e.value for e in at.error]}")
+    resultado['guardar_rdo'] = _medir(guardar_rdo, repeticiones)
+
+    def navegar(opcion):
+        def ir():
+            at.sidebar.radio[0].set_value(opcion)
+            _correr(at)
+        return ir
+    modulos = at.sidebar.radio[0].options
+    dashboard = next(o for o in modulos if o.startswith("MÓDULO 2"))
+    libro_obra = next(o for o in modulos if o.startswith("MÓDULO 5"))
+    # Tras guardar un RDO la versión cambió: la primera vista del dashboard recalcula
+    resultado['dashboard_primera_vista'] = _medir(navegar(dashboard), 1)
+    resultado['dashboard_reejecucion'] = _medir(navegar(dashboard), repeticiones)
+    resultado['libro_obra_pagina'] = _medir(navegar(libro_obra), repeticiones)
+
+    # Figuras y consultas medidas fuera de la app (sin caché de Streamlit)
+    almacen = Almacen(ruta_bd)
+    libro = LibroAcumulados(almacen, codigo, CONTRATO_BENCH['Monto'])
+    datos = {}
+    resultado['datos_tablero'] = _medir(
+        lambda: datos.update(tablero.calcular_datos(almacen, libro, codigo, CONTRATO_BENCH['Monto'])), repeticiones
+    )
+    resultado['figuras'] = {}
+    for nombre, construir in tablero.FIGURAS.items():
+        medida = _medir(lambda: construir(datos, CONTRATO_BENCH['Monto']), repeticiones)
+        medida['json_kb'] = round(len(construir(datos, CONTRATO_BENCH['Monto']).to_json()) / 1024, 1)
+        resultado['figuras'][nombre] = medida
+    lp = LibroObra(almacen, codigo)
+    resultado['libro_obra_busqueda'] = _medir(lambda: (lp.contar("transformador potencia"),
+                                                       lp.buscar("transformador potencia")), repeticiones)
+    resultado['rss_final_mb'] = _rss_mb()
+    return resultado
+
+
+def medir_primer_render():
+    # Se ejecuta en un proceso hijo nuevo. El script vacío carga Streamlit y su
+    # ejecutor, que en producción ya están cargados antes de la primera sesión.
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vacio = os.path.join(tmp, "vacio.py")
+        with open(vacio, "w", encoding="utf-8") as f:
+            f.write("import streamlit as st\nst.write('')\n")
+        AppTest.from_file(vacio).run()
+
+    at = AppTest.from_file(APP, default_timeout=600)
+    inicio = time.perf_counter()
+    _correr(at)
+    resultado = {'primer_render_s': round(time.perf_counter() - inicio, 4), 'rss_mb': _rss_mb()}
+    # Recorre los módulos que no dibujan el tablero y anota qué librerías pesadas cargaron
+    for opcion in at.sidebar.radio[0].options:
+        if not opcion.startswith("MÓDULO 2"):
+            at.sidebar.radio[0].set_value(opcion)
+            _correr(at)
+    resultado['cargadas_sin_dashboard'] = [m for m in LIBRERIAS_DIFERIDAS if m in sys.modules]
+    return resultado
+
+
+def _entorno():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import pandas
+    import streamlit
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+        'python': platform.python_version(), 'plataforma': platform.platform(),
+        'streamlit': streamlit.__version__, 'pandas': pandas.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de FISCALPIÑAS sobre datos sintéticos.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", help="Archivo JSON (por defecto benchmarks/resultados/<fecha>_<commit>.json)")
+    parser.add_argument("--presupuesto", type=float, default=PRESUPUESTO_PRIMER_RENDER_S,
+                        help="Mediana máxima del primer render, en segundos")
+    parser.add_argument("--hijo", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--primer-render", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        resultado = medir_tamano(args.hijo, os.environ["FISCALPINAS_BD"], args.repeticiones)
+        print(json.dumps(resultado))
+        return
+    if args.primer_render:
+        print(json.dumps(medir_primer_render()))
+        return
+
+    def hijo(opciones, entorno, descripcion):
+        proceso = subprocess.run([sys.executable, os.path.abspath(__file__)] + opciones,
+                                 env=entorno, capture_output=True, text=True)
+        if proceso.returncode != 0:
+            print(proceso.stderr, file=sys.stderr)
+            sys.exit(f"Falló la medición {descripcion}.")
+        return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+    informe = {'entorno': _entorno(), 'repeticiones': args.repeticiones,
+               'presupuesto_primer_render_s': args.presupuesto, 'resultados': {}}
+    excedidos = []
+    for filas in args.tamanos:
+        with tempfile.TemporaryDirectory() as tmp:
+            entorno = dict(os.environ, FISCALPINAS_BD=os.path.join(tmp, "bench.db"),
+                           FISCALPINAS_FOTOS=os.path.join(tmp, "fotos"))
+            print(f"[{filas} filas] midiendo...", file=sys.stderr)
+            resultado = hijo(["--hijo", str(filas), "--repeticiones", str(args.repeticiones)], entorno,
+                             f"con {filas} filas")
+            # Un proceso por repetición: el primer render sólo es frío una vez por proceso
+            arranques = [hijo(["--primer-render"], entorno, f"del primer render con {filas} filas")
+                         for _ in range(args.repeticiones)]
+            tiempos = [a['primer_render_s'] for a in arranques]
+            resultado['primer_render'] = {
+                'min_s': min(tiempos), 'mediana_s': round(statistics.median(tiempos), 4), 'max_s': max(tiempos),
+                'rss_max_mb': max(a['rss_mb'] for a in arranques),
+                'cargadas_sin_dashboard': arranques[-1]['cargadas_sin_dashboard'],
+            }
+            if resultado['primer_render']['mediana_s'] > args.presupuesto:
+                excedidos.append(f"{filas} filas: {resultado['primer_render']['mediana_s']} s")
+            informe['resultados'][str(filas)] = resultado
+
+    salida = args.salida or os.path.join(
+        RESULTADOS, f"{date.today().isoformat()}_{informe['entorno']['commit'] or 'sin-commit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}", file=sys.stderr)
+    if excedidos:
+        sys.exit(f"Primer render sobre el presupuesto de {args.presupuesto} s: {'; '.join(excedidos)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# --- COLA DE CAPTURA EN CAMPO (RDO y Libro de Obra) ---
+# Los formularios no escriben directo en los registros: cada envío se guarda primero
+# en la tabla `captura` con un id generado por el cliente (INSERT idempotente: un
+# reintento con el mismo id no agrega nada) y luego se sincroniza. La sincronización
+# toma las entradas pendientes del contrato y las aplica en una sola transacción junto
+# con su cambio de estado, así que una entrada se registra exactamente una vez. Los
+# días que llegan tarde o fuera de orden se suman sobre los acumulados vigentes
+# (LibroAcumulados.registrar_en), de modo que los totales quedan consistentes.
+import hashlib
+import json
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from almacenamiento import validar_rdo, valor_sql
+
+REGISTROS_CAPTURA = ['rdo', 'lp']
+ESTADOS_CAPTURA = ['pendiente', 'sincronizado', 'error']
+EN_COLA, SINCRONIZADO, CON_ERROR = ESTADOS_CAPTURA
+LOTE_SINCRONIZACION = 200
+
+
+def crear_tabla_captura(con):
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS captura (id_cliente TEXT PRIMARY KEY, contrato TEXT NOT NULL, "
+        f"registro TEXT NOT NULL, datos TEXT NOT NULL, estado TEXT NOT NULL DEFAULT '{EN_COLA}', "
+        "resultado TEXT, error TEXT, recibido TEXT NOT NULL, sincronizado TEXT)"
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_captura_contrato_estado ON captura (contrato, estado, recibido)")
+
+
+def nuevo_id():
+    return uuid.uuid4().hex
+
+
+def id_envio(formulario, registro, datos):
+    # Id de un envío desde un formulario: el id de esa instancia del formulario más el
+    # contenido. Reenviar el mismo formulario (doble clic, reintento tras perder la
+    # conexión) produce el mismo id; tras registrar, la app renueva el id del formulario.
+    huella = hashlib.sha256(_a_json(datos).encode()).hexdigest()[:32]
+    return f"{formulario}-{registro}-{huella}"
+
+
+def _a_json(datos):
+    return json.dumps({c: valor_sql(v) for c, v in datos.items()}, ensure_ascii=False, sort_keys=True)
+
+
+class ColaCaptura:
+    def __init__(self, almacen):
+        self.almacen = almacen
+        with almacen.transaccion() as con:
+            crear_tabla_captura(con)
+
+    # --- RECEPCIÓN ---
+    def encolar(self, contrato, registro, id_cliente, datos):
+        return self.encolar_lote(contrato, [{'id_cliente': id_cliente, 'registro': registro, 'datos': datos}])[0]
+
+    def encolar_lote(self, contrato, entradas):
+        # entradas: [{'id_cliente', 'registro', 'datos'}]. Devuelve el estado de cada una;
+        # los id ya recibidos se ignoran y devuelven el estado que tenían.
+        entradas = list(entradas)
+        for e in entradas:
+            if not str(e.get('id_cliente') or '').strip():
+                raise ValueError("Cada entrada necesita un 'id_cliente'.")
+            if e.get('registro') not in REGISTROS_CAPTURA:
+                raise ValueError(f"Registro no admitido: {e.get('registro')!r} (use {', '.join(REGISTROS_CAPTURA)}).")
+            if not isinstance(e.get('datos'), dict):
+                raise ValueError(f"La entrada {e['id_cliente']} no trae 'datos'.")
+        recibido = datetime.now().isoformat(timespec='seconds')
+        with self.almacen.transaccion() as con:
+            con.executemany(
+                "INSERT INTO captura (id_cliente, contrato, registro, datos, recibido) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id_cliente) DO NOTHING",
+                [(str(e['id_cliente']).strip(), contrato, e['registro'], _a_json(e['datos']), recibido) for e in entradas],
+            )
+        return self.estado([str(e['id_cliente']).strip() for e in entradas])
+
+    def estado(self, ids):
+        filas = {
+            f[0]: {'id_cliente': f[0], 'estado': f[1], 'resultado': f[2], 'error': f[3]}
+            for f in self.almacen.consultar(
+                f"SELECT id_cliente, estado, resultado, error FROM captura "
+                f"WHERE id_cliente IN ({', '.join('?' for _ in ids)})", list(ids),
+            )
+        }
+        return [filas.get(i) for i in ids]
+
+    # --- SINCRONIZACIÓN ---
+    def sincronizar(self, libro, libro_obra, limite=LOTE_SINCRONIZACION):
+        # libro y libro_obra del mismo contrato. Las entradas con datos inválidos o en
+        # conflicto con lo ya registrado por otra sesión (folio ocupado, fecha con RDO,
+        # opción fuera de catálogo) quedan en 'error' con el motivo; el resto se registra
+        # en la misma transacción que marca su estado.
+        contrato = libro.contrato
+        with self.almacen.transaccion() as con:
+            pendientes = con.execute(
+                "SELECT id_cliente, registro, datos FROM captura WHERE contrato = ? AND estado = ? "
+                "ORDER BY recibido, rowid LIMIT ?",
+                (contrato, EN_COLA, limite),
+            ).fetchall()
+            ahora = datetime.now().isoformat(timespec='seconds')
+            hechos, errores, rdo, fechas = [], [], [], set()
+            for id_cliente, registro, datos in pendientes:
+                datos = json.loads(datos)
+                try:
+                    if registro == 'rdo':
+                        fila = validar_rdo(datos)
+                        if fila['Fecha'] in fechas:
+                            raise ValueError(f"Ya hay otro RDO del {fila['Fecha']} en este lote.")
+                        libro.verificar_fecha(con, fila['Fecha'])
+                        fechas.add(fila['Fecha'])
+                        rdo.append((id_cliente, fila))
+                    else:
+                        hechos.append((libro_obra.registrar_en(con, datos), id_cliente))
+                except ValueError as e:
+                    errores.append((str(e), id_cliente))
+            ids_rdo = libro.registrar_en(con, [fila for _, fila in rdo])
+            hechos += [(str(id_fila), id_cliente) for (id_cliente, _), id_fila in zip(rdo, ids_rdo)]
+            con.executemany(
+                "UPDATE captura SET estado = ?, resultado = ?, error = NULL, sincronizado = ? "
+                "WHERE id_cliente = ?",
+                [(SINCRONIZADO, resultado, ahora, id_cliente) for resultado, id_cliente in hechos],
+            )
+            con.executemany(
+                "UPDATE captura SET estado = ?, error = ? WHERE id_cliente = ?",
+                [(CON_ERROR, error, id_cliente) for error, id_cliente in errores],
+            )
+        return {'sincronizadas': len(hechos), 'errores': len(errores)}
+
+    # --- CONSULTA Y LIMPIEZA ---
+    def pendientes(self, contrato):
+        # Entradas sin registrar (pendientes o con error) del contrato, de la más antigua a la más nueva
+        filas = self.almacen.consultar(
+            "SELECT id_cliente, registro, estado, recibido, error, datos FROM captura "
+            "WHERE contrato = ? AND estado != ? ORDER BY recibido, rowid",
+            (contrato, SINCRONIZADO),
+        )
+        df = pd.DataFrame(filas, columns=['Id', 'Registro', 'Estado', 'Recibido', 'Error', 'datos'])
+        df.insert(2, 'Entrada', [_describir(r, json.loads(d)) for r, d in zip(df['Registro'], df['datos'])])
+        return df.drop(columns='datos')
+
+    def contar_pendientes(self, contrato):
+        return self.almacen.consultar(
+            "SELECT COUNT(*) FROM captura WHERE contrato = ? AND estado = ?", (contrato, EN_COLA)
+        )[0][0]
+
+    def descartar(self, id_cliente):
+        # Sólo se descartan entradas con error; las pendientes aún pueden sincronizarse
+        with self.almacen.transaccion() as con:
+            return con.execute(
+                "DELETE FROM captura WHERE id_cliente = ? AND estado = ?", (id_cliente, CON_ERROR)
+            ).rowcount
+
+
+def _describir(registro, datos):
+    if registro == 'rdo':
+        return f"RDO {datos.get('Fecha')} | Día {datos.get('Día N')}"
+    return f"LP folio {datos.get('Folio') or 's/n'} | {datos.get('Asunto') or ''}"
@@ -0,0 +1,131 @@
+# --- CARTERA DE CONTRATOS ---
+# Cada contrato tiene su ficha técnica y su propia partición en todos los registros
+# (columna 'Contrato', indexada junto con la fecha). La vista de cartera lee sólo las
+# filas de resumen que el libro de acumulados mantiene por contrato, sin recorrer
+# el historial de RDO de cada obra.
+from datetime import date
+
+import pandas as pd
+
+from almacenamiento import ESQUEMAS, REGISTRO_INICIAL, anotar_existentes, columna_sql, valor_sql
+from acumulados import RESUMEN, crear_tablas
+from fotos import crear_tablas_fotos, enlaces_contrato, reenlazar
+from libro_obra import crear_tablas_lp, indexar_contrato
+
+CAMPOS_FICHA = [
+    ('Código', 'TEXT PRIMARY KEY'), ('Entidad', 'TEXT'), ('Categoría', 'TEXT'),
+    ('Objeto', 'TEXT'), ('Contratista', 'TEXT'), ('Rep_Legal', 'TEXT'),
+    ('Fiscalizador', 'TEXT'), ('Monto', 'REAL'), ('Plazo Días', 'INTEGER'),
+    ('Fecha Inicio', 'TEXT'), ('Link', 'TEXT'),
+]
+
+# Contrato con el que nació la app (subestación Piñas)
+CONTRATO_INICIAL = {
+    "Código": "LICO-CNELEP-2025-1",
+    "Entidad": "CNEL EP - UNIDAD DE NEGOCIO EL ORO",
+    "Categoría": "CONSTRUCCIÓN DE SUBESTACIONES ELÉCTRICAS",
+    "Objeto": "EOR Construccion de la subestacion Pinas y su linea de subtransmision GD",
+    "Contratista": "CONSORCIO PIÑAS INPI",
+    "Rep_Legal": "PILEGGI CONSTRUCCIONES C.LTDA.",
+    "Fiscalizador": "CONSORCIO FISCALPIÑAS",
+    "Monto": 3899999.22,
+    "Plazo Días": 450,
+    "Fecha Inicio": date(2025, 1, 1),
+    "Link": "https://www.compraspublicas.gob.ec/ProcesoContratacion/compras/PC/resumenAdjudicacion.cpe?solicitud=V_550at-6mzyMx9KwoPuuaByned8HAHsT3R-uscx9wE,",
+}
+
+
+class Cartera:
+    def __init__(self, almacen):
+        self.almacen = almacen
+        with almacen.transaccion() as con:
+            defs = ", ".join(f"{columna_sql(c)} {t}" for c, t in CAMPOS_FICHA)
+            con.execute(f"CREATE TABLE IF NOT EXISTS contratos ({defs})")
+            crear_tablas(con)
+            # Filas de bases anteriores a la cartera: pertenecen al contrato inicial
+            for registro in ESQUEMAS:
+                con.execute(
+                    f"UPDATE {registro} SET Contrato = ? WHERE Contrato IS NULL", (CONTRATO_INICIAL['Código'],)
+                )
+            crear_tablas_lp(con)
+            crear_tablas_fotos(con)
+            anotar_existentes(con)
+            if not con.execute("SELECT 1 FROM contratos LIMIT 1").fetchone():
+                self._insertar(con, CONTRATO_INICIAL)
+
+    # --- ALTA Y REINICIO DE CONTRATOS ---
+    def registrar(self, ficha):
+        if not ficha.get('Código'):
+            raise ValueError("El código del contrato es obligatorio.")
+        if not str(ficha.get('Objeto') or '').strip():
+            raise ValueError("El objeto del contrato es obligatorio.")
+        if not ficha.get('Monto') or ficha['Monto'] <= 0:
+            raise ValueError("El monto del contrato debe ser mayor a cero.")
+        with self.almacen.transaccion() as con:
+            if con.execute("SELECT 1 FROM contratos WHERE Código = ?", (ficha['Código'],)).fetchone():
+                raise ValueError(f"El contrato {ficha['Código']} ya está registrado.")
+            self._insertar(con, ficha)
+
+    def reiniciar(self, codigo):
+        # Lo borrado sigue en la bitácora de auditoría y puede restaurarse (restaurar)
+        with self.almacen.transaccion() as con:
+            self.almacen.borrar_contrato(con, codigo)
+            self._sembrar_rdo(con, codigo)
+
+    def restaurar(self, codigo, estados):
+        # estados: {registro: {id: fila}} reconstruidos desde la bitácora
+        # (auditoria.Bitacora.estado). Reemplaza esos registros del contrato; los
+        # acumulados del RDO se recalculan después con LibroAcumulados.recalcular().
+        # Las filas reinsertadas reciben id nuevos: las fotos de los días que siguen en
+        # la tabla pasan al id nuevo; las de días ya borrados se perdieron con la fila.
+        with self.almacen.transaccion() as con:
+            for registro, filas in estados.items():
+                enlaces = enlaces_contrato(con, codigo) if registro == 'rdo' else []
+                self.almacen.vaciar(con, registro, codigo)
+                ids = self.almacen.insertar_lote(con, registro, [{**filas[i], 'Contrato': codigo} for i in sorted(filas)])
+                if registro == 'rdo':
+                    reenlazar(con, enlaces, dict(zip(sorted(filas), ids)))
+                if registro == 'lp':
+                    indexar_contrato(con, codigo)
+            if not con.execute("SELECT 1 FROM rdo WHERE Contrato = ? LIMIT 1", (codigo,)).fetchone():
+                self._sembrar_rdo(con, codigo)
+
+    def _insertar(self, con, ficha):
+        columnas = [c for c, _ in CAMPOS_FICHA]
+        con.execute(
+            f"INSERT INTO contratos ({', '.join(columna_sql(c) for c in columnas)}) "
+            f"VALUES ({', '.join('?' for _ in columnas)})",
+            [valor_sql(ficha.get(c)) for c in columnas],
+        )
+        if not con.execute("SELECT 1 FROM rdo WHERE Contrato = ? LIMIT 1", (ficha['Código'],)).fetchone():
+            self._sembrar_rdo(con, ficha['Código'])
+
+    def _sembrar_rdo(self, con, codigo):
+        inicio = con.execute('SELECT "Fecha Inicio" FROM contratos WHERE Código = ?', (codigo,)).fetchone()[0]
+        self.almacen.insertar(con, 'rdo', {**REGISTRO_INICIAL, 'Contrato': codigo, 'Fecha': inicio})
+
+    # --- CONSULTAS ---
+    def contratos(self):
+        return dict(self.almacen.consultar("SELECT Código, Objeto FROM contratos ORDER BY Código"))
+
+    def ficha(self, codigo):
+        columnas = [c for c, _ in CAMPOS_FICHA]
+        fila = self.almacen.consultar(
+            f"SELECT {', '.join(columna_sql(c) for c in columnas)} FROM contratos WHERE Código = ?", (codigo,)
+        )[0]
+        ficha = dict(zip(columnas, fila))
+        ficha['Fecha Inicio'] = date.fromisoformat(ficha['Fecha Inicio'])
+        ficha['Monto_Str'] = f"$ {ficha['Monto']:,.2f}"
+        ficha['Plazo'] = f"{ficha['Plazo Días']} Días Calendario"
+        return ficha
+
+    def resumen(self):
+        cols = ", ".join(f"r.{columna_sql(c)}" for c in RESUMEN)
+        filas = self.almacen.consultar(
+            f"SELECT c.Código, c.Objeto, c.Contratista, c.Monto, {cols}, r.\"Última Fecha\", r.\"Días RDO\" "
+            f"FROM contratos c LEFT JOIN resumen_contratos r ON r.contrato = c.Código ORDER BY c.Código"
+        )
+        return pd.DataFrame(
+            filas,
+            columns=['Código', 'Objeto', 'Contratista', 'Monto'] + RESUMEN + ['Última Fecha', 'Días RDO'],
+        )
@@ -0,0 +1,141 @@
+# --- DÍAS LIBRES (LDO): VALIDACIÓN Y COBERTURA POR CARGO ---
+# Cada ausencia es el intervalo [Fecha Salida, Fecha Retorno): el funcionario
+# vuelve a sitio el día de retorno. Las solicitudes nuevas se validan contra las
+# existentes con un IntervalIndex (rango negativo, cruce con otra ausencia del mismo
+# funcionario, reemplazo ausente). La matriz día x cargo sobre todo el plazo se arma
+# con un arreglo de diferencias (+1 al salir, -1 al volver) y una suma acumulada,
+# sin recorrer día por día.
+import numpy as np
+import pandas as pd
+
+CARGOS = ["Director", "Residente", "Especialista Elec.", "Especialista Civil", "Ambiental", "SISO"]
+MOTIVOS = ["Franco/Descanso", "Vacaciones", "Permiso Médico", "Calamidad"]
+ESTADOS_LDO = ["Solicitado", "Aprobado", "Ejecutado"]
+
+
+def _intervalos(df):
+    return pd.IntervalIndex.from_arrays(
+        pd.to_datetime(df['Fecha Salida']), pd.to_datetime(df['Fecha Retorno']), closed='left'
+    )
+
+
+class DiasLibres:
+    def __init__(self, almacen, contrato):
+        self.almacen = almacen
+        self.contrato = contrato
+
+    def _ausencias(self):
+        df = self.almacen.leer('ldo', self.contrato)
+        # Filas antiguas sin fechas válidas no participan en los cruces
+        df = df.dropna(subset=['Fecha Salida', 'Fecha Retorno']).assign(Funcionario=lambda d: d['Funcionario'].str.strip())
+        return df[df['Fecha Retorno'] > df['Fecha Salida']].reset_index(drop=True)
+
+    # --- VALIDACIÓN Y REGISTRO ---
+    def validar(self, solicitud, existentes=None):
+        existentes = self._ausencias() if existentes is None else existentes
+        errores = []
+        funcionario = (solicitud.get('Funcionario') or '').strip()
+        reemplazo = (solicitud.get('Reemplazo') or '').strip()
+        salida, retorno = solicitud['Fecha Salida'], solicitud['Fecha Retorno']
+        if not funcionario:
+            errores.append("El funcionario es obligatorio.")
+        if not reemplazo:
+            errores.append("El reemplazo designado es obligatorio.")
+        elif reemplazo.lower() == funcionario.lower():
+            errores.append("El reemplazo no puede ser el mismo funcionario.")
+        if retorno <= salida:
+            errores.append("La fecha de retorno debe ser posterior a la fecha de salida.")
+        if errores or existentes.empty:
+            return errores
+
+        nueva = pd.Interval(pd.Timestamp(salida), pd.Timestamp(retorno), closed='left')
+        cruces = _intervalos(existentes).overlaps(nueva)
+        nombres = existentes['Funcionario'].fillna('').str.strip().str.lower()
+        for _, fila in existentes[cruces & (nombres == funcionario.lower()).to_numpy()].iterrows():
+            errores.append(
+                f"{funcionario} ya tiene una ausencia del {fila['Fecha Salida']:%d/%m/%Y} "
+                f"al {fila['Fecha Retorno']:%d/%m/%Y} ({fila['Tipo']})."
+            )
+        for _, fila in existentes[cruces & (nombres == reemplazo.lower()).to_numpy()].iterrows():
+            errores.append(
+                f"El reemplazo {reemplazo} estará ausente del {fila['Fecha Salida']:%d/%m/%Y} "
+                f"al {fila['Fecha Retorno']:%d/%m/%Y}."
+            )
+        return errores
+
+    def registrar(self, solicitud):
+        with self.almacen.transaccion() as con:
+            errores = self.validar(solicitud)
+            if errores:
+                raise ValueError(" ".join(errores))
+            fila = dict(solicitud, Contrato=self.contrato,
+                        Funcionario=solicitud['Funcionario'].strip(), Reemplazo=solicitud['Reemplazo'].strip())
+            fila['Días Totales'] = (fila['Fecha Retorno'] - fila['Fecha Salida']).days
+            return self.almacen.insertar(con, 'ldo', fila)
+
+    # --- COBERTURA ---
+    def plantilla(self, df=None):
+        # Funcionarios por cargo, tomados de quienes figuran en el LDO del contrato
+        df = self.almacen.leer('ldo', self.contrato, ['Funcionario', 'Cargo']) if df is None else df
+        df = df.dropna(subset=['Funcionario', 'Cargo']).assign(Funcionario=lambda d: d['Funcionario'].str.strip())
+        return df.drop_duplicates('Funcionario', keep='last').sort_values(['Cargo', 'Funcionario'])[['Funcionario', 'Cargo']]
+
+    def matriz_cobertura(self, inicio, plazo_dias):
+        # DataFrame (día x cargo) con el número de titulares en sitio
+        dias = pd.date_range(pd.Timestamp(inicio), periods=int(plazo_dias) + 1, freq='D')
+        ausencias = self._ausencias()
+        plantilla = self.plantilla()
+        cargos = [c for c in CARGOS if c in set(plantilla['Cargo'])] + \
+            sorted(set(plantilla['Cargo']) - set(CARGOS))
+        delta = np.zeros((len(dias) + 1, len(cargos)), dtype=np.int32)
+        if not ausencias.empty and cargos:
+            ausencias = ausencias.merge(plantilla, on='Funcionario', suffixes=('_ldo', ''))
+            columna = ausencias['Cargo'].map({c: i for i, c in enumerate(cargos)}).to_numpy()
+            # Posición de salida y de retorno dentro del plazo (recortadas a sus extremos)
+            ini = np.clip(dias.searchsorted(pd.to_datetime(ausencias['Fecha Salida'])), 0, len(dias))
+            fin = np.clip(dias.searchsorted(pd.to_datetime(ausencias['Fecha Retorno'])), 0, len(dias))
+            np.add.at(delta, (ini, columna), 1)
+            np.add.at(delta, (fin, columna), -1)
+        ausentes = np.cumsum(delta[:-1], axis=0)
+        titulares = plantilla['Cargo'].value_counts().reindex(cargos).to_numpy()
+        presentes = np.clip(titulares - ausentes, 0, None)
+        return pd.DataFrame(presentes, index=dias.rename('Fecha'), columns=cargos)
+
+    def sin_cobertura(self, matriz):
+        # Tramos de días consecutivos en que un cargo queda sin titulares en sitio
+        tramos = []
+        for cargo in matriz.columns:
+            vacio = matriz[cargo].to_numpy() == 0
+            if not vacio.any():
+                continue
+            bordes = np.flatnonzero(np.diff(np.concatenate(([0], vacio.astype(np.int8), [0]))))
+            for a, b in zip(bordes[::2], bordes[1::2]):
+                tramos.append({'Cargo': cargo, 'Desde': matriz.index[a].date(),
+                               'Hasta': matriz.index[b - 1].date(), 'Días': int(b - a)})
+        return pd.DataFrame(tramos, columns=['Cargo', 'Desde', 'Hasta', 'Días'])
+
+    def en_sitio(self, fecha):
+        # Estado de cada funcionario de la plantilla en `fecha`
+        ausencias = self._ausencias()
+        estado = self.plantilla().assign(Estado='En sitio', Motivo='', Retorna=None, Reemplazo='')
+        if ausencias.empty:
+            return estado.reset_index(drop=True)
+        activas = ausencias[_intervalos(ausencias).contains(pd.Timestamp(fecha))]
+        activas = activas.drop_duplicates('Funcionario', keep='last').set_index('Funcionario')
+        fuera = estado['Funcionario'].isin(activas.index)
+        estado.loc[fuera, 'Estado'] = 'Ausente'
+        for campo, origen in (('Motivo', 'Tipo'), ('Retorna', 'Fecha Retorno'), ('Reemplazo', 'Reemplazo')):
+            estado.loc[fuera, campo] = estado.loc[fuera, 'Funcionario'].map(activas[origen])
+        return estado.reset_index(drop=True)
+
+
+def figura_cobertura(matriz):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Heatmap(
+        z=matriz.T.to_numpy(), x=matriz.index, y=list(matriz.columns),
+        colorscale=[[0, '#b91c1c'], [0.001, '#fde68a'], [1, '#15803d']], zmin=0,
+        colorbar=dict(title="En sitio"), hovertemplate="%{x|%d/%m/%Y}<br>%{y}: %{z} en sitio<extra></extra>",
+    ))
+    fig.update_layout(title="Cobertura de personal de fiscalización por cargo", height=120 + 40 * len(matriz.columns),
+                      yaxis=dict(autorange='reversed'), margin=dict(l=10, r=10, t=50, b=10))
+    return fig
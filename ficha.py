@@ -0,0 +1,23 @@
+# --- FICHA TÉCNICA DEL CONTRATO (compartida por la app y los informes) ---
+# La plantilla HTML y su hoja de estilos viven en recursos/ y se leen una sola vez
+# al importar el módulo; cada render sólo completa los campos. El módulo no depende
+# de pandas ni de Plotly, así que dibujar la ficha no arrastra las librerías de los
+# gráficos.
+import html
+import os
+
+RUTA_RECURSOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recursos")
+
+
+def leer_recurso(nombre):
+    with open(os.path.join(RUTA_RECURSOS, nombre), encoding="utf-8") as f:
+        return f.read()
+
+
+ESTILO_FICHA = f"<style>\n{leer_recurso('ficha_tecnica.css')}</style>\n"
+_PLANTILLA_FICHA = leer_recurso('ficha_tecnica.html')
+
+
+def ficha_html(ficha):
+    f = {k: html.escape(str(v)) for k, v in ficha.items()}
+    return ESTILO_FICHA + _PLANTILLA_FICHA.format(**f)
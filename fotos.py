@@ -0,0 +1,164 @@
+# --- REGISTRO FOTOGRÁFICO (almacén direccionado por contenido) ---
+# Cada imagen se guarda una sola vez en disco bajo su SHA-256 (las re-subidas se
+# deduplican) y se enlaza a la fila del RDO. La escritura en disco y la miniatura se
+# hacen en un pool de hilos, de modo que guardar el RDO no espera a procesar las
+# fotos; las vistas cargan miniaturas y sólo leen el original cuando se pide.
+# Los id del RDO se reutilizan (borrar el último día, reiniciar, restaurar): al borrar
+# una fila del RDO un trigger quita sus enlaces para que un día nuevo no herede fotos.
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+RUTA_FOTOS = os.environ.get(
+    "FISCALPINAS_FOTOS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos", "fotos"),
+)
+TAMANO_MINIATURA = (320, 320)
+
+# Estados de la miniatura
+PENDIENTE, LISTA, SIN_VISTA_PREVIA = 0, 1, -1
+
+
+def crear_tablas_fotos(con):
+    # La cartera las crea al arrancar: el trigger debe existir aunque el almacén de
+    # fotos aún no se haya abierto en este proceso.
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS fotos (sha256 TEXT PRIMARY KEY, nombre TEXT, tipo TEXT, "
+        "bytes INTEGER, miniatura INTEGER NOT NULL DEFAULT 0, creado TEXT)"
+    )
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS rdo_fotos (rdo_id INTEGER NOT NULL, sha256 TEXT NOT NULL, "
+        "nombre TEXT, PRIMARY KEY (rdo_id, sha256))"
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_rdo_fotos_sha ON rdo_fotos (sha256)")
+    if not con.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'rdo_fotos_borrar'").fetchone():
+        # Bases anteriores: enlaces de filas ya borradas
+        con.execute("DELETE FROM rdo_fotos WHERE rdo_id NOT IN (SELECT id FROM rdo)")
+        con.execute(
+            "CREATE TRIGGER rdo_fotos_borrar AFTER DELETE ON rdo "
+            "BEGIN DELETE FROM rdo_fotos WHERE rdo_id = old.id; END"
+        )
+
+
+def enlaces_contrato(con, contrato):
+    # (rdo_id, sha256, nombre) de las fotos enlazadas a los RDO del contrato
+    return con.execute(
+        "SELECT r.rdo_id, r.sha256, r.nombre FROM rdo_fotos r JOIN rdo ON rdo.id = r.rdo_id WHERE rdo.Contrato = ?",
+        (contrato,),
+    ).fetchall()
+
+
+def reenlazar(con, enlaces, ids):
+    # ids: {id anterior: id nuevo} de las filas reinsertadas; el resto de los enlaces se descarta
+    con.executemany(
+        "INSERT OR IGNORE INTO rdo_fotos (rdo_id, sha256, nombre) VALUES (?, ?, ?)",
+        [(ids[i], sha, nombre) for i, sha, nombre in enlaces if i in ids],
+    )
+
+
+class AlmacenFotos:
+    def __init__(self, almacen, raiz=RUTA_FOTOS, hilos=4):
+        self.almacen = almacen
+        self.raiz = raiz
+        os.makedirs(raiz, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="fotos")
+        with almacen.transaccion() as con:
+            crear_tablas_fotos(con)
+            pendientes = con.execute(
+                "SELECT sha256 FROM fotos WHERE miniatura = ?", (PENDIENTE,)
+            ).fetchall()
+        # Miniaturas que quedaron a medias por un reinicio
+        for (sha,) in pendientes:
+            if os.path.exists(self._ruta(sha)):
+                self._pool.submit(self._miniatura, sha)
+
+    def _ruta(self, sha, miniatura=False):
+        return os.path.join(self.raiz, sha[:2], sha + (".min.jpg" if miniatura else ""))
+
+    # --- ESCRITURA ---
+    def guardar(self, rdo_id, archivos):
+        # archivos: UploadedFile de st.file_uploader (o cualquier objeto con .name y .getvalue())
+        nuevos = []
+        with self.almacen.transaccion() as con:
+            # El id puede venir de un envío antiguo cuya fila ya se eliminó
+            if not con.execute("SELECT 1 FROM rdo WHERE id = ?", (rdo_id,)).fetchone():
+                raise ValueError(f"El RDO {rdo_id} ya no existe; las fotos no se enlazaron.")
+            for archivo in archivos:
+                datos = archivo.getvalue()
+                sha = hashlib.sha256(datos).hexdigest()
+                existe = con.execute("SELECT 1 FROM fotos WHERE sha256 = ?", (sha,)).fetchone()
+                if not existe:
+                    con.execute(
+                        "INSERT INTO fotos (sha256, nombre, tipo, bytes, miniatura, creado) VALUES (?, ?, ?, ?, ?, ?)",
+                        (sha, archivo.name, getattr(archivo, 'type', None), len(datos), PENDIENTE,
+                         datetime.now().isoformat(timespec='seconds')),
+                    )
+                # También si el archivo no llegó a disco (proceso caído antes de que el
+                # pool lo escribiera): re-subir la foto la recupera
+                if not existe or not os.path.exists(self._ruta(sha)):
+                    nuevos.append((sha, datos))
+                con.execute(
+                    "INSERT OR IGNORE INTO rdo_fotos (rdo_id, sha256, nombre) VALUES (?, ?, ?)",
+                    (rdo_id, sha, archivo.name),
+                )
+        for sha, datos in nuevos:
+            self._pool.submit(self._procesar, sha, datos)
+        return len(nuevos)
+
+    def _procesar(self, sha, datos):
+        ruta = self._ruta(sha)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        if not os.path.exists(ruta):
+            # Temporal propio de cada escritura: dos subidas de la misma foto no lo comparten
+            descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(datos)
+            os.replace(temporal, ruta)
+        self._miniatura(sha, datos)
+
+    def _miniatura(self, sha, datos=None):
+        try:
+            with Image.open(BytesIO(datos) if datos is not None else self._ruta(sha)) as img:
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail(TAMANO_MINIATURA)
+                img.convert("RGB").save(self._ruta(sha, miniatura=True), "JPEG", quality=80)
+            estado = LISTA
+        except (OSError, ValueError):
+            estado = SIN_VISTA_PREVIA
+        with self.almacen.transaccion() as con:
+            con.execute("UPDATE fotos SET miniatura = ? WHERE sha256 = ?", (estado, sha))
+
+    # --- LECTURA ---
+    def fotos_de(self, rdo_id):
+        filas = self.almacen.consultar(
+            "SELECT r.sha256, r.nombre, f.miniatura, f.bytes FROM rdo_fotos r "
+            "JOIN fotos f ON f.sha256 = r.sha256 WHERE r.rdo_id = ? ORDER BY r.nombre",
+            (rdo_id,),
+        )
+        return [dict(zip(['sha256', 'nombre', 'miniatura', 'bytes'], f)) for f in filas]
+
+    def dias_con_fotos(self, contrato):
+        return self.almacen.consultar(
+            "SELECT rdo.id, rdo.Fecha, rdo.\"Día N\", COUNT(*) FROM rdo_fotos r JOIN rdo ON rdo.id = r.rdo_id "
+            "WHERE rdo.Contrato = ? GROUP BY rdo.id ORDER BY rdo.Fecha DESC, rdo.id DESC",
+            (contrato,),
+        )
+
+    def miniatura(self, sha):
+        ruta = self._ruta(sha, miniatura=True)
+        return _leer(ruta)
+
+    def original(self, sha):
+        return _leer(self._ruta(sha))
+
+
+def _leer(ruta):
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, "rb") as f:
+        return f.read()
@@ -0,0 +1,141 @@
+# --- CARGA MASIVA Y EXPORTACIÓN DE REGISTROS ---
+# El importador lee el libro Excel (openpyxl en modo read_only) o el CSV fila por
+# fila, valida cada fila contra el esquema del RDO y la inserta en lotes; los
+# acumulados se recalculan una sola vez al final. El exportador recorre la
+# partición del contrato en bloques y escribe XLSX, CSV o Parquet sin armar la
+# tabla completa en memoria. openpyxl se importa recién al leer o escribir un XLSX.
+import csv
+import io
+
+import pandas as pd
+
+from almacenamiento import DIA_INICIO, ESQUEMAS, OBLIGATORIAS_RDO, a_dia, validar_rdo, valor_sql
+
+TAMANO_LOTE = 1000
+FORMATOS_EXPORTACION = ['XLSX', 'CSV', 'Parquet']
+
+# Columnas que calcula el sistema: si vienen en el archivo se ignoran
+COLUMNAS_DERIVADAS = {
+    'Contrato', 'Físico Diario (%)', 'Físico Acum (%)', 'Financiero Acum ($)',
+    'HH Acum', 'Costo Real Acum ($)', 'CPI', 'SPI',
+}
+
+
+# --- LECTURA DE ARCHIVOS (fila por fila) ---
+def _filas_archivo(archivo, nombre):
+    if nombre.lower().endswith('.csv'):
+        texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+        lector = csv.reader(texto, delimiter=';' if ';' in texto.readline() else ',')
+        texto.seek(0)
+        yield from lector
+    else:
+        from openpyxl import load_workbook
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            yield from libro.active.iter_rows(values_only=True)
+        finally:
+            libro.close()
+
+
+def _validar_rdo(crudo):
+    # Sólo las columnas que carga el usuario; las derivadas las calcula el libro
+    return validar_rdo({
+        c: crudo.get(c) for c, _ in ESQUEMAS['rdo'] if c not in COLUMNAS_DERIVADAS
+    })
+
+
+def _es_inicio(valor):
+    # Fila "Inicio" de un archivo exportado ("Inicio" en bases anteriores, 0 ahora)
+    if valor in (None, ''):
+        return False
+    try:
+        return a_dia(valor) == DIA_INICIO
+    except ValueError:
+        return False
+
+
+# --- IMPORTACIÓN ---
+def importar_rdo(archivo, nombre, libro, tamano_lote=TAMANO_LOTE):
+    # Devuelve (filas insertadas, DataFrame de errores con 'Fila' y 'Error').
+    errores = []
+
+    def lotes():
+        filas = _filas_archivo(archivo, nombre)
+        encabezado = [str(c).strip() if c is not None else '' for c in next(filas, [])]
+        faltantes = [c for c in OBLIGATORIAS_RDO if c not in encabezado]
+        if faltantes:
+            errores.append({'Fila': 1, 'Error': f"Faltan columnas: {', '.join(faltantes)}"})
+            return
+        # Un RDO por día: las fechas ya registradas o repetidas en el archivo son errores de fila
+        registradas, vistas = libro.fechas_registradas(), {}
+        lote = []
+        for numero, valores in enumerate(filas, start=2):
+            if not any(v not in (None, '') for v in valores):
+                continue
+            crudo = dict(zip(encabezado, valores))
+            if _es_inicio(crudo.get('Día N')):
+                continue
+            try:
+                fila = _validar_rdo(crudo)
+                fecha = valor_sql(fila['Fecha'])
+                if fecha in registradas:
+                    raise ValueError(f"Ya existe el RDO del {fecha}.")
+                if fecha in vistas:
+                    raise ValueError(f"Fecha {fecha} repetida (ya está en la fila {vistas[fecha]}).")
+            except ValueError as e:
+                errores.append({'Fila': numero, 'Error': str(e)})
+                continue
+            vistas[fecha] = numero
+            lote.append(fila)
+            if len(lote) >= tamano_lote:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+
+    insertadas = libro.registrar_lote(lotes())
+    return insertadas, pd.DataFrame(errores, columns=['Fila', 'Error'])
+
+
+# --- EXPORTACIÓN ---
+def exportar(almacen, registro, contrato, formato, tamano=5000):
+    # Devuelve los bytes del archivo listo para descargar
+    bloques = almacen.iterar(registro, contrato, tamano=tamano)
+    salida = io.BytesIO()
+    if formato == 'CSV':
+        texto = io.TextIOWrapper(salida, encoding='utf-8-sig', newline='')
+        encabezado = True
+        for bloque in bloques:
+            bloque.to_csv(texto, index=False, header=encabezado)
+            encabezado = False
+        if encabezado:
+            texto.write(",".join(c for c, _ in ESQUEMAS[registro] if c != 'Contrato') + "\n")
+        texto.flush()
+        texto.detach()
+    elif formato == 'XLSX':
+        from openpyxl import Workbook
+        libro = Workbook(write_only=True)
+        hoja = libro.create_sheet(registro.upper())
+        hoja.append([c for c, _ in ESQUEMAS[registro] if c != 'Contrato'])
+        for bloque in bloques:
+            for fila in bloque.itertuples(index=False):
+                hoja.append([None if pd.isna(v) else v for v in fila])
+        libro.save(salida)
+    elif formato == 'Parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Exportar a Parquet requiere instalar 'pyarrow'.")
+        escritor = None
+        for bloque in bloques:
+            tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(salida, tabla.schema)
+            escritor.write_table(tabla.cast(escritor.schema))
+        if escritor is None:
+            raise ValueError("No hay registros para exportar.")
+        escritor.close()
+    else:
+        raise ValueError(f"Formato no soportado: {formato}")
+    return salida.getvalue()
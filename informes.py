@@ -0,0 +1,265 @@
+# --- INFORMES AUTOMÁTICOS (MÓDULO 4) ---
+# Arma el informe semanal o mensual a partir de lo ya registrado: ficha técnica,
+# resumen de avance y valor ganado, RDO y agregados mensuales, gráficos del tablero,
+# folios abiertos del Libro de Obra, incidentes y días libres del periodo. La
+# generación corre en un hilo aparte que reporta su progreso; el resultado se guarda
+# por (contrato, tipo, inicio del periodo) junto con la huella de los datos que lo
+# originaron, y sólo se vuelve a construir cuando esa huella cambia.
+import base64
+import hashlib
+import html
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import tablero
+from almacenamiento import sin_inicio
+from ficha import ficha_html
+from libro_obra import LibroObra
+
+TIPOS_INFORME = ["Informe Semanal", "Informe Mensual"]
+ESTADO_ABIERTO = "Abierto (Pendiente)"
+
+FIGURAS_INFORME = [
+    ('curva_s', "Curva S - Avance Físico"),
+    ('valor_ganado', "Valor Ganado (PV / EV / AC)"),
+    ('doble_eje', "Inversión Diaria vs. Avance Acumulado"),
+    ('fisico_mensual', "Producción Física Mensual"),
+    ('pagos_mensuales', "Planillado Mensual"),
+    ('horas_hombre', "Horas Hombre Acumuladas"),
+    ('incidentes', "Incidentes Reportados"),
+]
+COLUMNAS_RDO_INFORME = [
+    'Fecha', 'Día N', 'Físico Diario (%)', 'Inversión Diaria ($)', 'Físico Acum (%)',
+    'Financiero Acum ($)', 'Horas Hombre', 'Incidentes',
+]
+
+# Imágenes estáticas con kaleido y PDF con weasyprint (ambos en requirements.txt).
+# Si faltan, los gráficos van interactivos (plotly.js desde CDN) y no hay PDF: la
+# vista lo avisa con FORMATOS_FALTANTES.
+HAY_KALEIDO = importlib.util.find_spec('kaleido') is not None
+HAY_WEASYPRINT = importlib.util.find_spec('weasyprint') is not None
+FORMATOS_FALTANTES = (
+    ([] if HAY_KALEIDO else ["gráficos como imagen (falta kaleido: se incrustan interactivos y requieren internet)"])
+    + ([] if HAY_KALEIDO and HAY_WEASYPRINT else ["PDF (requiere kaleido y weasyprint)"])
+)
+
+ESTILO_INFORME = """
+<style>
+    body {font-family: Arial, sans-serif; color: #222; margin: 30px;}
+    h1 {color: #1E3A8A; border-bottom: 3px solid #1E3A8A; padding-bottom: 6px;}
+    h2 {color: #1E3A8A; margin-top: 28px;}
+    .tabla {width: 100%; border-collapse: collapse; font-size: 12px;}
+    .tabla th {background-color: #1E3A8A; color: white; padding: 6px;}
+    .tabla td {border: 1px solid #ddd; padding: 5px;}
+    .kpi {display: inline-block; width: 23%; margin: 0 1% 10px 0; padding: 10px; background: #eef2ff; border-radius: 5px;}
+    .kpi b {display: block; font-size: 18px; color: #1E3A8A;}
+    .grafico {page-break-inside: avoid; margin-bottom: 15px;}
+</style>
+"""
+
+
+# --- PERIODOS ---
+def periodo(tipo, fecha):
+    # Semana de lunes a domingo o mes calendario que contiene `fecha`
+    if tipo == "Informe Semanal":
+        desde = fecha - timedelta(days=fecha.weekday())
+        return desde, desde + timedelta(days=6)
+    desde = fecha.replace(day=1)
+    return desde, (desde + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def etiqueta_periodo(tipo, desde, hasta):
+    if tipo == "Informe Semanal":
+        return f"Semana {desde.isocalendar()[1]} ({desde:%d/%m} - {hasta:%d/%m/%Y})"
+    return f"{desde:%m/%Y}"
+
+
+def crear_tabla_informes(con):
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS informes (contrato TEXT NOT NULL, tipo TEXT NOT NULL, "
+        "desde TEXT NOT NULL, hasta TEXT NOT NULL, huella TEXT NOT NULL, html BLOB NOT NULL, "
+        "pdf BLOB, creado TEXT, PRIMARY KEY (contrato, tipo, desde))"
+    )
+
+
+# --- TAREA EN SEGUNDO PLANO ---
+class Tarea:
+    def __init__(self, contrato, tipo, desde, hasta):
+        self.contrato, self.tipo, self.desde, self.hasta = contrato, tipo, desde, hasta
+        self.progreso = 0.0
+        self.mensaje = "En cola"
+        self.terminada = False
+        self.error = None
+        self.html = None
+        self.pdf = None
+        self.aviso = None
+        self.reutilizado = False
+        self.resumen = {}
+        self.futuro = None
+
+    def avanzar(self, progreso, mensaje):
+        self.progreso, self.mensaje = progreso, mensaje
+
+    @property
+    def nombre_archivo(self):
+        return f"{self.tipo.replace(' ', '_')}_{self.contrato}_{self.desde.isoformat()}"
+
+
+class GeneradorInformes:
+    def __init__(self, almacen, hilos=1):
+        self.almacen = almacen
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="informes")
+        self._tareas = {}
+        self._candado = threading.Lock()
+        with almacen.transaccion() as con:
+            crear_tabla_informes(con)
+
+    def solicitar(self, libro, ficha, tipo, fecha):
+        # Una sola tarea viva por periodo: pedir de nuevo el mismo informe devuelve la que ya corre
+        desde, hasta = periodo(tipo, fecha)
+        llave = (libro.contrato, tipo, desde)
+        with self._candado:
+            tarea = self._tareas.get(llave)
+            if tarea is None or tarea.terminada:
+                tarea = Tarea(libro.contrato, tipo, desde, hasta)
+                self._tareas[llave] = tarea
+                tarea.futuro = self._pool.submit(self._generar, tarea, libro, ficha)
+        return tarea
+
+    def tarea(self, contrato, tipo, desde):
+        return self._tareas.get((contrato, tipo, desde))
+
+    def _generar(self, tarea, libro, ficha):
+        try:
+            tarea.avanzar(0.05, "Leyendo datos del periodo")
+            datos = self._datos(libro, ficha, tarea.desde, tarea.hasta)
+            huella = _huella(datos, ficha)
+            guardado = self.almacen.consultar(
+                "SELECT huella, html, pdf FROM informes WHERE contrato = ? AND tipo = ? AND desde = ?",
+                (tarea.contrato, tarea.tipo, tarea.desde.isoformat()),
+            )
+            tarea.resumen = datos['resumen']
+            if guardado and guardado[0][0] == huella:
+                tarea.html, tarea.pdf = guardado[0][1].decode('utf-8'), guardado[0][2]
+                tarea.reutilizado = True
+            else:
+                tarea.html = self._armar(tarea, ficha, datos)
+                if HAY_KALEIDO and HAY_WEASYPRINT:
+                    tarea.avanzar(0.9, "Generando PDF")
+                    try:
+                        from weasyprint import HTML
+                        tarea.pdf = HTML(string=tarea.html).write_pdf()
+                    except OSError as e:
+                        # weasyprint instalado sin las bibliotecas del sistema (Pango): el HTML sigue sirviendo
+                        tarea.aviso = f"PDF no generado: {e}"
+                with self.almacen.transaccion() as con:
+                    con.execute(
+                        "INSERT INTO informes (contrato, tipo, desde, hasta, huella, html, pdf, creado) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(contrato, tipo, desde) DO UPDATE SET "
+                        "hasta = excluded.hasta, huella = excluded.huella, html = excluded.html, "
+                        "pdf = excluded.pdf, creado = excluded.creado",
+                        (tarea.contrato, tarea.tipo, tarea.desde.isoformat(), tarea.hasta.isoformat(), huella,
+                         tarea.html.encode('utf-8'), tarea.pdf, datetime.now().isoformat(timespec='seconds')),
+                    )
+            tarea.avanzar(1.0, "Informe listo")
+        except Exception as e:
+            # El hilo no tiene a quién propagar la excepción: se informa en la vista
+            tarea.error = f"{type(e).__name__}: {e}"
+        finally:
+            tarea.terminada = True
+
+    # --- DATOS DEL PERIODO ---
+    def _datos(self, libro, ficha, desde, hasta):
+        contrato = libro.contrato
+        inicio = pd.Timestamp(ficha['Fecha Inicio']).date()
+        if hasta < inicio:
+            raise ValueError(f"El periodo termina antes del inicio del contrato ({inicio:%d/%m/%Y}).")
+        tab = tablero.calcular_datos(self.almacen, libro, contrato, ficha['Monto'], hasta=hasta)
+        rdo = tab['rdo']
+        rdo_periodo = sin_inicio(rdo[rdo['Fecha'] >= pd.Timestamp(desde)])[COLUMNAS_RDO_INFORME]
+        incidentes = (rdo_periodo['Incidentes'].value_counts().loc[lambda s: s > 0]
+                      .rename_axis('Tipo').reset_index(name='Días'))
+
+        ldo = self.almacen.leer('ldo', contrato, hasta=hasta)
+        ldo = ldo[ldo['Fecha Retorno'] >= desde].reset_index(drop=True)
+
+        libro_obra = LibroObra(self.almacen, contrato)
+        abiertos = libro_obra.contar(estados=[ESTADO_ABIERTO], hasta=hasta)
+        lp_abiertos = libro_obra.buscar(estados=[ESTADO_ABIERTO], hasta=hasta, tamano=abiertos)
+        emitidos = libro_obra.contar(desde=desde, hasta=hasta)
+
+        actual = tab['evm_actual']
+        resumen = {
+            'Avance Físico Acum': f"{tab['ultimo']['Físico Acum (%)']:.2f} %",
+            'Ejecutado (EV)': f"$ {tab['ultimo']['Financiero Acum ($)']:,.2f}",
+            'Inversión del periodo': f"$ {rdo_periodo['Inversión Diaria ($)'].sum():,.2f}",
+            'Días reportados': f"{len(rdo_periodo)}",
+            'CPI': "—" if pd.isna(actual['CPI']) else f"{actual['CPI']:.2f}",
+            'SPI': "—" if pd.isna(actual['SPI']) else f"{actual['SPI']:.2f}",
+            'Folios abiertos': f"{abiertos}",
+            'Asientos del periodo': f"{emitidos}",
+        }
+        return {
+            'tablero': tab, 'rdo_periodo': rdo_periodo, 'incidentes': incidentes,
+            'ldo': ldo, 'lp_abiertos': lp_abiertos, 'resumen': resumen,
+        }
+
+    # --- DOCUMENTO ---
+    def _armar(self, tarea, ficha, datos):
+        tab = datos['tablero']
+        titulo = f"{tarea.tipo.upper()} DE FISCALIZACIÓN - {etiqueta_periodo(tarea.tipo, tarea.desde, tarea.hasta)}"
+        partes = [
+            f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(titulo)}</title>",
+            ESTILO_INFORME, "</head><body>",
+            f"<h1>{html.escape(titulo)}</h1>",
+            f"<p>Periodo: {tarea.desde:%d/%m/%Y} al {tarea.hasta:%d/%m/%Y} · Fiscalizador: "
+            f"{html.escape(str(ficha['Fiscalizador']))} · Emitido: {date.today():%d/%m/%Y}</p>",
+            ficha_html(ficha),
+            "<h2>1. Resumen del periodo</h2>",
+            "".join(f"<div class='kpi'>{html.escape(k)}<b>{html.escape(v)}</b></div>"
+                    for k, v in datos['resumen'].items()),
+            "<h2>2. RDO del periodo</h2>", _tabla(datos['rdo_periodo'], "Sin RDO registrados en el periodo."),
+            "<h2>3. Agregados mensuales</h2>", _tabla(tab['mensual'], "Sin datos mensuales."),
+        ]
+        tarea.avanzar(0.15, "Generando gráficos")
+        partes.append("<h2>4. Gráficos</h2>")
+        for i, (nombre, titulo_fig) in enumerate(FIGURAS_INFORME):
+            tarea.avanzar(0.15 + 0.7 * i / len(FIGURAS_INFORME), f"Gráfico: {titulo_fig}")
+            fig = tablero.FIGURAS[nombre](tab, ficha['Monto'])
+            fig.update_layout(title=titulo_fig)
+            partes.append(f"<div class='grafico'>{_grafico(fig)}</div>")
+        partes += [
+            "<h2>5. Libro de Obra: folios abiertos</h2>",
+            _tabla(datos['lp_abiertos'], "No hay folios abiertos."),
+            "<h2>6. Incidentes del periodo</h2>", _tabla(datos['incidentes'], "Sin incidentes registrados."),
+            "<h2>7. Días libres (LDO) en el periodo</h2>", _tabla(datos['ldo'], "Sin días libres en el periodo."),
+            "</body></html>",
+        ]
+        return "".join(partes)
+
+
+def _tabla(df, vacio):
+    if df.empty:
+        return f"<p><i>{html.escape(vacio)}</i></p>"
+    return df.to_html(index=False, classes='tabla', border=0, na_rep='—', float_format=lambda v: f"{v:,.2f}")
+
+
+def _grafico(fig):
+    if HAY_KALEIDO:
+        png = fig.to_image(format='png', width=1000, height=450)
+        return f"<img style='width:100%' src='data:image/png;base64,{base64.b64encode(png).decode()}'>"
+    return fig.to_html(full_html=False, include_plotlyjs='cdn')
+
+
+def _huella(datos, ficha):
+    # Huella de todo lo que entra al informe: si no cambia, el guardado sigue vigente
+    h = hashlib.sha256(repr(sorted((k, str(v)) for k, v in ficha.items())).encode())
+    h.update(repr(datos['resumen']).encode())
+    tab = datos['tablero']
+    for df in (tab['rdo'], tab['mensual'], tab['evm'], datos['ldo'], datos['lp_abiertos']):
+        h.update(df.to_csv().encode())
+    return h.hexdigest()
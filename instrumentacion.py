@@ -0,0 +1,176 @@
+# --- INSTRUMENTACIÓN DE RUTAS CALIENTES ---
+# Tramos con nombre ("bd.leer:rdo", "grafico:curva_s", "modulo:...") que registran
+# su duración, el tamaño de lo que se envía al navegador y los aciertos de caché.
+# Apagada (por defecto) medir() devuelve siempre el mismo contexto vacío, sin tomar
+# tiempos ni reservar memoria; se enciende desde el panel de administración o con
+# FISCALPINAS_PERFIL=1. Los datos son del proceso (todas las sesiones) y se guardan
+# en colas acotadas.
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+MUESTRAS_POR_TRAMO = 1000
+MAX_EVENTOS = 5000
+
+_activo = os.environ.get("FISCALPINAS_PERFIL") == "1"
+_VACIO = nullcontext()
+_candado = threading.Lock()
+_duraciones = defaultdict(lambda: deque(maxlen=MUESTRAS_POR_TRAMO))
+_cargas = defaultdict(lambda: deque(maxlen=MUESTRAS_POR_TRAMO))
+_cache = defaultdict(lambda: [0, 0])  # nombre -> [consultas, fallos]
+_eventos = deque(maxlen=MAX_EVENTOS)
+# Eventos anotados desde el arranque y cuántos de ellos ya escribió exportar()
+_anotados = 0
+_exportados = 0
+
+
+def activo():
+    return _activo
+
+
+def activar(encendido):
+    global _activo
+    _activo = bool(encendido)
+
+
+def reiniciar():
+    global _exportados
+    with _candado:
+        _duraciones.clear()
+        _cargas.clear()
+        _cache.clear()
+        _eventos.clear()
+        _exportados = _anotados
+
+
+# --- TRAMOS ---
+class _Tramo:
+    __slots__ = ('nombre', 'inicio')
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registrar(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+def medir(nombre):
+    return _Tramo(nombre) if _activo else _VACIO
+
+
+def iniciar(nombre):
+    # Para tramos que no caben en un bloque `with` (p. ej. una rama entera del script)
+    return (nombre, time.perf_counter()) if _activo else None
+
+
+def terminar(marca):
+    if marca is not None:
+        registrar(marca[0], time.perf_counter() - marca[1])
+
+
+def registrar(nombre, segundos):
+    with _candado:
+        _duraciones[nombre].append(segundos)
+        _anotar((time.time(), nombre, segundos, None, threading.current_thread().name))
+
+
+def carga(nombre, objeto):
+    # Bytes aproximados que viajan al navegador (sólo se calculan con la medición encendida)
+    if not _activo:
+        return
+    if isinstance(objeto, pd.DataFrame):
+        tamano = int(objeto.memory_usage(deep=True).sum())
+    elif hasattr(objeto, 'to_json'):
+        tamano = len(objeto.to_json())
+    else:
+        tamano = len(objeto)
+    with _candado:
+        _cargas[nombre].append(tamano)
+        _anotar((time.time(), nombre, None, tamano, threading.current_thread().name))
+
+
+def _anotar(evento):
+    # Con el candado tomado
+    global _anotados
+    _eventos.append(evento)
+    _anotados += 1
+
+
+def consulta_cache(nombre):
+    if _activo:
+        with _candado:
+            _cache[nombre][0] += 1
+
+
+def fallo_cache(nombre):
+    if _activo:
+        with _candado:
+            _cache[nombre][1] += 1
+
+
+# --- RESÚMENES ---
+def resumen():
+    with _candado:
+        tramos = {n: np.array(d) for n, d in _duraciones.items() if d}
+        cargas = {n: np.mean(c) for n, c in _cargas.items() if c}
+    filas = [
+        {
+            'Tramo': nombre, 'Llamadas': len(t),
+            'p50 (ms)': np.percentile(t, 50) * 1000, 'p95 (ms)': np.percentile(t, 95) * 1000,
+            'Total (s)': t.sum(), 'Carga media (KB)': cargas[nombre] / 1024 if nombre in cargas else None,
+        }
+        for nombre, t in tramos.items()
+    ]
+    columnas = ['Tramo', 'Llamadas', 'p50 (ms)', 'p95 (ms)', 'Total (s)', 'Carga media (KB)']
+    return pd.DataFrame(filas, columns=columnas).sort_values('Total (s)', ascending=False, ignore_index=True)
+
+
+def resumen_cache():
+    with _candado:
+        filas = [
+            {'Caché': n, 'Consultas': c, 'Fallos': f, 'Aciertos (%)': 100 * (c - f) / c if c else None}
+            for n, (c, f) in _cache.items()
+        ]
+    return pd.DataFrame(filas, columns=['Caché', 'Consultas', 'Fallos', 'Aciertos (%)'])
+
+
+def log_jsonl():
+    with _candado:
+        eventos = list(_eventos)
+    return _jsonl(eventos)
+
+
+def _jsonl(eventos):
+    return "".join(
+        json.dumps({
+            'fecha': datetime.fromtimestamp(t).isoformat(timespec='milliseconds'), 'tramo': nombre,
+            'ms': None if segundos is None else round(segundos * 1000, 3), 'bytes': tamano, 'hilo': hilo,
+        }, ensure_ascii=False) + "\n"
+        for t, nombre, segundos, tamano, hilo in eventos
+    )
+
+
+def exportar(ruta):
+    # Agrega al archivo sólo los eventos posteriores a la exportación anterior (los que
+    # la cola acotada ya descartó no se recuperan). Devuelve la ruta y cuántos escribió.
+    global _exportados
+    with _candado:
+        pendientes = min(_anotados - _exportados, len(_eventos))
+        eventos = list(_eventos)[len(_eventos) - pendientes:]
+        _exportados = _anotados
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write(_jsonl(eventos))
+    return ruta, len(eventos)
@@ -0,0 +1,156 @@
+# --- LIBRO DE OBRA: FOLIOS, FILTROS Y BÚSQUEDA ---
+# Cada asiento se registra con un folio único por contrato (índice UNIQUE, búsqueda
+# directa por folio). Asunto, Instrucción y Ref. Técnica se tokenizan al guardar y
+# alimentan un índice invertido (término -> asiento) que se actualiza con cada folio
+# nuevo; la búsqueda resuelve los términos por prefijo sobre ese índice y la vista
+# pide al almacén sólo la página que se muestra.
+import re
+import unicodedata
+
+import pandas as pd
+
+from almacenamiento import ESQUEMAS, aplicar_tipos, columna_sql, valor_sql
+
+ESTADOS_LP = ["Abierto (Pendiente)", "Cerrado (Cumplido)", "Anulado"]
+CAMPOS_INDEXADOS = ['Asunto', 'Instrucción', 'Ref. Técnica']
+TAMANO_PAGINA = 20
+LARGO_MINIMO_TERMINO = 2
+
+# Folios numéricos ("001", "27"): el siguiente se propone a partir del mayor
+_SQL_ULTIMO_FOLIO = "SELECT MAX(CAST(Folio AS INTEGER)) FROM lp WHERE Contrato = ? AND Folio GLOB '[0-9]*'"
+
+
+def crear_tablas_lp(con):
+    # Bases anteriores: folios vacíos o repetidos se renombran con el id de la fila
+    # para poder crear el índice único sin perder asientos. Con el índice ya creado no
+    # puede haber repetidos y se evita recorrer la tabla en cada arranque.
+    if not con.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_lp_contrato_folio'").fetchone():
+        con.execute(
+            "UPDATE lp SET Folio = COALESCE(NULLIF(TRIM(Folio), ''), 'S/N') || '-' || id "
+            "WHERE COALESCE(TRIM(Folio), '') = '' "
+            "OR id NOT IN (SELECT MIN(id) FROM lp GROUP BY Contrato, TRIM(Folio))"
+        )
+        con.execute("CREATE UNIQUE INDEX idx_lp_contrato_folio ON lp (Contrato, Folio)")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS lp_indice (termino TEXT NOT NULL, lp_id INTEGER NOT NULL, "
+        "PRIMARY KEY (termino, lp_id)) WITHOUT ROWID"
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_lp_indice_id ON lp_indice (lp_id)")
+    # Borrar un asiento (o reiniciar el contrato) limpia sus términos: los id de lp
+    # pueden reutilizarse y el índice no debe apuntar a filas nuevas.
+    con.execute(
+        "CREATE TRIGGER IF NOT EXISTS lp_indice_borrar AFTER DELETE ON lp "
+        "BEGIN DELETE FROM lp_indice WHERE lp_id = old.id; END"
+    )
+    if not con.execute("SELECT 1 FROM lp_indice LIMIT 1").fetchone():
+        indexar_contrato(con)
+
+
+def indexar_contrato(con, contrato=None):
+    # Indexa los asientos ya guardados del contrato (todos si contrato es None)
+    columnas = ", ".join(columna_sql(c) for c in CAMPOS_INDEXADOS)
+    donde, parametros = ("", ()) if contrato is None else (" WHERE Contrato = ?", (contrato,))
+    for fila in con.execute(f"SELECT id, {columnas} FROM lp{donde}", parametros).fetchall():
+        _indexar(con, fila[0], dict(zip(CAMPOS_INDEXADOS, fila[1:])))
+
+
+def terminos(texto):
+    # Minúsculas y sin tildes: "Instalación" y "instalacion" son el mismo término
+    plano = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode().lower()
+    return {t for t in re.findall(r'[a-z0-9]+', plano) if len(t) >= LARGO_MINIMO_TERMINO}
+
+
+def _indexar(con, lp_id, asiento):
+    encontrados = set().union(*(terminos(asiento.get(c)) for c in CAMPOS_INDEXADOS))
+    con.executemany(
+        "INSERT OR IGNORE INTO lp_indice (termino, lp_id) VALUES (?, ?)",
+        [(t, lp_id) for t in sorted(encontrados)],
+    )
+
+
+class LibroObra:
+    def __init__(self, almacen, contrato):
+        self.almacen = almacen
+        self.contrato = contrato
+
+    # --- REGISTRO DE ASIENTOS ---
+    def registrar(self, asiento):
+        with self.almacen.transaccion() as con:
+            return self.registrar_en(con, asiento)
+
+    def registrar_en(self, con, asiento):
+        # Dentro de una transacción ya abierta; devuelve el folio asignado
+        asiento = dict(asiento, Contrato=self.contrato, Folio=str(asiento.get('Folio') or '').strip())
+        if not asiento['Folio']:
+            asiento['Folio'] = self.siguiente_folio()
+        elif self._id_folio(con, asiento['Folio']) is not None:
+            raise ValueError(f"El folio {asiento['Folio']} ya está registrado en este contrato.")
+        lp_id = self.almacen.insertar(con, 'lp', asiento)
+        _indexar(con, lp_id, asiento)
+        return asiento['Folio']
+
+    def registrar_lote(self, asientos):
+        # Varios asientos en una sola transacción (folios vacíos se numeran en orden)
+        with self.almacen.transaccion() as con:
+            siguiente = int(self.siguiente_folio())
+            usados = {f for (f,) in con.execute("SELECT Folio FROM lp WHERE Contrato = ?", (self.contrato,))}
+            for asiento in asientos:
+                asiento = dict(asiento, Contrato=self.contrato, Folio=str(asiento.get('Folio') or '').strip())
+                if not asiento['Folio']:
+                    asiento['Folio'] = f"{siguiente:03d}"
+                    siguiente += 1
+                if asiento['Folio'] in usados:
+                    raise ValueError(f"El folio {asiento['Folio']} ya está registrado en este contrato.")
+                usados.add(asiento['Folio'])
+                _indexar(con, self.almacen.insertar(con, 'lp', asiento), asiento)
+
+    def _id_folio(self, con, folio):
+        fila = con.execute(
+            "SELECT id FROM lp WHERE Contrato = ? AND Folio = ?", (self.contrato, folio)
+        ).fetchone()
+        return fila[0] if fila else None
+
+    def siguiente_folio(self):
+        ultimo = self.almacen.consultar(_SQL_ULTIMO_FOLIO, (self.contrato,))[0][0]
+        return f"{(ultimo or 0) + 1:03d}"
+
+    # --- CONSULTAS ---
+    def folio(self, folio):
+        columnas = [c for c, _ in ESQUEMAS['lp'] if c != 'Contrato']
+        filas = self.almacen.consultar(
+            f"SELECT {', '.join(columna_sql(c) for c in columnas)} FROM lp WHERE Contrato = ? AND Folio = ?",
+            (self.contrato, str(folio).strip()),
+        )
+        return aplicar_tipos('lp', pd.DataFrame(filas, columns=columnas))
+
+    def _filtro(self, texto, estados, desde, hasta):
+        condiciones, parametros = ["Contrato = ?"], [self.contrato]
+        # Cada término de la búsqueda debe aparecer (por prefijo) en el asiento
+        for termino in sorted(terminos(texto)):
+            condiciones.append("id IN (SELECT lp_id FROM lp_indice WHERE termino >= ? AND termino < ?)")
+            parametros += [termino, termino[:-1] + chr(ord(termino[-1]) + 1)]
+        if estados:
+            condiciones.append(f"Estado IN ({', '.join('?' for _ in estados)})")
+            parametros += list(estados)
+        if desde is not None:
+            condiciones.append("Fecha >= ?")
+            parametros.append(valor_sql(desde))
+        if hasta is not None:
+            condiciones.append("Fecha <= ?")
+            parametros.append(valor_sql(hasta))
+        return " AND ".join(condiciones), parametros
+
+    def contar(self, texto='', estados=None, desde=None, hasta=None):
+        donde, parametros = self._filtro(texto, estados, desde, hasta)
+        return self.almacen.consultar(f"SELECT COUNT(*) FROM lp WHERE {donde}", parametros)[0][0]
+
+    def buscar(self, texto='', estados=None, desde=None, hasta=None, pagina=0, tamano=TAMANO_PAGINA):
+        # Página de asientos coincidentes, del más reciente al más antiguo
+        donde, parametros = self._filtro(texto, estados, desde, hasta)
+        columnas = [c for c, _ in ESQUEMAS['lp'] if c != 'Contrato']
+        filas = self.almacen.consultar(
+            f"SELECT {', '.join(columna_sql(c) for c in columnas)} FROM lp WHERE {donde} "
+            "ORDER BY Fecha DESC, id DESC LIMIT ? OFFSET ?",
+            parametros + [tamano, pagina * tamano],
+        )
+        return aplicar_tipos('lp', pd.DataFrame(filas, columns=columnas))
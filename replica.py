@@ -0,0 +1,71 @@
+# --- RÉPLICA INCREMENTAL DE UN REGISTRO ---
+# Copia en memoria de la partición (registro, contrato) compartida por todas las
+# sesiones del proceso. La primera lectura trae la partición completa; después sólo
+# se leen las filas que la tabla `cambios` marca con una secuencia posterior a la
+# última aplicada (altas, correcciones y acumulados desplazados) y se quitan las
+# borradas. Sin cambios, pedir los datos cuesta una consulta indexada a `cambios`;
+# las sesiones sólo esperan el candado mientras otra aplica un lote de cambios.
+import threading
+
+import pandas as pd
+
+from almacenamiento import COLUMNA_FECHA
+
+# Si cambió más de esta fracción de la partición conviene releerla completa
+FRACCION_RELECTURA = 0.25
+
+
+class Replica:
+    def __init__(self, almacen, registro, contrato, columnas):
+        self.almacen = almacen
+        self.registro = registro
+        self.contrato = contrato
+        self.columnas = ['id'] + [c for c in columnas if c != 'id']
+        self._candado = threading.Lock()
+        self._df = None
+        self._seq = 0
+
+    def datos(self):
+        # DataFrame vigente, ordenado por fecha e id (no debe modificarse en su lugar)
+        with self._candado:
+            if self._df is None:
+                self._releer()
+            else:
+                self._poner_al_dia()
+            return self._df
+
+    def _releer(self):
+        # La secuencia se toma antes de leer: lo que cambie entre medio se vuelve a leer
+        self._seq = self.almacen.ultimo_cambio(self.registro, self.contrato)
+        self._df = self.almacen.leer(self.registro, self.contrato, self.columnas)
+
+    def _poner_al_dia(self):
+        cambios = self.almacen.cambios(self.registro, self.contrato, self._seq)
+        if not cambios:
+            return
+        if len(cambios) > FRACCION_RELECTURA * max(len(self._df), 1):
+            self._releer()
+            return
+        ids = {c[0] for c in cambios}
+        vigentes = self.almacen.leer_ids(self.registro, sorted(i for i, borrado, _ in cambios if not borrado),
+                                         self.columnas)
+        self._seq = max(c[2] for c in cambios)
+        df = self._df[~self._df['id'].isin(ids)]
+        if vigentes.empty:
+            self._df = df.reset_index(drop=True)
+            return
+        clave = COLUMNA_FECHA[self.registro]
+        vigentes = vigentes.sort_values([clave, 'id'], kind='stable')
+        # Caso común: días nuevos al final; sólo se reordena si llegó alguno atrasado
+        al_final = df.empty or (vigentes[clave].iloc[0], vigentes['id'].iloc[0]) > (df[clave].iloc[-1], df['id'].iloc[-1])
+        df = _concatenar(df, vigentes)
+        if not al_final:
+            df = df.sort_values([clave, 'id'], kind='stable')
+        self._df = df.reset_index(drop=True)
+
+
+def _concatenar(a, b):
+    # Las categóricas tienen las categorías fijas del catálogo y se concatenan tal cual.
+    # Un bloque chico puede traer una columna toda vacía (dtype object): toma el de la réplica
+    b = b.astype({c: a[c].dtype for c in a.columns if b[c].dtype != a[c].dtype})
+    return pd.concat([a, b], ignore_index=True)
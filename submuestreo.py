@@ -0,0 +1,55 @@
+# --- SUBMUESTREO DE SERIES PARA LOS GRÁFICOS ---
+# Con años de RDO diarios el JSON de Plotly y el dibujo en el navegador crecen con
+# cada día registrado. Antes de armar una traza se eligen a lo sumo `umbral` puntos:
+# LTTB (Largest-Triangle-Three-Buckets) para curvas, que conserva la forma y los
+# quiebres, y mínimo/máximo por tramo para barras diarias, que conserva los picos.
+# Ambos devuelven posiciones dentro de la serie original, en orden.
+import numpy as np
+import pandas as pd
+
+
+def lttb(x, y, umbral):
+    # x, y: arreglos float64 sin NaN, con x creciente
+    n = len(x)
+    if umbral >= n or umbral < 3:
+        return np.arange(n)
+    # umbral - 2 tramos entre el primer y el último punto (que siempre se conservan)
+    bordes = np.linspace(1, n - 1, umbral - 1).astype(np.int64)
+    elegidos = np.empty(umbral, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(umbral - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        sig_fin = bordes[i + 2] if i + 2 < len(bordes) else n
+        # Vértice C: promedio del tramo siguiente
+        cx, cy = x[fin:sig_fin].mean(), y[fin:sig_fin].mean()
+        areas = np.abs((x[a] - cx) * (y[ini:fin] - y[a]) - (x[a] - x[ini:fin]) * (cy - y[a]))
+        a = ini + int(np.argmax(areas))
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def minmax(y, umbral):
+    # Mínimo y máximo de cada uno de umbral // 2 tramos de igual cantidad de puntos
+    n = len(y)
+    if umbral >= n:
+        return np.arange(n)
+    tramos = max(1, umbral // 2)
+    serie = pd.Series(y)
+    grupos = serie.groupby(np.arange(n) * tramos // n)
+    return np.union1d(grupos.idxmin().to_numpy(), grupos.idxmax().to_numpy())
+
+
+def indices(x, y, umbral, metodo='lttb'):
+    # Posiciones de (x, y) que se dibujan; los NaN (p. ej. EV después del último RDO) se omiten
+    valores = pd.to_numeric(pd.Series(y), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    validos = np.flatnonzero(~np.isnan(valores))
+    if len(validos) <= umbral:
+        return validos
+    if metodo == 'minmax':
+        return validos[minmax(valores[validos], umbral)]
+    eje = pd.Series(x)
+    if pd.api.types.is_datetime64_any_dtype(eje):
+        eje = eje.astype('datetime64[ns]').astype(np.int64)
+    eje = eje.to_numpy(dtype=np.float64)[validos]
+    return validos[lttb(eje, valores[validos], umbral)]
@@ -0,0 +1,187 @@
+# --- CAPA DE CÁLCULO DEL DASHBOARD (MÓDULO 2) ---
+# Los datos y cada figura se guardan en caché con (contrato, versión del RDO) como llave.
+# Guardar, corregir o eliminar un RDO sube la versión en la misma transacción, de
+# modo que las reejecuciones por interacción sirven todo desde caché y sólo se
+# recalcula tras un cambio real de datos. Las figuras se arman sobre el periodo
+# elegido en el selector de fechas y cada traza lleva a lo sumo PUNTOS_POR_TRAZA
+# puntos (submuestreo.py), así el JSON que viaja al navegador no crece con la obra.
+# Plotly se importa dentro de cada figura: los módulos que no dibujan el tablero no
+# pagan su carga (plotly.express tarda más que el resto de la app en importarse).
+import pandas as pd
+import streamlit as st
+
+import instrumentacion
+import submuestreo
+from almacenamiento import sin_inicio
+from valor_ganado import indicadores
+
+COLUMNAS_TABLERO = [
+    'Fecha', 'Día N', 'Físico Diario (%)', 'Inversión Diaria ($)', 'Físico Acum (%)',
+    'Financiero Acum ($)', 'Costo Real Acum ($)', 'CPI', 'SPI', 'HH Acum', 'Horas Hombre',
+    'Incidentes', 'Contratos Comp', 'Ordenes Trabajo', 'Incremento Cant',
+]
+# Versiones que se conservan en caché (la vigente y alguna anterior de otra sesión)
+MAX_VERSIONES = 8
+PUNTOS_POR_TRAZA = 1000
+# Cada cuánto una vista abierta del tablero consulta si hay RDO nuevos de otras sesiones
+SEGUNDOS_ACTUALIZACION = 15
+
+
+def datos_tablero(almacen, libro, contrato, version, monto_total, replica):
+    # version: (versión del RDO, versión de la línea base) del contrato
+    # replica: Replica del RDO del contrato (se pone al día con las filas cambiadas)
+    instrumentacion.consulta_cache('datos_tablero')
+    return _datos_tablero(almacen, libro, contrato, version, monto_total, replica)
+
+
+@st.cache_data(show_spinner=False, max_entries=MAX_VERSIONES)
+def _datos_tablero(_almacen, _libro, contrato, version, monto_total, _replica):
+    # Sólo corre cuando la llave no está en caché
+    instrumentacion.fallo_cache('datos_tablero')
+    with instrumentacion.medir('tablero.calcular_datos'):
+        return calcular_datos(_almacen, _libro, contrato, monto_total, rdo=_replica.datos())
+
+
+def calcular_datos(almacen, libro, contrato, monto_total, hasta=None, rdo=None):
+    # Sin caché: también lo usa el generador de informes con el corte `hasta` del periodo.
+    # rdo: el RDO ya leído (réplica del tablero); si falta se lee de la base.
+    df = almacen.leer('rdo', contrato, COLUMNAS_TABLERO, hasta=hasta) if rdo is None else rdo
+    evm = indicadores(df, libro.linea_base(), monto_total)
+    mensual = libro.mensual()
+    if hasta is not None:
+        mensual = mensual[mensual['Mes'] <= hasta.isoformat()[:7]].reset_index(drop=True)
+    return {
+        'rdo': df,
+        'mensual': mensual,
+        'incidentes': _conteo_incidentes(df),
+        'ultimo': df.iloc[-1],
+        'evm': evm,
+        'evm_actual': evm.loc[pd.Timestamp(df['Fecha'].max())],
+    }
+
+
+def _conteo_incidentes(df):
+    df_real = sin_inicio(df) if len(df) > 1 else df
+    # Incidentes es categórico: value_counts trae también las opciones sin días
+    conteo_inc = df_real['Incidentes'].value_counts().loc[lambda s: s > 0].reset_index()
+    conteo_inc.columns = ['Tipo', 'Cantidad']
+    return conteo_inc
+
+
+# --- VENTANA Y SUBMUESTREO ---
+def ventana(datos, desde, hasta):
+    # Recorte de las series al periodo [desde, hasta] del selector (None = obra completa)
+    if desde is None or hasta is None:
+        return datos
+    ini, fin = pd.Timestamp(desde), pd.Timestamp(hasta)
+    rdo, mensual = datos['rdo'], datos['mensual']
+    rdo = rdo[rdo['Fecha'].between(ini, fin)]
+    mensual = mensual[mensual['Mes'].between(f"{ini:%Y-%m}", f"{fin:%Y-%m}")].reset_index(drop=True)
+    return dict(datos, rdo=rdo, evm=datos['evm'].loc[ini:fin], mensual=mensual,
+                incidentes=_conteo_incidentes(rdo))
+
+
+def _reducir(df, columna, metodo='lttb'):
+    # Filas de `df` con las que se dibuja `columna` (eje x: 'Fecha' o el índice de fechas)
+    eje = df['Fecha'] if 'Fecha' in df.columns else df.index
+    return df.iloc[submuestreo.indices(eje, df[columna], PUNTOS_POR_TRAZA, metodo)]
+
+
+# --- FIGURAS ---
+def _curva_s(datos, monto_total):
+    import plotly.express as px
+    fig = px.area(_reducir(datos['rdo'], 'Físico Acum (%)'), x='Fecha', y='Físico Acum (%)', title="Curva 'S' - Avance Físico")
+    fig.update_traces(line_color='#1E3A8A', fillcolor='rgba(30, 58, 138, 0.3)')
+    return fig
+
+
+def _fisico_mensual(datos, monto_total):
+    import plotly.express as px
+    fig = px.bar(datos['mensual'], x='Mes', y='Físico Diario (%)', title="Producción Física Mensual (%)", text_auto='.2f')
+    fig.update_traces(marker_color='#b91c1c')
+    return fig
+
+
+def _valor_ganado(datos, monto_total):
+    import plotly.graph_objects as go
+    evm = datos['evm']
+    fig = go.Figure()
+    for columna, nombre, linea in [
+        ('PV', 'Planificado (PV)', dict(color='#1E3A8A', width=2)),
+        ('EV', 'Valor Ganado (EV)', dict(color='green', width=3)),
+        ('AC', 'Costo Real (AC)', dict(color='red', width=2)),
+    ]:
+        serie = _reducir(evm, columna)[columna]
+        fig.add_trace(go.Scatter(x=serie.index, y=serie, name=nombre, line=linea, mode='lines'))
+    # El presupuesto es constante: bastan los extremos del periodo
+    extremos = evm.index[[0, -1]] if len(evm) else evm.index
+    fig.add_trace(go.Scatter(x=extremos, y=[monto_total] * len(extremos), name='Presupuesto (BAC)',
+                             line=dict(color='gray', dash='dash'), mode='lines'))
+    fig.update_layout(yaxis_title="Monto USD ($)", legend=dict(orientation="h", y=1.1))
+    return fig
+
+
+def _pagos(datos, monto_total):
+    import plotly.express as px
+    fig = px.area(_reducir(datos['rdo'], 'Financiero Acum ($)'), x='Fecha', y='Financiero Acum ($)', markers=True)
+    fig.update_traces(line_color='green', fillcolor='rgba(0,128,0,0.2)')
+    return fig
+
+
+def _doble_eje(datos, monto_total):
+    import plotly.graph_objects as go
+    barras = _reducir(datos['rdo'], 'Inversión Diaria ($)', 'minmax')
+    curva = _reducir(datos['rdo'], 'Físico Acum (%)')
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=barras['Fecha'], y=barras['Inversión Diaria ($)'], name='Inversión ($)', marker_color='#90cdf4'))
+    fig.add_trace(go.Scatter(x=curva['Fecha'], y=curva['Físico Acum (%)'], name='% Acumulado', yaxis='y2', line=dict(color='#b91c1c', width=3)))
+    fig.update_layout(
+        yaxis=dict(title="Inversión Diaria USD"),
+        yaxis2=dict(title="% Avance Acumulado", overlaying='y', side='right'),
+        legend=dict(x=0, y=1.1, orientation='h')
+    )
+    return fig
+
+
+def _pagos_mensuales(datos, monto_total):
+    import plotly.express as px
+    return px.bar(datos['mensual'], x='Mes', y='Inversión Diaria ($)', text_auto='.2s', title="Planillado Mensual ($)")
+
+
+def _horas_hombre(datos, monto_total):
+    import plotly.express as px
+    import plotly.graph_objects as go
+    df = _reducir(datos['rdo'], 'HH Acum')
+    fig = px.line(df, x='Fecha', y='HH Acum', markers=True, title="Horas Hombre Acumuladas")
+    fig.add_trace(go.Scatter(x=df['Fecha'], y=df['HH Acum'], fill='tozeroy', mode='none', fillcolor='rgba(100,100,100,0.2)', showlegend=False))
+    return fig
+
+
+def _incidentes(datos, monto_total):
+    import plotly.express as px
+    return px.pie(datos['incidentes'], values='Cantidad', names='Tipo', hole=0.4, color_discrete_sequence=px.colors.qualitative.Safe)
+
+
+FIGURAS = {
+    'curva_s': _curva_s,
+    'fisico_mensual': _fisico_mensual,
+    'valor_ganado': _valor_ganado,
+    'pagos': _pagos,
+    'doble_eje': _doble_eje,
+    'pagos_mensuales': _pagos_mensuales,
+    'horas_hombre': _horas_hombre,
+    'incidentes': _incidentes,
+}
+
+
+def figura(nombre, contrato, version, monto_total, datos, desde=None, hasta=None):
+    instrumentacion.consulta_cache('figura')
+    return _figura(nombre, contrato, version, monto_total, desde, hasta, datos)
+
+
+@st.cache_data(show_spinner=False, max_entries=MAX_VERSIONES * len(FIGURAS))
+def _figura(nombre, contrato, version, monto_total, desde, hasta, _datos):
+    # _datos no entra en la llave: corresponde siempre a (`contrato`, `version`)
+    instrumentacion.fallo_cache('figura')
+    with instrumentacion.medir(f"figura.construir:{nombre}"):
+        return FIGURAS[nombre](ventana(_datos, desde, hasta), monto_total)
@@ -0,0 +1,80 @@
+# --- MOTOR DE VALOR GANADO (EVM) ---
+# La línea base se importa de un cronograma valorado en Excel y se convierte en una
+# curva diaria de Valor Planificado (PV). Con ella, el Valor Ganado (EV = Financiero
+# Acum) y el Costo Real (AC = Costo Real Acum) se calculan CPI, SPI, EAC, ETC y VAC
+# sobre toda la línea de tiempo con operaciones vectorizadas de pandas.
+import pandas as pd
+
+# Formatos de cronograma aceptados (además de la columna 'Fecha'):
+#   'PV ($)'                  -> valor planificado del periodo (se acumula)
+#   'PV Acum ($)'             -> valor planificado acumulado
+#   'Avance Planificado (%)'  -> avance planificado acumulado sobre el monto del contrato
+COLUMNAS_PV = ['PV ($)', 'PV Acum ($)', 'Avance Planificado (%)']
+
+
+def crear_tabla_linea_base(con):
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS linea_base (contrato TEXT NOT NULL, fecha TEXT NOT NULL, "
+        "pv REAL NOT NULL, PRIMARY KEY (contrato, fecha))"
+    )
+
+
+def leer_cronograma(archivo, monto_total):
+    df = pd.read_excel(archivo, engine='openpyxl')
+    df.columns = [str(c).strip() for c in df.columns]
+    if 'Fecha' not in df.columns:
+        raise ValueError("El cronograma debe tener una columna 'Fecha'.")
+    formato = next((c for c in COLUMNAS_PV if c in df.columns), None)
+    if formato is None:
+        raise ValueError(f"El cronograma debe tener una de las columnas: {', '.join(COLUMNAS_PV)}.")
+
+    df = pd.DataFrame({
+        'Fecha': pd.to_datetime(df['Fecha'], errors='coerce'),
+        'PV': pd.to_numeric(df[formato], errors='coerce'),
+    }).dropna().sort_values('Fecha')
+    if df.empty:
+        raise ValueError("El cronograma no tiene filas válidas (fecha y valor numérico).")
+    if formato == 'PV ($)':
+        df['PV'] = df['PV'].cumsum()
+    elif formato == 'Avance Planificado (%)':
+        df['PV'] = df['PV'] / 100 * monto_total
+    if (df['PV'].diff().dropna() < 0).any():
+        raise ValueError("El valor planificado acumulado no puede disminuir en el tiempo.")
+    return df.reset_index(drop=True)
+
+
+def curva_pv_diaria(cronograma, fecha_inicio, plazo_dias):
+    # PV acumulado día a día: 0 en la fecha de inicio, interpolación lineal en el
+    # tiempo entre hitos del cronograma y constante después del último hito.
+    inicio = pd.Timestamp(fecha_inicio)
+    puntos = pd.concat([
+        pd.DataFrame({'Fecha': [inicio], 'PV': [0.0]}), cronograma[['Fecha', 'PV']]
+    ]).groupby('Fecha')['PV'].max()
+    fin = max(inicio + pd.Timedelta(days=int(plazo_dias)), puntos.index.max())
+    dias = pd.date_range(puntos.index.min(), fin, freq='D')
+    pv = puntos.reindex(puntos.index.union(dias)).interpolate(method='time').ffill()
+    return pv.reindex(dias).rename('PV')
+
+
+def indicadores(rdo, pv, monto_total):
+    # rdo: columnas Fecha (datetime64, como la entrega Almacen.leer), Financiero Acum ($)
+    #      y Costo Real Acum ($); una o más filas por día
+    # pv:  Serie diaria de la línea base (puede ser None si no se cargó cronograma)
+    diario = rdo.groupby('Fecha')[['Financiero Acum ($)', 'Costo Real Acum ($)']].last()
+    extremos = diario.index if pv is None or pv.empty else diario.index.union(pv.index)
+    linea = pd.DataFrame(index=pd.date_range(extremos.min(), extremos.max(), freq='D'))
+    linea.index.name = 'Fecha'
+    linea['PV'] = pv.reindex(linea.index).ffill().fillna(0.0) if pv is not None and not pv.empty else float('nan')
+
+    # EV y AC sólo existen hasta el último RDO registrado
+    real = diario.reindex(linea.index).ffill()
+    real[linea.index > diario.index.max()] = float('nan')
+    linea['EV'] = real['Financiero Acum ($)']
+    linea['AC'] = real['Costo Real Acum ($)']
+
+    linea['CPI'] = linea['EV'] / linea['AC'].where(linea['AC'] > 0)
+    linea['SPI'] = linea['EV'] / linea['PV'].where(linea['PV'] > 0)
+    linea['EAC'] = monto_total / linea['CPI']
+    linea['ETC'] = linea['EAC'] - linea['AC']
+    linea['VAC'] = monto_total - linea['EAC']
+    return linea